@@ -5,9 +5,9 @@ from google.adk.agents import Agent
 from . import rag_kb_gemini  # same-package import of your RAG module
 
 
-def chat_kb(question: str) -> dict:
+async def chat_kb(question: str) -> dict:
     try:
-        answer = rag_kb_gemini.faq_system.chat(question)
+        answer = await rag_kb_gemini.faq_system.achat(question)
         return {"status": "success", "answer": answer}
     except Exception as exc:
         import traceback, sys
@@ -0,0 +1,160 @@
+"""
+Semantic answer cache placed in front of GeminiFAQSystem.answer().
+
+Answers are keyed by the normalized question text and its embedding, scoped by
+a "variant" (fallback mode, prompt and generation settings) and by the corpus
+version so any change to the corpus invalidates every cached answer.
+"""
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    """
+    Size-bounded LRU of answers with TTL and cosine-similarity lookup.
+    """
+
+    def __init__(self,
+                 similarity_threshold: float = 0.95,
+                 ttl_seconds: float = 3600.0,
+                 max_entries: int = 256):
+        """
+        Args:
+            similarity_threshold: Minimum cosine similarity between questions for a hit
+            ttl_seconds: Seconds a cached answer stays valid
+            max_entries: Maximum cached answers before LRU eviction
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        # (variant, normalized_question) -> entry, in LRU order
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._corpus_version = 0
+        self._counters = {"hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry["created_at"] > self.ttl_seconds
+
+    def get(self, normalized_question: str, variant: str, corpus_version: int) -> Optional[str]:
+        """
+        Exact-match lookup, no embedding needed. A miss is not counted here:
+        callers follow up with get_similar() once the question embedding is ready.
+        """
+        key = (variant, normalized_question)
+        with self._lock:
+            if corpus_version != self._corpus_version:
+                self._clear(corpus_version)
+
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry, time.monotonic()):
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry["answer"]
+            return None
+
+    def get_similar(self, variant: str, corpus_version: int, vector: Optional[np.ndarray]) -> Optional[str]:
+        """
+        Answer of the most similar cached question above the threshold.
+
+        Args:
+            variant: Fallback mode / prompt / generation settings the answer was made with
+            corpus_version: Current corpus version; stale versions never match
+            vector: Unit-length question embedding (None counts as a miss)
+        """
+        with self._lock:
+            if vector is not None and corpus_version == self._corpus_version:
+                now = time.monotonic()
+                best_key, best_score = None, self.similarity_threshold
+                for other_key, other in self._entries.items():
+                    if other_key[0] != variant or other["vector"] is None or self._expired(other, now):
+                        continue
+                    score = float(np.dot(vector, other["vector"]))
+                    if score >= best_score:
+                        best_key, best_score = other_key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self._counters["hits"] += 1
+                    self._counters["semantic_hits"] += 1
+                    logger.debug(f"🎯 Semantic answer cache hit (similarity: {best_score:.3f})")
+                    return self._entries[best_key]["answer"]
+
+            self._counters["misses"] += 1
+            return None
+
+    def lookup(self,
+               normalized_question: str,
+               variant: str,
+               corpus_version: int,
+               embed: Optional[Callable[[str], Optional[np.ndarray]]] = None) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Return a cached answer for an identical or semantically similar question.
+
+        Args:
+            normalized_question: Normalized question text (exact-match key)
+            variant: Fallback mode / prompt / generation settings the answer was made with
+            corpus_version: Current corpus version; stale versions never match
+            embed: Returns a unit-length question embedding; only called on an exact-match miss
+
+        Returns:
+            Tuple of (cached answer or None, question embedding if one was computed)
+        """
+        answer = self.get(normalized_question, variant, corpus_version)
+        if answer is not None:
+            return answer, None
+        # Embed outside the lock, it is a network call
+        vector = embed(normalized_question) if embed else None
+        return self.get_similar(variant, corpus_version, vector), vector
+
+    def store(self,
+              normalized_question: str,
+              variant: str,
+              corpus_version: int,
+              answer: str,
+              vector: Optional[np.ndarray] = None):
+        """Cache an answer generated against ``corpus_version``."""
+        with self._lock:
+            if corpus_version != self._corpus_version:
+                # Corpus changed while this answer was generated; don't cache it
+                return
+            key = (variant, normalized_question)
+            self._entries[key] = {
+                "answer": answer,
+                "vector": vector,
+                "created_at": time.monotonic(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def _clear(self, corpus_version: int):
+        if self._entries:
+            self._counters["invalidations"] += 1
+        self._entries.clear()
+        self._corpus_version = corpus_version
+
+    def invalidate(self, corpus_version: int):
+        """Drop every cached answer and adopt the new corpus version."""
+        with self._lock:
+            self._clear(corpus_version)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self._entries),
+                "entries": len(self._entries),
+                "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+                "similarity_threshold": self.similarity_threshold,
+            }
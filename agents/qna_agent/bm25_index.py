@@ -0,0 +1,336 @@
+"""
+Local BM25 keyword index over the same documents as the RAG corpus.
+
+Vector search misses exact-term queries (folder names such as
+``commerceiq-client-extensions``, error codes, acronyms), so answers fuse the
+Vertex results with BM25 hits from this index via reciprocal-rank fusion, and
+can be served from BM25 alone when Vertex is slow or unavailable.
+
+Documents are split into overlapping passages. Postings are kept per term as
+two compact arrays (uint32 passage ids, uint16 term frequencies) and scored
+with numpy. Removed passages are tombstoned and the postings are compacted
+once enough of them pile up.
+
+On disk the index is an append-only JSONL log (``documents.jsonl``) of
+``{"id", "text"}`` additions and ``{"id", "deleted": true}`` removals that is
+replayed on load and rewritten on compaction or rebuild. A ``built`` marker
+is written by rebuild(), so a log started by add() alone isn't mistaken for a
+complete index.
+"""
+import os
+import re
+import json
+import math
+import logging
+import threading
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Words per passage and words shared by consecutive passages
+PASSAGE_WORDS = 200
+PASSAGE_OVERLAP = 50
+
+# Documents indexed for keyword retrieval (binary formats such as PDF are left to Vertex)
+TEXT_EXTENSIONS = (".md", ".txt")
+
+# Standard BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Constant of reciprocal-rank fusion (Cormack et al.)
+RRF_K = 60
+
+# Lowercased terms; hyphen/underscore/dot/slash-joined names stay one token
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_SPLIT_RE = re.compile(r"[-_./]")
+_WORD_RE = re.compile(r"\S+")
+
+_STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in into is it its
+me my no not of on or our so than that the their them then there these they this to
+was we were what when where which who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Index terms of ``text``: compound names are kept whole and also split into
+    their parts, so ``client-extensions`` matches both the exact name and ``client``.
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token not in _STOPWORDS:
+            terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in _SPLIT_RE.split(token) if part and part not in _STOPWORDS)
+    return terms
+
+
+def split_passages(text: str,
+                   passage_words: int = PASSAGE_WORDS,
+                   overlap: int = PASSAGE_OVERLAP) -> List[Tuple[int, int]]:
+    """(start, end) character offsets of overlapping word windows of ``text``."""
+    spans = [match.span() for match in _WORD_RE.finditer(text)]
+    if not spans:
+        return []
+    step = max(1, passage_words - overlap)
+    passages = []
+    for start in range(0, len(spans), step):
+        end = min(start + passage_words, len(spans))
+        passages.append((spans[start][0], spans[end - 1][1]))
+        if end == len(spans):
+            break
+    return passages
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Any]],
+                           k: int = RRF_K,
+                           key: Callable[[Any], str] = str) -> List[Any]:
+    """
+    Merge ranked lists by sum of 1 / (k + rank).
+
+    Items whose ``key`` (text by default) is identical up to whitespace count as
+    one result; the first occurrence is returned.
+    """
+    scores: Dict[str, float] = {}
+    items: Dict[str, Any] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            item_key = " ".join(key(item).split())
+            scores[item_key] = scores.get(item_key, 0.0) + 1.0 / (k + rank)
+            items.setdefault(item_key, item)
+    return [items[item_key] for item_key in sorted(scores, key=scores.get, reverse=True)]
+
+
+class BM25Index:
+    """
+    Thread-safe in-memory BM25 index with an append-only log on disk.
+    """
+
+    def __init__(self, index_dir: str, compact_ratio: float = 0.25):
+        """
+        Args:
+            index_dir: Directory holding the index log
+            compact_ratio: Fraction of removed passages that triggers a compaction
+        """
+        self.index_dir = Path(index_dir)
+        self.log_path = self.index_dir / "documents.jsonl"
+        self.built_path = self.index_dir / "built"
+        self.compact_ratio = compact_ratio
+
+        self._lock = threading.RLock()
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        # Document id -> full text, and -> its passage ids
+        self._texts: Dict[str, str] = {}
+        self._docs: Dict[str, List[int]] = {}
+        # Passage id -> owning document, character offsets and length in terms
+        self._passage_doc: List[str] = []
+        self._passage_start = array("I")
+        self._passage_end = array("I")
+        self._passage_len = array("I")
+        self._alive = bytearray()
+        # Term -> (passage ids, term frequencies)
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._df: Counter = Counter()
+        self._total_len = 0
+        self._dead = 0
+
+    def exists(self) -> bool:
+        """Whether a complete index has been built on disk (even if empty)."""
+        return self.built_path.exists() and self.log_path.exists()
+
+    def _load(self):
+        """Replay the log, ignoring a half-written trailing line."""
+        if not self.log_path.exists():
+            return
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # partial trailing line from an interrupted write
+                    if record.get("deleted"):
+                        self._remove(record["id"])
+                    else:
+                        self._add(record["id"], record["text"])
+            if self._needs_compaction():
+                self._compact()
+            logger.info(f"🔎 Loaded BM25 index with {len(self._docs)} documents")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to load BM25 index, starting empty: {str(e)}")
+            self._reset()
+
+    def _passage(self, passage_id: int) -> str:
+        text = self._texts[self._passage_doc[passage_id]]
+        return text[self._passage_start[passage_id]:self._passage_end[passage_id]]
+
+    def _add(self, doc_id: str, text: str):
+        self._remove(doc_id)
+        self._texts[doc_id] = text
+        passage_ids = []
+        for start, end in split_passages(text):
+            terms = Counter(tokenize(text[start:end]))
+            if not terms:
+                continue
+            passage_id = len(self._passage_doc)
+            length = sum(terms.values())
+            self._passage_doc.append(doc_id)
+            self._passage_start.append(start)
+            self._passage_end.append(end)
+            self._passage_len.append(length)
+            self._alive.append(1)
+            self._total_len += length
+            for term, tf in terms.items():
+                ids, tfs = self._postings.setdefault(term, (array("I"), array("H")))
+                ids.append(passage_id)
+                tfs.append(min(tf, 0xFFFF))
+                self._df[term] += 1
+            passage_ids.append(passage_id)
+        self._docs[doc_id] = passage_ids
+
+    def _remove(self, doc_id: str) -> bool:
+        passage_ids = self._docs.get(doc_id)
+        if passage_ids is None:
+            return False
+        for passage_id in passage_ids:
+            self._alive[passage_id] = 0
+            self._total_len -= self._passage_len[passage_id]
+            for term in set(tokenize(self._passage(passage_id))):
+                self._df[term] -= 1
+                if self._df[term] <= 0:
+                    del self._df[term]
+        del self._docs[doc_id]
+        del self._texts[doc_id]
+        self._dead += len(passage_ids)
+        return True
+
+    def _needs_compaction(self) -> bool:
+        return self._dead > 0 and self._dead >= self.compact_ratio * len(self._passage_doc)
+
+    def _compact(self):
+        """Re-index live documents only and rewrite the log without removals."""
+        texts = self._texts
+        self._reset()
+        for doc_id, text in texts.items():
+            self._add(doc_id, text)
+        self._write_log(texts.items())
+
+    def _write_log(self, documents: Iterable[Tuple[str, str]]):
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.log_path.with_suffix(".jsonl.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for doc_id, text in documents:
+                f.write(json.dumps({"id": doc_id, "text": text}) + "\n")
+        os.replace(tmp_path, self.log_path)
+
+    def _append(self, record: Dict):
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, doc_id: str, text: str):
+        """Index (or re-index) one document and persist it."""
+        with self._lock:
+            self._add(doc_id, text)
+            if self._needs_compaction():
+                self._compact()
+            else:
+                self._append({"id": doc_id, "text": text})
+
+    def remove(self, doc_id: str) -> bool:
+        """Remove one document; returns False if it wasn't indexed."""
+        with self._lock:
+            if not self._remove(doc_id):
+                return False
+            if self._needs_compaction():
+                self._compact()
+            else:
+                self._append({"id": doc_id, "deleted": True})
+            return True
+
+    def rebuild(self, documents: Iterable[Tuple[str, str]]) -> int:
+        """Replace the whole index with ``documents`` of (id, text)."""
+        with self._lock:
+            self._reset()
+            for doc_id, text in documents:
+                self._add(doc_id, text)
+            self._write_log(self._texts.items())
+            self.built_path.touch()
+            count = len(self._docs)
+        logger.info(f"🔎 Rebuilt BM25 index with {count} documents")
+        return count
+
+    def search(self,
+               query: str,
+               k: int = 5,
+               doc_filter: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, float, str]]:
+        """
+        Top ``k`` passages for ``query`` as (doc_id, score, passage text), best first.
+
+        Args:
+            query: Search text
+            k: Passages to return
+            doc_filter: Only documents for which this returns True are searched
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            live = len(self._passage_doc) - self._dead
+            if not terms or live <= 0:
+                return []
+
+            avg_len = self._total_len / live
+            lengths = np.frombuffer(self._passage_len, dtype=np.uint32).astype(np.float32)
+            norm = K1 * (1.0 - B + B * lengths / avg_len)
+            scores = np.zeros(len(self._passage_doc), dtype=np.float32)
+
+            for term in terms:
+                df = self._df.get(term, 0)
+                if not df:
+                    continue
+                ids, tfs = self._postings[term]
+                # Copies, so the arrays stay free to grow
+                ids = np.array(ids, dtype=np.int64)
+                tfs = np.array(tfs, dtype=np.float32)
+                idf = math.log(1.0 + (live - df + 0.5) / (df + 0.5))
+                # Passage ids are unique within a posting list
+                scores[ids] += idf * tfs * (K1 + 1.0) / (tfs + norm[ids])
+
+            scores *= np.frombuffer(self._alive, dtype=np.uint8)
+            if doc_filter is not None:
+                allowed = np.zeros(len(self._passage_doc), dtype=np.float32)
+                for doc_id, passage_ids in self._docs.items():
+                    if doc_filter(doc_id):
+                        allowed[passage_ids] = 1.0
+                scores *= allowed
+            hits = int(np.count_nonzero(scores))
+            if not hits:
+                return []
+            k = min(k, hits)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._passage_doc[i], float(scores[i]), self._passage(i)) for i in top]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "documents": len(self._docs),
+                "passages": len(self._passage_doc) - self._dead,
+                "terms": len(self._df),
+                "tombstones": self._dead,
+            }
@@ -0,0 +1,382 @@
+"""
+Concurrent bulk ingest used by GeminiFAQSystem.update().
+
+Files are hashed and uploaded to GCS on a bounded thread pool, then imported
+into the RAG corpus with one ``rag.import_files`` call per batch (per shard
+when corpus sharding is enabled, see corpus_shards.py). Imports run
+on their own small pool so the next batch can hash/upload while the previous
+batch's long-running import operation is still in flight.
+
+With a SyncManifest the run is incremental: files whose size and mtime are
+unchanged are skipped without being read, modified files replace their old RAG
+file, and files deleted locally are removed from GCS and the corpus.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from vertexai.preview import rag
+
+from .sync_manifest import SyncManifest
+from .bm25_index import TEXT_EXTENSIONS
+from .resilience import resilience, GCS
+
+logger = logging.getLogger(__name__)
+
+# rag.import_files accepts at most 25 GCS URIs per request
+MAX_IMPORT_PATHS = 25
+
+STAGES = ("discovered", "unchanged", "hashed", "skipped", "uploaded", "imported", "deleted", "failed")
+
+
+class IngestProgress:
+    """Thread-safe per-stage counters for a bulk ingest run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {stage: 0 for stage in STAGES}
+
+    def add(self, stage: str, count: int = 1):
+        with self._lock:
+            self._counts[stage] += count
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def __str__(self) -> str:
+        return " | ".join(f"{stage}={count}" for stage, count in self.snapshot().items())
+
+
+class _Candidate:
+    """A local file moving through one ingest run."""
+    __slots__ = ("doc", "rel_path", "size", "mtime_ns", "file_hash", "previous", "gs_uri", "blob")
+
+    def __init__(self, doc: Path, rel_path: str, size: int, mtime_ns: int, previous: Optional[Dict[str, Any]]):
+        self.doc = doc
+        self.rel_path = rel_path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.previous = previous
+        self.file_hash: Optional[str] = None
+        self.gs_uri: Optional[str] = None
+        self.blob: Any = None
+
+
+class BulkIngestor:
+    """
+    Hash, upload and import many local files into a GeminiFAQSystem corpus.
+    """
+
+    def __init__(self,
+                 faq_system,
+                 batch_size: int = MAX_IMPORT_PATHS,
+                 max_workers: int = 8,
+                 max_concurrent_imports: int = 2,
+                 chunk_size: int = 512,
+                 chunk_overlap: int = 100,
+                 manifest: Optional[SyncManifest] = None):
+        """
+        Args:
+            faq_system: GeminiFAQSystem whose bucket and corpus receive the files
+            batch_size: Files per rag.import_files call (capped at MAX_IMPORT_PATHS)
+            max_workers: Concurrency cap for hashing and GCS uploads
+            max_concurrent_imports: Import operations allowed in flight at once
+            chunk_size: Size of chunks for RAG processing
+            chunk_overlap: Overlap between chunks
+            manifest: Local change manifest; enables incremental sync
+        """
+        if batch_size > MAX_IMPORT_PATHS:
+            logger.warning(f"⚠️ batch_size {batch_size} exceeds import limit, using {MAX_IMPORT_PATHS}")
+        self.faq_system = faq_system
+        self.batch_size = max(1, min(batch_size, MAX_IMPORT_PATHS))
+        self.max_workers = max(1, max_workers)
+        self.max_concurrent_imports = max(1, max_concurrent_imports)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.manifest = manifest
+        self.progress = IngestProgress()
+
+        assert faq_system.storage_client is not None, "Storage client must be initialized"
+        self.bucket = faq_system.storage_client.bucket(faq_system.storage_bucket)
+
+        self._rag_names: Optional[Dict[str, str]] = None
+        self._rag_names_lock = threading.Lock()
+
+    def _gcs_path(self, rel_path: str) -> str:
+        return f"{self.faq_system.corpus_name}/{rel_path}"
+
+    def _gs_uri(self, gcs_path: str) -> str:
+        return f"gs://{self.faq_system.storage_bucket}/{gcs_path}"
+
+    def _rag_file_name(self, entry: Dict[str, Any]) -> Optional[str]:
+        """RAG file for a manifest entry, listing the corpus once per run if it isn't recorded."""
+        if entry.get("rag_file_name"):
+            return entry["rag_file_name"]
+        if not entry.get("gcs_path"):
+            return None
+        with self._rag_names_lock:
+            if self._rag_names is None:
+                self._rag_names = self.faq_system._rag_file_names()
+        return self._rag_names.get(self._gs_uri(entry["gcs_path"]))
+
+    def _hash(self, candidate: _Candidate) -> _Candidate:
+        try:
+            candidate.file_hash = self.faq_system._calculate_file_hash(str(candidate.doc))
+            self.progress.add("hashed")
+        except Exception as e:
+            logger.error(f"❌ {candidate.doc.name} → {e}")
+            self.progress.add("failed")
+        return candidate
+
+    def _upload(self, candidate: _Candidate) -> Optional[_Candidate]:
+        try:
+            gcs_path = self._gcs_path(candidate.rel_path)
+            blob = self.bucket.blob(gcs_path)
+            resilience[GCS].call(lambda: blob.upload_from_filename(str(candidate.doc)), idempotent=False)
+
+            # Store hash in blob metadata for future deduplication
+            blob.metadata = {"file_hash": candidate.file_hash}
+            resilience[GCS].call(blob.patch)
+
+            candidate.gs_uri = self._gs_uri(gcs_path)
+            candidate.blob = blob
+            self.progress.add("uploaded")
+            return candidate
+        except Exception as e:
+            logger.error(f"❌ {candidate.doc.name} → {e}")
+            self.progress.add("failed")
+            return None
+
+    def _delete_rag_file(self, entry: Dict[str, Any]):
+        rag_file_name = self._rag_file_name(entry)
+        if rag_file_name:
+            rag.delete_file(name=rag_file_name)
+
+    def _retire(self, entry: Dict[str, Any]) -> Optional[str]:
+        """Delete a synced file's RAG file and GCS object; returns its hash to forget."""
+        if not entry.get("gcs_path"):
+            return None
+        self._delete_rag_file(entry)
+        self.bucket.blob(entry["gcs_path"]).delete()
+        self.faq_system._unindex_keywords(self.faq_system._keyword_doc_id(entry["gcs_path"]))
+        return entry.get("hash")
+
+    def _release_duplicates(self, stale_hashes: List[str]):
+        """Forget files skipped as copies of content that was just removed, so the next sync uploads them."""
+        stale = set(stale_hashes)
+        for rel_path, entry in self.manifest.items():
+            if not entry.get("gcs_path") and entry.get("hash") in stale:
+                self.manifest.remove(rel_path)
+
+    def _import(self, uploaded: List[_Candidate]):
+        """Import one batch of uploaded files with one rag.import_files call per shard."""
+        by_shard: Dict[str, List[_Candidate]] = {}
+        for candidate in uploaded:
+            by_shard.setdefault(self.faq_system.shards.route_path(candidate.rel_path), []).append(candidate)
+        for shard, group in by_shard.items():
+            self._import_shard(shard, group)
+
+    def _import_shard(self, shard: str, uploaded: List[_Candidate]):
+        """Import uploaded files that all route to one shard's corpus."""
+        # Modified files: drop the stale RAG file first so the corpus never holds both versions
+        replaced = [candidate for candidate in uploaded if candidate.previous]
+        for candidate in replaced:
+            try:
+                self._delete_rag_file(candidate.previous)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not delete old RAG file for {candidate.rel_path}: {e}")
+
+        try:
+            corpus_resource = self.faq_system._shard_corpus_name(shard, create=True)
+            self.faq_system._import_files(
+                corpus_resource,
+                [candidate.gs_uri for candidate in uploaded],
+                self.chunk_size,
+                self.chunk_overlap,
+            )
+        except Exception as e:
+            logger.error(f"❌ Batch import of {len(uploaded)} files into shard {shard} failed → {e}")
+            self.progress.add("failed", len(uploaded))
+            if self.manifest is not None:
+                # Forget these files so the next sync retries them
+                for candidate in replaced:
+                    self.manifest.remove(candidate.rel_path)
+            return
+
+        self.faq_system._record_file_hashes([(candidate.file_hash, candidate.blob) for candidate in uploaded])
+        self._index_keywords(uploaded)
+        stale_hashes = [
+            candidate.previous["hash"] for candidate in replaced
+            if candidate.previous.get("hash") and candidate.previous["hash"] != candidate.file_hash
+        ]
+        if stale_hashes:
+            self.faq_system._forget_file_hashes(stale_hashes)
+            if self.manifest is not None:
+                self._release_duplicates(stale_hashes)
+
+        if self.manifest is not None:
+            for candidate in uploaded:
+                self.manifest.set(candidate.rel_path, {
+                    "size": candidate.size,
+                    "mtime_ns": candidate.mtime_ns,
+                    "hash": candidate.file_hash,
+                    "gcs_path": candidate.blob.name,
+                    # Resolved with one listing at the end of the run
+                    "rag_file_name": None,
+                })
+        self.progress.add("imported", len(uploaded))
+        logger.info(f"✅ Imported batch of {len(uploaded)} files into shard {shard} ({self.progress})")
+
+    def _index_keywords(self, uploaded: List[_Candidate]):
+        """Add an imported batch's text files to the local BM25 index."""
+        for candidate in uploaded:
+            if not candidate.rel_path.endswith(TEXT_EXTENSIONS):
+                continue
+            try:
+                text = candidate.doc.read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError):
+                continue
+            self.faq_system._index_keywords(self.faq_system._keyword_doc_id(candidate.blob.name), text)
+
+    def _stat_batch(self, documents_path: str, batch: List[Path], seen: Set[str]) -> List[_Candidate]:
+        """Stat a batch of paths and drop files the manifest says are unchanged."""
+        candidates = []
+        for doc in batch:
+            rel_path = doc.relative_to(documents_path).as_posix()
+            seen.add(rel_path)
+            try:
+                stat = doc.stat()
+            except OSError as e:
+                logger.error(f"❌ {doc.name} → {e}")
+                self.progress.add("failed")
+                continue
+            if self.manifest is not None and self.manifest.unchanged(rel_path, stat):
+                self.progress.add("unchanged")
+                continue
+            previous = self.manifest.get(rel_path) if self.manifest is not None else None
+            candidates.append(_Candidate(doc, rel_path, stat.st_size, stat.st_mtime_ns, previous))
+        return candidates
+
+    def _triage(self, candidate: _Candidate, existing_hashes: Dict[str, str]) -> bool:
+        """Decide whether a hashed file needs uploading; records skips in the manifest."""
+        previous = candidate.previous
+        if previous and previous.get("hash") == candidate.file_hash:
+            # Touched but not modified: only the stat changed
+            self.manifest.update(candidate.rel_path, size=candidate.size, mtime_ns=candidate.mtime_ns)
+            self.progress.add("unchanged")
+            return False
+
+        existing_path = existing_hashes.get(candidate.file_hash)
+        if existing_path is not None:
+            logger.info(f"⏭️ Skipped (duplicate): {candidate.rel_path}")
+            self.progress.add("skipped")
+            if self.manifest is not None:
+                # Only own the GCS object if it is this file's earlier upload
+                owned = existing_path == candidate.rel_path
+                if previous and not owned:
+                    # Edited into a copy of another file: its own old upload is now stale
+                    try:
+                        stale_hash = self._retire(previous)
+                        if stale_hash:
+                            self.faq_system._forget_file_hashes([stale_hash])
+                            self._release_duplicates([stale_hash])
+                    except Exception as e:
+                        logger.warning(f"⚠️ Could not remove old upload of {candidate.rel_path}: {e}")
+                self.manifest.set(candidate.rel_path, {
+                    "size": candidate.size,
+                    "mtime_ns": candidate.mtime_ns,
+                    "hash": candidate.file_hash,
+                    "gcs_path": self._gcs_path(candidate.rel_path) if owned else None,
+                    "rag_file_name": None,
+                })
+            return False
+
+        existing_hashes[candidate.file_hash] = candidate.rel_path
+        return True
+
+    def _propagate_deletions(self, seen: Set[str]):
+        """Remove files that were synced before but no longer exist locally."""
+        removed_hashes = []
+        for rel_path in set(self.manifest.paths()) - seen:
+            entry = self.manifest.get(rel_path) or {}
+            try:
+                removed_hash = self._retire(entry)
+                if removed_hash:
+                    removed_hashes.append(removed_hash)
+                self.manifest.remove(rel_path)
+                self.progress.add("deleted")
+                logger.info(f"🗑️ Removed (deleted locally): {rel_path}")
+            except Exception as e:
+                logger.error(f"❌ Failed to remove {rel_path}: {e}")
+                self.progress.add("failed")
+        if removed_hashes:
+            self.faq_system._forget_file_hashes(removed_hashes)
+            self._release_duplicates(removed_hashes)
+
+    def _resolve_rag_file_names(self):
+        """Record RAG file names for newly synced files with a single corpus listing."""
+        pending = [(rel_path, entry) for rel_path, entry in self.manifest.items()
+                   if entry.get("gcs_path") and not entry.get("rag_file_name")]
+        if not pending:
+            return
+        try:
+            names = self.faq_system._rag_file_names()
+        except Exception as e:
+            logger.warning(f"⚠️ Could not list RAG files: {e}")
+            return
+        for rel_path, entry in pending:
+            rag_file_name = names.get(self._gs_uri(entry["gcs_path"]))
+            if rag_file_name:
+                self.manifest.update(rel_path, rag_file_name=rag_file_name)
+
+    def run(self, documents_path: str, docs: Iterable[Path]) -> Dict[str, int]:
+        """
+        Ingest ``docs`` (paths under ``documents_path``) and return stage counters.
+
+        ``docs`` is consumed lazily, one batch at a time.
+        """
+        existing_hashes = self.faq_system._get_existing_file_hashes()
+        logger.info(f"📋 Found {len(existing_hashes)} existing files in corpus")
+
+        seen: Set[str] = set()
+        docs = iter(docs)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool, \
+                    ThreadPoolExecutor(max_workers=self.max_concurrent_imports) as import_pool:
+                import_futures = []
+
+                while True:
+                    batch = list(islice(docs, self.batch_size))
+                    if not batch:
+                        break
+                    self.progress.add("discovered", len(batch))
+
+                    # 1️⃣ Skip files the manifest says are unchanged, hash the rest in parallel
+                    candidates = self._stat_batch(documents_path, batch, seen)
+                    to_upload = [
+                        candidate for candidate in pool.map(self._hash, candidates)
+                        if candidate.file_hash is not None and self._triage(candidate, existing_hashes)
+                    ]
+
+                    # 2️⃣ Upload to GCS in parallel
+                    uploaded = [result for result in pool.map(self._upload, to_upload) if result]
+
+                    # 3️⃣ Import the whole batch in the background
+                    import_futures.append(import_pool.submit(self._import, uploaded))
+
+                for future in import_futures:
+                    future.result()
+
+            if self.manifest is not None:
+                self._propagate_deletions(seen)
+                self._resolve_rag_file_names()
+        finally:
+            if self.manifest is not None:
+                self.manifest.save()
+
+        return self.progress.snapshot()
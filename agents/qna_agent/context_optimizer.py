@@ -0,0 +1,217 @@
+"""
+Post-retrieval context optimizer used between retrieval and prompt assembly.
+
+Vertex chunks are created with large overlaps and hybrid retrieval can return
+the same passage from both sources, so raw results often repeat each other.
+The optimizer:
+
+1. merges chunks of the same source whose text overlaps (or that contain one another),
+2. drops near-duplicates by word-shingle containment,
+3. picks a diverse top-k by maximal marginal relevance (MMR), with relevance
+   taken from the retrieval rank and query-term overlap and redundancy from
+   term-set Jaccard similarity.
+
+Everything is local string work; no model calls. Contexts are (source, text) pairs.
+"""
+import logging
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from .bm25_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Same rough estimate used for embedding batches
+CHARS_PER_TOKEN = 4
+
+Context = Tuple[str, str]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of ``text`` without calling a tokenizer."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _overlap(first: str, second: str, min_overlap: int) -> int:
+    """Length of the longest suffix of ``first`` that is a prefix of ``second`` (0 if under min_overlap)."""
+    if len(first) < min_overlap or len(second) < min_overlap:
+        return 0
+    head = second[:min_overlap]
+    start = first.find(head)
+    while start != -1:
+        tail = first[start:]
+        if second.startswith(tail):
+            return len(tail)
+        start = first.find(head, start + 1)
+    return 0
+
+
+def _merge_pair(first: str, second: str, min_overlap: int) -> Optional[str]:
+    """Merged text of two chunks if one contains or overlaps the other, else None."""
+    if second in first:
+        return first
+    if first in second:
+        return second
+    overlap = _overlap(first, second, min_overlap)
+    if overlap:
+        return first + second[overlap:]
+    overlap = _overlap(second, first, min_overlap)
+    if overlap:
+        return second + first[overlap:]
+    return None
+
+
+def _shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+    words = text.lower().split()
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _jaccard(first: FrozenSet[str], second: FrozenSet[str]) -> float:
+    union = len(first | second)
+    return len(first & second) / union if union else 0.0
+
+
+class ContextOptimizer:
+    """
+    Merge, deduplicate and diversify retrieved contexts.
+    """
+
+    def __init__(self,
+                 enabled: bool = True,
+                 merge_overlaps: bool = True,
+                 min_overlap_chars: int = 40,
+                 duplicate_threshold: float = 0.8,
+                 mmr_lambda: float = 0.7,
+                 candidate_multiplier: int = 2):
+        """
+        Args:
+            enabled: Pass contexts through untouched when False
+            merge_overlaps: Merge overlapping chunks of the same source
+            min_overlap_chars: Shortest suffix/prefix overlap treated as a chunk boundary
+            duplicate_threshold: Shingle containment at or above which a context is dropped
+                as a near duplicate of a better-ranked one (1.0 disables)
+            mmr_lambda: Relevance vs. diversity trade-off for MMR (1.0 keeps retrieval order)
+            candidate_multiplier: Contexts retrieved per context kept, so MMR has room to choose
+        """
+        self.enabled = enabled
+        self.merge_overlaps = merge_overlaps
+        self.min_overlap_chars = min_overlap_chars
+        self.duplicate_threshold = duplicate_threshold
+        self.mmr_lambda = mmr_lambda
+        self.candidate_multiplier = candidate_multiplier
+
+    def options(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "merge_overlaps": self.merge_overlaps,
+            "min_overlap_chars": self.min_overlap_chars,
+            "duplicate_threshold": self.duplicate_threshold,
+            "mmr_lambda": self.mmr_lambda,
+            "candidate_multiplier": self.candidate_multiplier,
+        }
+
+    def with_options(self, **overrides) -> "ContextOptimizer":
+        """Copy of this optimizer with some settings replaced (per-call configuration)."""
+        unknown = set(overrides) - set(self.options())
+        if unknown:
+            raise ValueError(f"Unknown context optimizer options: {sorted(unknown)}")
+        return ContextOptimizer(**{**self.options(), **overrides})
+
+    def fetch_count(self, max_contexts: int) -> int:
+        """How many contexts to retrieve so that max_contexts can be selected."""
+        return max_contexts * self.candidate_multiplier if self.enabled else max_contexts
+
+    def _merge(self, contexts: List[Context]) -> List[Context]:
+        """Merge overlapping chunks per source; a merged chunk keeps its best rank."""
+        merged: List[Context] = []
+        for source, text in contexts:
+            while True:
+                for i, (kept_source, kept_text) in enumerate(merged):
+                    if kept_source != source:
+                        continue
+                    combined = _merge_pair(kept_text, text, self.min_overlap_chars)
+                    if combined is not None:
+                        # Fold the earlier chunk into this one and retry against the rest
+                        del merged[i]
+                        text = combined
+                        break
+                else:
+                    break
+            merged.append((source, text))
+        # Restore rank order: each merged chunk sits where its best-ranked part was
+        order = {text: rank for rank, (_, text) in enumerate(contexts)}
+        return sorted(merged, key=lambda context: min(
+            (rank for part, rank in order.items() if part in context[1]), default=len(contexts)
+        ))
+
+    def _drop_duplicates(self, contexts: List[Context]) -> List[Context]:
+        kept: List[Context] = []
+        kept_shingles: List[Set[Tuple[str, ...]]] = []
+        for source, text in contexts:
+            shingles = _shingles(text)
+            duplicate = any(
+                len(shingles & other) / (min(len(shingles), len(other)) or 1) >= self.duplicate_threshold
+                for other in kept_shingles
+            )
+            if not duplicate:
+                kept.append((source, text))
+                kept_shingles.append(shingles)
+        return kept
+
+    def _mmr(self, query: str, contexts: List[Context], k: int) -> List[Context]:
+        if len(contexts) <= 1 or self.mmr_lambda >= 1.0:
+            return contexts[:k]
+        query_terms = frozenset(tokenize(query))
+        terms = [frozenset(tokenize(text)) for _, text in contexts]
+        count = len(contexts)
+        relevance = [
+            0.5 * (1.0 - rank / count)
+            + 0.5 * (len(query_terms & doc_terms) / len(query_terms) if query_terms else 0.0)
+            for rank, doc_terms in enumerate(terms)
+        ]
+
+        selected: List[int] = []
+        remaining = list(range(count))
+        while remaining and len(selected) < k:
+            best = max(remaining, key=lambda i: (
+                self.mmr_lambda * relevance[i]
+                - (1.0 - self.mmr_lambda) * max((_jaccard(terms[i], terms[j]) for j in selected), default=0.0)
+            ))
+            selected.append(best)
+            remaining.remove(best)
+        return [contexts[i] for i in selected]
+
+    def optimize(self, query: str, contexts: List[Context], max_contexts: int) -> Tuple[List[Context], Dict[str, int]]:
+        """
+        Args:
+            query: The question contexts were retrieved for
+            contexts: (source, text) pairs in retrieval order
+            max_contexts: Contexts to keep
+
+        Returns:
+            (selected contexts, report) where the report counts merged and dropped
+            contexts and the tokens saved compared with the first max_contexts raw contexts
+        """
+        baseline = sum(estimate_tokens(text) for _, text in contexts[:max_contexts])
+        report = {"retrieved": len(contexts), "merged": 0, "duplicates": 0, "selected": 0,
+                  "tokens_before": baseline, "tokens_after": baseline, "tokens_saved": 0}
+        if not self.enabled or not contexts:
+            selected = contexts[:max_contexts]
+            report["selected"] = len(selected)
+            return selected, report
+
+        working = contexts
+        if self.merge_overlaps:
+            working = self._merge(working)
+            report["merged"] = len(contexts) - len(working)
+        if self.duplicate_threshold < 1.0:
+            deduplicated = self._drop_duplicates(working)
+            report["duplicates"] = len(working) - len(deduplicated)
+            working = deduplicated
+        selected = self._mmr(query, working, max_contexts)
+
+        report["selected"] = len(selected)
+        report["tokens_after"] = sum(estimate_tokens(text) for _, text in selected)
+        report["tokens_saved"] = baseline - report["tokens_after"]
+        return selected, report
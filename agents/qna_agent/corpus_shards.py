@@ -0,0 +1,158 @@
+"""
+Optional per-team / per-category sharding of the RAG corpus.
+
+With sharding enabled, documents are imported into one Vertex RAG corpus per
+shard instead of a single corpus, so each query searches a smaller index and a
+shard can be re-imported on its own. GCS layout, hash manifest and local
+indexes stay shared; only the import target changes.
+
+Routing is a pure function of the object path relative to the corpus prefix:
+
+- ``team_a/guide.md`` (synced from ``knowledge_base/team_a/``) -> ``team_a``
+- ``documents/<category>/<file>`` (Slack-added with a category) -> ``<category>``
+- top-level files and ``documents/<file>`` -> ``default`` (the original corpus)
+
+Shard corpora are named ``<corpus_name>--<shard>``; their resource names are
+cached in ``shards.json`` next to the corpus cache.
+"""
+import re
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from vertexai.preview import rag
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD = "default"
+
+# doc_type values that mean "no particular category"
+UNSHARDED_DOC_TYPES = ("text", "markdown")
+
+_SLUG_RE = re.compile(r"[^a-z0-9_]+")
+
+
+def shard_slug(name: str) -> str:
+    """Shard name for a team directory or category ("Team Updates" -> "team-updates")."""
+    return _SLUG_RE.sub("-", name.strip().lower()).strip("-") or DEFAULT_SHARD
+
+
+class CorpusShards:
+    """
+    Shard routing plus a persisted shard -> RagCorpus resource name registry.
+    """
+
+    def __init__(self,
+                 corpus_name: str,
+                 cache_path: str,
+                 create_corpus: Callable[[str], Any],
+                 enabled: bool = False,
+                 max_shards: int = 20):
+        """
+        Args:
+            corpus_name: Display name of the default corpus (shards are "<corpus_name>--<shard>")
+            cache_path: JSON file caching shard resource names
+            create_corpus: Creates a corpus with the given display name and returns it
+            enabled: Route by path/category; when False everything goes to the default corpus
+            max_shards: Shards allowed besides the default one; new names past the cap go to default
+        """
+        self.corpus_name = corpus_name
+        self.cache_path = Path(cache_path)
+        self.create_corpus = create_corpus
+        self.enabled = enabled
+        self.max_shards = max_shards
+
+        self._lock = threading.Lock()
+        self._registry: Dict[str, str] = self._load() if enabled else {}
+
+    def _load(self) -> Dict[str, str]:
+        try:
+            if self.cache_path.exists():
+                return json.loads(self.cache_path.read_text(encoding="utf-8")).get("shards", {})
+        except Exception as e:
+            logger.warning(f"⚠️ Ignoring unreadable shard cache: {str(e)}")
+        return self._discover()
+
+    def _discover(self) -> Dict[str, str]:
+        """Find existing shard corpora with a single list_corpora call."""
+        prefix = f"{self.corpus_name}--"
+        try:
+            registry = {
+                corpus.display_name[len(prefix):]: corpus.name
+                for corpus in rag.list_corpora()
+                if corpus.display_name.startswith(prefix)
+            }
+        except Exception as e:
+            logger.warning(f"⚠️ Could not list shard corpora: {str(e)}")
+            return {}
+        self._save(registry)
+        return registry
+
+    def _save(self, registry: Dict[str, str]):
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self.cache_path.write_text(json.dumps({"shards": registry}), encoding="utf-8")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to cache shard names: {str(e)}")
+
+    def display_name(self, shard: str) -> str:
+        return self.corpus_name if shard == DEFAULT_SHARD else f"{self.corpus_name}--{shard}"
+
+    def _admit(self, shard: str) -> str:
+        with self._lock:
+            if shard == DEFAULT_SHARD or shard in self._registry or len(self._registry) < self.max_shards:
+                return shard
+        logger.warning(f"⚠️ Shard limit ({self.max_shards}) reached, routing '{shard}' to {DEFAULT_SHARD}")
+        return DEFAULT_SHARD
+
+    def route_path(self, rel_path: str) -> str:
+        """Shard of an object path relative to the corpus prefix."""
+        if not self.enabled:
+            return DEFAULT_SHARD
+        parts = rel_path.split("/")
+        if parts[0] == "documents":
+            parts = parts[1:]
+        return self._admit(shard_slug(parts[0])) if len(parts) > 1 else DEFAULT_SHARD
+
+    def route_category(self, doc_type: Optional[str]) -> str:
+        """Shard of a Slack-added document with this doc_type/category."""
+        if not self.enabled or not doc_type or doc_type.strip().lower() in UNSHARDED_DOC_TYPES:
+            return DEFAULT_SHARD
+        return self._admit(shard_slug(doc_type))
+
+    def known(self) -> List[str]:
+        """Every shard that currently has a corpus, default first."""
+        with self._lock:
+            return [DEFAULT_SHARD] + sorted(self._registry)
+
+    def corpus_name_for(self, shard: str, default_corpus_name: str, create: bool = False) -> Optional[str]:
+        """
+        Resource name of a shard's corpus, creating it when ``create`` is set.
+
+        Args:
+            shard: Shard name
+            default_corpus_name: Resource name of the default corpus
+            create: Create the shard corpus if it doesn't exist yet
+        """
+        if shard == DEFAULT_SHARD:
+            return default_corpus_name
+        with self._lock:
+            name = self._registry.get(shard)
+            if name or not create:
+                return name
+            corpus = self.create_corpus(self.display_name(shard))
+            self._registry[shard] = corpus.name
+            self._save(dict(self._registry))
+            logger.info(f"✅ Created shard corpus: {self.display_name(shard)}")
+            return corpus.name
+
+    def forget(self, shard: Optional[str] = None):
+        """Drop one shard (or all of them) from the registry after its corpus was deleted."""
+        with self._lock:
+            if shard is None:
+                self._registry.clear()
+            else:
+                self._registry.pop(shard, None)
+            self._save(dict(self._registry))
@@ -0,0 +1,226 @@
+"""
+Coalescing batcher for TextEmbeddingModel.get_embeddings.
+
+Callers on any thread submit texts and block on the result. A dispatcher
+thread gathers everything submitted within a short linger window and sends it
+as API-sized batches, bounded by input count and estimated tokens. Texts longer
+than the per-input token limit are split and their piece embeddings combined.
+"""
+import queue
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .model_registry import model_registry
+from .resilience import resilience, VERTEX_EMBEDDINGS
+
+logger = logging.getLogger(__name__)
+
+
+class _Item:
+    __slots__ = ("text", "task_type", "tokens", "future")
+
+    def __init__(self, text: str, task_type: str, tokens: int):
+        self.text = text
+        self.task_type = task_type
+        self.tokens = tokens
+        self.future: Future = Future()
+
+
+class EmbeddingBatcher:
+    """
+    Thread-safe embedding client that turns many small requests into few large ones.
+    """
+
+    def __init__(self,
+                 model_name: str,
+                 max_batch_size: int = 250,
+                 max_batch_tokens: int = 20000,
+                 max_input_tokens: int = 2048,
+                 linger_ms: float = 10.0,
+                 max_concurrent_requests: int = 4,
+                 chars_per_token: int = 4):
+        """
+        Args:
+            model_name: Embedding model passed to the model registry
+            max_batch_size: Maximum inputs per get_embeddings call
+            max_batch_tokens: Maximum estimated tokens per get_embeddings call
+            max_input_tokens: Longer texts are split into pieces of at most this many tokens
+            linger_ms: How long the dispatcher waits for more texts before sending a batch
+            max_concurrent_requests: get_embeddings calls allowed in flight at once
+            chars_per_token: Characters per token used for estimates
+        """
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_input_tokens = max_input_tokens
+        self.linger_seconds = linger_ms / 1000.0
+        self.max_concurrent_requests = max_concurrent_requests
+        self.chars_per_token = chars_per_token
+
+        self._queue: "queue.Queue[Optional[_Item]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._request_pool: Optional[ThreadPoolExecutor] = None
+        self._counters = {"texts": 0, "split_texts": 0, "inputs": 0, "requests": 0, "failed_requests": 0}
+
+    def _estimate_tokens(self, text: str) -> int:
+        return max(1, len(text) // self.chars_per_token)
+
+    def split(self, text: str) -> List[str]:
+        """Split ``text`` into pieces that fit the per-input token limit, preferring whitespace."""
+        max_chars = self.max_input_tokens * self.chars_per_token
+        if len(text) <= max_chars:
+            return [text]
+
+        pieces = []
+        start = 0
+        while start < len(text):
+            end = min(start + max_chars, len(text))
+            if end < len(text):
+                boundary = text.rfind(" ", start + max_chars // 2, end)
+                if boundary > start:
+                    end = boundary
+            pieces.append(text[start:end])
+            start = end
+        return pieces
+
+    def embed(self, texts: Sequence[str], task_type: str = "RETRIEVAL_DOCUMENT") -> List[np.ndarray]:
+        """
+        Embed ``texts`` and return one float32 vector per text, in order.
+
+        Texts split into several pieces get the length-weighted mean of their
+        piece embeddings, re-normalized to unit length.
+        """
+        self._ensure_started()
+
+        submitted = []
+        for text in texts:
+            pieces = self.split(text)
+            items = [_Item(piece, task_type, self._estimate_tokens(piece)) for piece in pieces]
+            for item in items:
+                self._queue.put(item)
+            submitted.append(items)
+
+        with self._lock:
+            self._counters["texts"] += len(submitted)
+            self._counters["split_texts"] += sum(1 for items in submitted if len(items) > 1)
+
+        vectors = []
+        for items in submitted:
+            piece_vectors = [np.asarray(item.future.result(), dtype=np.float32) for item in items]
+            if len(piece_vectors) == 1:
+                vectors.append(piece_vectors[0])
+                continue
+            weights = np.array([len(item.text) for item in items], dtype=np.float32)
+            combined = np.average(np.stack(piece_vectors), axis=0, weights=weights)
+            norm = float(np.linalg.norm(combined))
+            vectors.append((combined / norm if norm > 0 else combined).astype(np.float32))
+        return vectors
+
+    def embed_one(self, text: str, task_type: str = "RETRIEVAL_DOCUMENT") -> np.ndarray:
+        """Embed a single text; concurrent callers still share batches."""
+        return self.embed([text], task_type)[0]
+
+    def _ensure_started(self):
+        if self._dispatcher is not None:
+            return
+        with self._lock:
+            if self._dispatcher is None:
+                self._request_pool = ThreadPoolExecutor(
+                    max_workers=self.max_concurrent_requests, thread_name_prefix="embed"
+                )
+                self._dispatcher = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._dispatcher.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            # Linger briefly so concurrent callers land in the same batch
+            pending = [item]
+            deadline = time.monotonic() + self.linger_seconds
+            while len(pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                pending.append(item)
+
+            for batch in self._pack(pending):
+                self._request_pool.submit(self._send, batch)
+
+    def _pack(self, items: List[_Item]) -> List[List[_Item]]:
+        """Group items by task type into batches within the count and token limits."""
+        by_task: Dict[str, List[_Item]] = {}
+        for item in items:
+            by_task.setdefault(item.task_type, []).append(item)
+
+        batches = []
+        for task_items in by_task.values():
+            batch, batch_tokens = [], 0
+            for item in task_items:
+                if batch and (len(batch) >= self.max_batch_size
+                              or batch_tokens + item.tokens > self.max_batch_tokens):
+                    batches.append(batch)
+                    batch, batch_tokens = [], 0
+                batch.append(item)
+                batch_tokens += item.tokens
+            if batch:
+                batches.append(batch)
+        return batches
+
+    def _send(self, batch: List[_Item]):
+        from vertexai.language_models import TextEmbeddingInput
+
+        try:
+            embedding_model = model_registry.embedding_model(self.model_name)
+            inputs = [TextEmbeddingInput(text=item.text, task_type=item.task_type) for item in batch]
+
+            def embed():
+                with model_registry.track(self.model_name):
+                    return embedding_model.get_embeddings(inputs)
+
+            embeddings = resilience[VERTEX_EMBEDDINGS].call(embed)
+            for item, embedding in zip(batch, embeddings):
+                item.future.set_result(embedding.values)
+            with self._lock:
+                self._counters["requests"] += 1
+                self._counters["inputs"] += len(batch)
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding batch of {len(batch)} inputs failed: {str(e)}")
+            with self._lock:
+                self._counters["failed_requests"] += 1
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+
+    def close(self):
+        """Stop the dispatcher after it drains queued texts."""
+        with self._lock:
+            dispatcher, pool = self._dispatcher, self._request_pool
+            self._dispatcher = self._request_pool = None
+        if dispatcher is not None:
+            self._queue.put(None)
+            dispatcher.join()
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, float]:
+        """Request/input counters plus the mean inputs per request."""
+        with self._lock:
+            requests = self._counters["requests"]
+            return {
+                **self._counters,
+                "mean_batch_size": self._counters["inputs"] / requests if requests else 0.0,
+            }
@@ -0,0 +1,264 @@
+"""
+Local, memory-mapped embedding index used for semantic deduplication.
+
+Vectors are stored L2-normalised in one contiguous float32 matrix
+(``embeddings.f32``) so a cosine similarity search over the whole corpus is a
+single matrix-vector product. Row ids and metadata live in an append-only JSONL
+sidecar (``embeddings.jsonl``), and the vector dimension is recorded in
+``embeddings.json``.
+
+``encode_embedding``/``decode_embedding`` define the compact binary format
+used for the per-document embedding objects persisted in GCS.
+"""
+import os
+import json
+import struct
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+# Binary embedding object: magic, format version, dtype code, reserved, dimension
+EMBEDDING_MAGIC = b"ELEM"
+EMBEDDING_FORMAT_VERSION = 1
+_EMBEDDING_HEADER = struct.Struct("<4sBBHI")
+_EMBEDDING_DTYPES = {0: np.dtype("<f4"), 1: np.dtype("<f2")}
+_EMBEDDING_DTYPE_CODES = {dtype: code for code, dtype in _EMBEDDING_DTYPES.items()}
+
+
+def encode_embedding(vector, dtype: str = "float16") -> bytes:
+    """Serialize a vector as a 12-byte header followed by raw little-endian floats."""
+    np_dtype = np.dtype(dtype).newbyteorder("<")
+    if np_dtype not in _EMBEDDING_DTYPE_CODES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    values = np.asarray(vector, dtype=np_dtype).reshape(-1)
+    header = _EMBEDDING_HEADER.pack(
+        EMBEDDING_MAGIC, EMBEDDING_FORMAT_VERSION, _EMBEDDING_DTYPE_CODES[np_dtype], 0, values.shape[0]
+    )
+    return header + values.tobytes()
+
+
+def decode_embedding(data: bytes) -> np.ndarray:
+    """Zero-copy view over an encoded embedding (see encode_embedding)."""
+    magic, version, dtype_code, _, dim = _EMBEDDING_HEADER.unpack_from(data)
+    if magic != EMBEDDING_MAGIC:
+        raise ValueError("Not an encoded embedding")
+    if version != EMBEDDING_FORMAT_VERSION or dtype_code not in _EMBEDDING_DTYPES:
+        raise ValueError(f"Unsupported embedding format: version={version} dtype={dtype_code}")
+    return np.frombuffer(data, dtype=_EMBEDDING_DTYPES[dtype_code], count=dim, offset=_EMBEDDING_HEADER.size)
+
+
+class EmbeddingIndex:
+    """
+    Append-only float32 embedding matrix with an id/metadata sidecar.
+
+    Rows are appended incrementally with ``add`` and searched with ``search``.
+    The matrix is memory-mapped read-only and re-mapped lazily after writes.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = Path(index_dir)
+        self.matrix_path = self.index_dir / "embeddings.f32"
+        self.sidecar_path = self.index_dir / "embeddings.jsonl"
+        self.header_path = self.index_dir / "embeddings.json"
+
+        self._lock = threading.RLock()
+        self._dim: Optional[int] = None
+        self._ids: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._load()
+
+    # ------------------------------------------------------------------ #
+    # Persistence
+    # ------------------------------------------------------------------ #
+    def exists(self) -> bool:
+        """Whether an index has been written to disk (even if empty)."""
+        return self.header_path.exists()
+
+    def _load(self):
+        """Load the header and sidecar, truncating any half-written rows."""
+        if not self.header_path.exists():
+            return
+
+        try:
+            header = json.loads(self.header_path.read_text(encoding="utf-8"))
+            if header.get("version") != INDEX_VERSION:
+                logger.warning(f"⚠️ Ignoring embedding index with unsupported version: {header.get('version')}")
+                return
+            self._dim = header.get("dim") or None
+
+            if self.sidecar_path.exists():
+                with open(self.sidecar_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            row = json.loads(line)
+                        except json.JSONDecodeError:
+                            break  # partial trailing line from an interrupted write
+                        self._ids.append(row.pop("id"))
+                        self._metadata.append(row)
+
+            # Keep the matrix and the sidecar consistent after a crash mid-append
+            if self._dim:
+                row_bytes = self._dim * 4
+                matrix_rows = self.matrix_path.stat().st_size // row_bytes if self.matrix_path.exists() else 0
+                count = min(matrix_rows, len(self._ids))
+                if count != matrix_rows or count != len(self._ids):
+                    logger.warning(f"⚠️ Embedding index out of sync, truncating to {count} rows")
+                    self._ids = self._ids[:count]
+                    self._metadata = self._metadata[:count]
+                    self._truncate(count)
+
+            logger.info(f"📐 Loaded embedding index with {len(self._ids)} vectors")
+
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to load embedding index, starting empty: {str(e)}")
+            self._dim = None
+            self._ids = []
+            self._metadata = []
+
+    def _truncate(self, count: int):
+        """Rewrite both files so they hold exactly ``count`` rows."""
+        assert self._dim is not None
+        if self.matrix_path.exists():
+            with open(self.matrix_path, "r+b") as f:
+                f.truncate(count * self._dim * 4)
+        self._write_sidecar(self._ids, self._metadata, self.sidecar_path)
+
+    def _write_sidecar(self, ids: List[str], metadata: List[Dict[str, Any]], path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            for row_id, meta in zip(ids, metadata):
+                f.write(json.dumps({"id": row_id, **meta}) + "\n")
+
+    def _write_header(self, dim: int, path: Path):
+        path.write_text(json.dumps({"version": INDEX_VERSION, "dim": dim}), encoding="utf-8")
+
+    def _get_matrix(self) -> Optional[np.ndarray]:
+        """Return the memory-mapped matrix, mapping it on first use."""
+        if self._matrix is None and self._ids and self._dim:
+            self._matrix = np.memmap(
+                self.matrix_path, dtype=np.float32, mode="r",
+                shape=(len(self._ids), self._dim)
+            )
+        return self._matrix
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        """Convert to a unit-length float32 row so dot product == cosine."""
+        vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vec))
+        if norm > 0:
+            vec = vec / norm
+        return vec
+
+    # ------------------------------------------------------------------ #
+    # Public API
+    # ------------------------------------------------------------------ #
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, row_id: str, vector, metadata: Optional[Dict[str, Any]] = None):
+        """Append one vector and its metadata to the index."""
+        vec = self._normalize(vector)
+
+        with self._lock:
+            if not self._dim:
+                self.index_dir.mkdir(parents=True, exist_ok=True)
+                self._dim = int(vec.shape[0])
+                self._write_header(self._dim, self.header_path)
+            elif vec.shape[0] != self._dim:
+                raise ValueError(f"Embedding dimension {vec.shape[0]} does not match index dimension {self._dim}")
+
+            # Matrix first, sidecar second: _load() truncates to the shorter of the two
+            with open(self.matrix_path, "ab") as f:
+                f.write(vec.tobytes())
+            with open(self.sidecar_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"id": row_id, **(metadata or {})}) + "\n")
+
+            self._ids.append(row_id)
+            self._metadata.append(dict(metadata or {}))
+            self._matrix = None  # re-map on next search
+
+    def search(self, vector, k: int = 1) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Return the top-k most similar rows as (id, cosine_similarity, metadata).
+        """
+        with self._lock:
+            matrix = self._get_matrix()
+            if matrix is None:
+                return []
+
+            query = self._normalize(vector)
+            if query.shape[0] != self._dim:
+                raise ValueError(f"Query dimension {query.shape[0]} does not match index dimension {self._dim}")
+
+            scores = matrix @ query
+            k = min(k, scores.shape[0])
+            if k < scores.shape[0]:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(scores.shape[0])
+            top = top[np.argsort(-scores[top])]
+
+            return [(self._ids[i], float(scores[i]), self._metadata[i]) for i in top]
+
+    def vectors(self, row_ids: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Return the stored unit vectors of the given ids (ids not in the index are omitted)."""
+        wanted = set(row_ids)
+        with self._lock:
+            matrix = self._get_matrix()
+            if matrix is None:
+                return {}
+            return {row_id: np.array(matrix[i]) for i, row_id in enumerate(self._ids) if row_id in wanted}
+
+    def rebuild(self, rows: Iterable[Tuple[str, Any, Dict[str, Any]]]) -> int:
+        """
+        Replace the whole index with ``rows`` of (id, vector, metadata).
+
+        Files are written next to the live index and swapped in atomically,
+        so searches keep working against the old index until the rebuild ends.
+        """
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        tmp_matrix = self.matrix_path.with_suffix(".f32.tmp")
+        tmp_sidecar = self.sidecar_path.with_suffix(".jsonl.tmp")
+        tmp_header = self.header_path.with_suffix(".json.tmp")
+
+        ids: List[str] = []
+        metadata: List[Dict[str, Any]] = []
+        dim: Optional[int] = None
+
+        with open(tmp_matrix, "wb") as f:
+            for row_id, vector, meta in rows:
+                vec = self._normalize(vector)
+                if dim is None:
+                    dim = int(vec.shape[0])
+                elif vec.shape[0] != dim:
+                    logger.warning(f"⚠️ Skipping {row_id}: dimension {vec.shape[0]} != {dim}")
+                    continue
+                f.write(vec.tobytes())
+                ids.append(row_id)
+                metadata.append(dict(meta or {}))
+
+        self._write_sidecar(ids, metadata, tmp_sidecar)
+        self._write_header(dim or 0, tmp_header)
+
+        with self._lock:
+            self._matrix = None
+            os.replace(tmp_matrix, self.matrix_path)
+            os.replace(tmp_sidecar, self.sidecar_path)
+            os.replace(tmp_header, self.header_path)
+            self._dim = dim
+            self._ids = ids
+            self._metadata = metadata
+
+        logger.info(f"📐 Rebuilt embedding index with {len(ids)} vectors")
+        return len(ids)
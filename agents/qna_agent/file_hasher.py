@@ -0,0 +1,140 @@
+"""
+SHA-256 file hashing service used by sync, hash-metadata rebuilds and the CLI.
+
+Files are read with large buffers (memory-mapped above a size threshold) and
+hashed on a thread pool; hashlib releases the GIL while digesting, so threads
+scale across cores without pickling file contents to worker processes.
+Digests are cached against (device, inode, size, mtime_ns) and persisted to a
+small JSON file, so unchanged files are never read twice.
+"""
+import os
+import mmap
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+
+class FileHasher:
+    """
+    Parallel, cached SHA-256 of local files.
+    """
+
+    def __init__(self,
+                 cache_path: Optional[str] = None,
+                 max_workers: Optional[int] = None,
+                 buffer_size: int = 1 << 20,
+                 mmap_threshold: int = 8 << 20,
+                 max_cache_entries: int = 200_000):
+        """
+        Args:
+            cache_path: JSON file persisting digests between runs (in-memory only if None)
+            max_workers: Hashing threads (defaults to the CPU count)
+            buffer_size: Read size for files below mmap_threshold
+            mmap_threshold: Files at least this large are memory-mapped
+            max_cache_entries: Cached digests kept when saving
+        """
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self.buffer_size = buffer_size
+        self.mmap_threshold = mmap_threshold
+        self.max_cache_entries = max_cache_entries
+
+        self._lock = threading.Lock()
+        self._cache: Dict[str, str] = self._load()
+        self._dirty = False
+        self._counters = {"hashed": 0, "cached": 0, "bytes_hashed": 0}
+
+    def _load(self) -> Dict[str, str]:
+        if not self.cache_path or not self.cache_path.exists():
+            return {}
+        try:
+            payload = json.loads(self.cache_path.read_text(encoding="utf-8"))
+            if payload.get("version") == CACHE_VERSION:
+                return payload.get("digests", {})
+        except Exception as e:
+            logger.warning(f"⚠️ Ignoring unreadable hash cache {self.cache_path}: {str(e)}")
+        return {}
+
+    @staticmethod
+    def _cache_key(stat: os.stat_result) -> str:
+        return f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _digest(self, file_path: str, size: int) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            if size >= self.mmap_threshold:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+            else:
+                buffer = bytearray(self.buffer_size)
+                view = memoryview(buffer)
+                while True:
+                    read = f.readinto(buffer)
+                    if not read:
+                        break
+                    digest.update(view[:read])
+        return digest.hexdigest()
+
+    def hash_file(self, file_path: str) -> str:
+        """SHA-256 hex digest of a file, served from the cache if its stat is unchanged."""
+        stat = os.stat(file_path)
+        key = self._cache_key(stat)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._counters["cached"] += 1
+                return cached
+
+        file_hash = self._digest(file_path, stat.st_size)
+        with self._lock:
+            self._cache[key] = file_hash
+            self._dirty = True
+            self._counters["hashed"] += 1
+            self._counters["bytes_hashed"] += stat.st_size
+        return file_hash
+
+    def _try_hash(self, file_path: str) -> Tuple[str, Optional[str]]:
+        try:
+            return file_path, self.hash_file(file_path)
+        except Exception as e:
+            logger.error(f"❌ Failed to calculate hash for {file_path}: {str(e)}")
+            return file_path, None
+
+    def hash_many(self, file_paths: Iterable[str]) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Hash files in parallel, yielding (path, digest or None on error) in input order.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="hash") as pool:
+            yield from pool.map(self._try_hash, (str(path) for path in file_paths))
+
+    def save(self):
+        """Persist the digest cache if it changed."""
+        if not self.cache_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            # Keep the most recently added digests
+            digests = dict(list(self._cache.items())[-self.max_cache_entries:])
+            self._cache = digests
+            payload = json.dumps({"version": CACHE_VERSION, "digests": digests})
+            self._dirty = False
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(".tmp")
+            tmp_path.write_text(payload, encoding="utf-8")
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to save hash cache: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "cache_entries": len(self._cache)}
@@ -0,0 +1,278 @@
+"""
+Content-hash manifest stored as a single JSON object in the corpus bucket.
+
+Replaces per-blob ``blob.reload()`` calls for exact-duplicate detection: the
+manifest maps ``file_hash -> {path, size, generation, doc_type, created_at}``,
+is cached in-process, written with GCS generation preconditions (optimistic
+concurrency) and reconciled against a bucket listing in a background thread.
+"""
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from google.api_core.exceptions import NotFound, PreconditionFailed
+
+from .resilience import resilience, GCS
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+class HashManifest:
+    """
+    In-process cache of the bucket's content-hash manifest.
+
+    Lookups are plain dict reads. Writes re-apply the change on top of the
+    latest remote copy whenever another writer got there first.
+    """
+
+    def __init__(self,
+                 bucket,
+                 corpus_name: str,
+                 reconcile_interval: float = 3600.0,
+                 max_write_attempts: int = 5):
+        """
+        Args:
+            bucket: google.cloud.storage Bucket holding the corpus
+            corpus_name: Corpus prefix inside the bucket
+            reconcile_interval: Seconds before the manifest is re-checked against a listing
+            max_write_attempts: Attempts before giving up on a contended read or write
+        """
+        self.bucket = bucket
+        self.corpus_name = corpus_name
+        self.prefix = f"{corpus_name}/"
+        # Kept outside the corpus prefix so it never shows up in corpus listings
+        self.blob_name = f"_manifests/{corpus_name}/file_hashes.json"
+        self.reconcile_interval = reconcile_interval
+        self.max_write_attempts = max_write_attempts
+
+        self._lock = threading.RLock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._generation = 0  # 0 means "object must not exist yet" for preconditions
+        self._reconciled_at = 0.0
+        self._reconciling = False
+        # Hashes recorded or removed locally while a reconcile listing is in flight
+        self._listing_changes: List[Set[str]] = []
+
+    # ------------------------------------------------------------------ #
+    # Remote I/O
+    # ------------------------------------------------------------------ #
+    def _fetch(self) -> Tuple[Dict[str, Dict[str, Any]], int, float]:
+        """Download the manifest, returning (entries, generation, reconciled_at)."""
+        for attempt in range(self.max_write_attempts):
+            blob = self.bucket.get_blob(self.blob_name)
+            if blob is None:
+                return {}, 0, 0.0
+            try:
+                payload = json.loads(blob.download_as_bytes(if_generation_match=blob.generation))
+                break
+            except (NotFound, PreconditionFailed):
+                # Replaced or deleted between the metadata read and the download
+                if attempt + 1 >= self.max_write_attempts:
+                    raise
+                logger.debug("🔁 Hash manifest changed during download, retrying read")
+        if payload.get("version") != MANIFEST_VERSION:
+            logger.warning(f"⚠️ Ignoring hash manifest with unsupported version: {payload.get('version')}")
+            return {}, blob.generation, 0.0
+        return payload.get("entries", {}), blob.generation, payload.get("reconciled_at", 0.0)
+
+    def _save(self, mutate: Callable[[Dict[str, Dict[str, Any]]], None], reconciled_at: Optional[float] = None):
+        """
+        Apply ``mutate`` to the manifest and persist it with a generation precondition.
+        On conflict the latest remote copy is fetched and the mutation re-applied.
+
+        The lock only guards the in-process copy: uploads and re-fetches run
+        without it, so lookups never wait on GCS. Generations are compared when
+        swapping the result in, so a newer copy installed meanwhile is kept.
+        """
+        for _ in range(self.max_write_attempts):
+            with self._lock:
+                self._ensure_loaded(reconcile=False)
+                assert self._entries is not None
+                generation = self._generation
+                entries = dict(self._entries)
+                mutate(entries)
+                stamp = reconciled_at if reconciled_at is not None else self._reconciled_at
+            payload = json.dumps(
+                {"version": MANIFEST_VERSION, "reconciled_at": stamp, "entries": entries},
+                separators=(",", ":")
+            )
+
+            blob = self.bucket.blob(self.blob_name)
+            try:
+                # Guarded by the generation precondition, so retrying can't overwrite a newer copy
+                resilience[GCS].call(lambda: blob.upload_from_string(
+                    payload,
+                    content_type="application/json",
+                    if_generation_match=generation
+                ))
+            except PreconditionFailed:
+                logger.debug("🔁 Hash manifest changed remotely, retrying write")
+                fetched = self._fetch()
+                with self._lock:
+                    # Another thread may already have installed an even newer copy
+                    if self._generation == generation or fetched[1] > self._generation:
+                        self._entries, self._generation, self._reconciled_at = fetched
+                continue
+
+            with self._lock:
+                if blob.generation > self._generation:
+                    self._entries = entries
+                    self._generation = blob.generation
+                    self._reconciled_at = stamp
+            return
+
+        # Keep the change locally so this process still deduplicates correctly
+        logger.warning(f"⚠️ Could not persist hash manifest after {self.max_write_attempts} attempts")
+        with self._lock:
+            if self._entries is not None:
+                mutate(self._entries)
+
+    def _ensure_loaded(self, reconcile: bool = True):
+        if self._entries is None:
+            self._entries, self._generation, self._reconciled_at = self._fetch()
+            logger.info(f"📋 Loaded hash manifest with {len(self._entries)} entries")
+        if reconcile and not self._reconciling and time.time() - self._reconciled_at > self.reconcile_interval:
+            # The listing covers the whole corpus; lookups keep using the cached copy meanwhile
+            self._reconciling = True
+            threading.Thread(target=self._background_reconcile, name="hash-manifest-reconcile", daemon=True).start()
+
+    def _touch(self, file_hashes: Iterable[str]):
+        """Note local changes so an in-flight reconcile doesn't undo them."""
+        file_hashes = list(file_hashes)
+        with self._lock:
+            for changes in self._listing_changes:
+                changes.update(file_hashes)
+
+    def _background_reconcile(self):
+        try:
+            self.reconcile()
+        except Exception as e:
+            logger.warning(f"⚠️ Hash manifest reconcile failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._reconciling = False
+
+    # ------------------------------------------------------------------ #
+    # Public API
+    # ------------------------------------------------------------------ #
+    def reconcile(self) -> int:
+        """
+        Rebuild the manifest from a single listing of the corpus prefix.
+        Listings already carry custom metadata, so no per-blob reload is needed.
+        The listing runs without the manifest lock; hashes recorded or removed
+        meanwhile keep their local state instead of the listed one.
+        """
+        changes: Set[str] = set()
+        with self._lock:
+            self._ensure_loaded(reconcile=False)
+            assert self._entries is not None
+            before = set(self._entries)
+            self._listing_changes.append(changes)
+
+        try:
+            return self._reconcile_listing(before, changes)
+        finally:
+            with self._lock:
+                self._listing_changes.remove(changes)
+
+    def _reconcile_listing(self, before: Set[str], changes: Set[str]) -> int:
+        listed: Dict[str, Dict[str, Any]] = {}
+        for blob in self.bucket.list_blobs(prefix=self.prefix):
+            metadata = blob.metadata or {}
+            file_hash = metadata.get("file_hash")
+            if not file_hash:
+                # Same fallback as files uploaded before hash tracking existed
+                file_hash = hashlib.sha256(f"{blob.name}_{blob.size}".encode()).hexdigest()
+            created_at = metadata.get("created_at")
+            if not created_at and blob.time_created:
+                created_at = blob.time_created.isoformat()
+            listed[file_hash] = {
+                "path": blob.name[len(self.prefix):],
+                "size": blob.size,
+                "generation": blob.generation,
+                "doc_type": metadata.get("doc_type") or metadata.get("custom_doc_type"),
+                "created_at": created_at,
+            }
+
+        def replace(entries: Dict[str, Dict[str, Any]]):
+            # Removed during the listing: absent from entries, so not resurrected from it
+            kept = {h: e for h, e in entries.items() if h in changes or h not in before}
+            fresh = {h: e for h, e in listed.items() if h not in changes}
+            entries.clear()
+            entries.update(fresh)
+            entries.update(kept)
+
+        self._save(replace, reconciled_at=time.time())
+        logger.info(f"📋 Reconciled hash manifest: {len(listed)} entries")
+        return len(listed)
+
+    def lookup(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Return the manifest entry for a content hash, if any."""
+        with self._lock:
+            self._ensure_loaded()
+            assert self._entries is not None
+            return self._entries.get(file_hash)
+
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        """Return a snapshot of all manifest entries keyed by hash."""
+        with self._lock:
+            self._ensure_loaded()
+            assert self._entries is not None
+            return dict(self._entries)
+
+    def hashes(self) -> Dict[str, str]:
+        """Return a mapping of hash -> path relative to the corpus prefix."""
+        return {file_hash: entry["path"] for file_hash, entry in self.entries().items()}
+
+    def record(self,
+               file_hash: str,
+               path: str,
+               size: Optional[int] = None,
+               generation: Optional[int] = None,
+               doc_type: Optional[str] = None,
+               created_at: Optional[str] = None):
+        """Record a single uploaded blob in the manifest."""
+        self.record_many([(file_hash, {
+            "path": path,
+            "size": size,
+            "generation": generation,
+            "doc_type": doc_type,
+            "created_at": created_at or datetime.now().isoformat(),
+        })])
+
+    def record_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]):
+        """Record several uploaded blobs with a single manifest write."""
+        items = list(items)
+        if not items:
+            return
+        self._touch([file_hash for file_hash, _ in items])
+        self._save(lambda entries: entries.update(items))
+
+    def remove(self, file_hash: str):
+        """Drop a hash from the manifest (e.g. after its blob was deleted)."""
+        self._touch([file_hash])
+        self._save(lambda entries: entries.pop(file_hash, None))
+
+    def remove_many(self, file_hashes: Iterable[str]):
+        """Drop several hashes with a single manifest write."""
+        file_hashes = list(file_hashes)
+        if not file_hashes:
+            return
+        self._touch(file_hashes)
+
+        def drop(entries: Dict[str, Dict[str, Any]]):
+            for file_hash in file_hashes:
+                entries.pop(file_hash, None)
+
+        self._save(drop)
+
+    def invalidate(self):
+        """Forget the in-process copy so the next access re-downloads it."""
+        with self._lock:
+            self._entries = None
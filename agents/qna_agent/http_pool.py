@@ -0,0 +1,219 @@
+"""
+Pooled, time-bounded HTTP for the Vertex RAG REST calls, with optional hedging.
+
+HttpSettings sizes both clients used for ``:retrieveContexts`` from one place:
+the sync AuthorizedSession (requests/urllib3 connection pool) and the async
+aiohttp session (TCPConnector limit and idle keep-alive). Every call gets a
+connect and a read timeout, so a stalled request can no longer hang an answer.
+
+Hedger sends a second identical request when the first hasn't answered after
+the recent p95 latency and returns whichever finishes first. The delay adapts
+from a rolling window of successful latencies; until enough samples exist the
+maximum delay is used. Only idempotent reads should be hedged.
+"""
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+import aiohttp
+import numpy as np
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class HttpSettings:
+    """
+    Connection pool and timeout configuration shared by the sync and async clients.
+    """
+
+    def __init__(self,
+                 pool_size: int = 32,
+                 keepalive_seconds: float = 30.0,
+                 connect_timeout: float = 3.05,
+                 read_timeout: float = 20.0):
+        """
+        Args:
+            pool_size: Connections kept per host (and concurrent requests allowed) per client
+            keepalive_seconds: Idle seconds before an aiohttp connection is closed
+                (urllib3 keeps pooled connections until the server closes them)
+            connect_timeout: Seconds to establish a connection
+            read_timeout: Seconds to wait for the server between bytes of a response
+        """
+        self.pool_size = pool_size
+        self.keepalive_seconds = keepalive_seconds
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+    def options(self) -> Dict[str, Any]:
+        return {
+            "pool_size": self.pool_size,
+            "keepalive_seconds": self.keepalive_seconds,
+            "connect_timeout": self.connect_timeout,
+            "read_timeout": self.read_timeout,
+        }
+
+    def mount(self, session):
+        """Give a requests session (e.g. AuthorizedSession) a pool of ``pool_size`` connections."""
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        return session
+
+    def requests_timeout(self, read_timeout: Optional[float] = None) -> Tuple[float, float]:
+        """(connect, read) timeout for requests; ``read_timeout`` can only tighten the default."""
+        read = min(read_timeout, self.read_timeout) if read_timeout else self.read_timeout
+        return self.connect_timeout, read
+
+    def aiohttp_timeout(self, total: Optional[float] = None) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(total=total, sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+
+    def connector(self) -> aiohttp.TCPConnector:
+        return aiohttp.TCPConnector(
+            limit=self.pool_size,
+            keepalive_timeout=self.keepalive_seconds,
+            ttl_dns_cache=300,
+        )
+
+
+class Hedger:
+    """
+    Latency-adaptive request hedging for sync callables and async coroutine factories.
+    """
+
+    def __init__(self,
+                 enabled: bool = False,
+                 quantile: float = 0.95,
+                 min_delay: float = 0.05,
+                 max_delay: float = 2.0,
+                 window: int = 256,
+                 min_samples: int = 20,
+                 max_workers: int = 16):
+        """
+        Args:
+            enabled: Send hedged requests; when False calls run once and are only timed
+            quantile: Latency quantile after which the hedge is sent
+            min_delay: Lower bound of the hedge delay in seconds
+            max_delay: Upper bound of the hedge delay, also used before min_samples are seen
+            window: Successful latencies kept for the quantile estimate
+            min_samples: Samples needed before the quantile is trusted
+            max_workers: Threads running sync requests and their hedges
+        """
+        self.enabled = enabled
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=window)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._counters = {"requests": 0, "hedges_fired": 0, "hedges_won": 0}
+
+    def delay(self) -> float:
+        """Seconds to wait for the first request before hedging."""
+        with self._lock:
+            samples = list(self._latencies)
+        if len(samples) < self.min_samples:
+            return self.max_delay
+        return min(self.max_delay, max(self.min_delay, float(np.quantile(samples, self.quantile))))
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _observe(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _timed(self, fn: Callable[[], T]) -> T:
+        start = time.monotonic()
+        result = fn()
+        self._observe(time.monotonic() - start)
+        return result
+
+    async def _atimed(self, factory: Callable[[], Awaitable[T]]) -> T:
+        start = time.monotonic()
+        result = await factory()
+        self._observe(time.monotonic() - start)
+        return result
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="faq-hedge")
+            return self._executor
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """Run ``fn``, hedging it with a second call if it is slower than the hedge delay."""
+        self._count("requests")
+        if not self.enabled:
+            return self._timed(fn)
+
+        pool = self._pool()
+        primary = pool.submit(self._timed, fn)
+        done, _ = wait([primary], timeout=self.delay())
+        if done:
+            return primary.result()
+
+        hedge = pool.submit(self._timed, fn)
+        self._count("hedges_fired")
+        pending, errors = {primary, hedge}, []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedges_won")
+                    return future.result()
+                errors.append(future.exception())
+        raise errors[0]
+
+    async def acall(self, factory: Callable[[], Awaitable[T]]) -> T:
+        """Async call(): ``factory`` creates a fresh coroutine per attempt; the loser is cancelled."""
+        self._count("requests")
+        if not self.enabled:
+            return await self._atimed(factory)
+
+        primary = asyncio.ensure_future(self._atimed(factory))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.delay())
+            if done:
+                return primary.result()
+
+            hedge = asyncio.ensure_future(self._atimed(factory))
+            tasks.add(hedge)
+            self._count("hedges_fired")
+            pending, errors = set(tasks), []
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedges_won")
+                        return task.result()
+                    errors.append(task.exception())
+            raise errors[0]
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            samples = len(self._latencies)
+        return {**counters, "hedging": self.enabled, "hedge_delay": round(self.delay(), 3), "latency_samples": samples}
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
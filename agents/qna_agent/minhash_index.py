@@ -0,0 +1,219 @@
+"""
+Local MinHash/LSH index used as a near-duplicate prefilter for add_document.
+
+Each document is reduced to a MinHash signature over word shingles of its
+normalized text. Signatures are split into LSH bands so a lookup only compares
+documents that share at least one band, and the fraction of equal signature
+slots estimates their Jaccard similarity without any API call.
+
+Signatures live in an append-only uint32 matrix (``signatures.u32``) next to a
+JSONL id/metadata sidecar (``signatures.jsonl``) and a header with the
+signature parameters (``signatures.json``). Band buckets are rebuilt in memory
+on load.
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+NUM_PERM = 128
+BANDS = 32
+SHINGLE_SIZE = 3
+
+# Smallest prime above 2**32; (a * x + b) stays below 2**64 for 32-bit a, x and b
+_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 2**32 - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 2**32 - 1, size=NUM_PERM, dtype=np.uint64)
+
+
+def minhash_signature(normalized_text: str, shingle_size: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    MinHash signature (NUM_PERM uint32 values) of the word shingles in ``normalized_text``.
+
+    A module-level function so it can run in a process pool.
+    """
+    words = normalized_text.split()
+    if len(words) < shingle_size:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _PRIME & _MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def minhash_signatures(normalized_texts: List[str], processes: Optional[int] = None) -> List[np.ndarray]:
+    """
+    Compute many signatures on a process pool (used for bulk backfills).
+
+    Workers are spawned, not forked: forking a process that already runs gRPC
+    and worker threads can deadlock the child. ``processes=0`` computes the
+    signatures in the calling process instead.
+    """
+    if processes == 0 or len(normalized_texts) < 2:
+        return [minhash_signature(text) for text in normalized_texts]
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(minhash_signature, normalized_texts, chunksize=16))
+
+
+class MinHashIndex:
+    """
+    Append-only MinHash signature store with in-memory LSH band buckets.
+    """
+
+    def __init__(self, index_dir: str, bands: int = BANDS):
+        self.index_dir = Path(index_dir)
+        self.matrix_path = self.index_dir / "signatures.u32"
+        self.sidecar_path = self.index_dir / "signatures.jsonl"
+        self.header_path = self.index_dir / "signatures.json"
+        self.bands = bands
+        self.rows_per_band = NUM_PERM // bands
+
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._signatures = np.empty((0, NUM_PERM), dtype=np.uint32)
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        self._load()
+
+    def _header(self) -> Dict[str, Any]:
+        return {"version": INDEX_VERSION, "num_perm": NUM_PERM, "bands": self.bands, "shingle_size": SHINGLE_SIZE}
+
+    def exists(self) -> bool:
+        """Whether an index has been written to disk (even if empty)."""
+        return self.header_path.exists()
+
+    def _load(self):
+        """Load signatures and sidecar, dropping half-written rows."""
+        if not self.header_path.exists():
+            return
+        try:
+            if json.loads(self.header_path.read_text(encoding="utf-8")) != self._header():
+                logger.warning("⚠️ Ignoring MinHash index built with different parameters")
+                self.header_path.unlink()
+                return
+
+            if self.sidecar_path.exists():
+                with open(self.sidecar_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            row = json.loads(line)
+                        except json.JSONDecodeError:
+                            break  # partial trailing line from an interrupted write
+                        self._ids.append(row.pop("id"))
+                        self._metadata.append(row)
+
+            signatures = np.fromfile(self.matrix_path, dtype=np.uint32) if self.matrix_path.exists() else np.empty(0, np.uint32)
+            rows = min(signatures.size // NUM_PERM, len(self._ids))
+            self._signatures = signatures[:rows * NUM_PERM].reshape(rows, NUM_PERM)
+            self._ids = self._ids[:rows]
+            self._metadata = self._metadata[:rows]
+            for row in range(rows):
+                self._bucket(row)
+
+            logger.info(f"🔎 Loaded MinHash index with {rows} signatures")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to load MinHash index, starting empty: {str(e)}")
+            self._ids, self._metadata = [], []
+            self._signatures = np.empty((0, NUM_PERM), dtype=np.uint32)
+            self._buckets = {}
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        r = self.rows_per_band
+        return [(band, signature[band * r:(band + 1) * r].tobytes()) for band in range(self.bands)]
+
+    def _bucket(self, row: int):
+        for key in self._band_keys(self._signatures[row]):
+            self._buckets.setdefault(key, []).append(row)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, row_id: str, signature: np.ndarray, metadata: Optional[Dict[str, Any]] = None):
+        """Append one signature and persist it."""
+        signature = np.asarray(signature, dtype=np.uint32).reshape(NUM_PERM)
+        with self._lock:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            if not self.header_path.exists():
+                self.header_path.write_text(json.dumps(self._header()), encoding="utf-8")
+
+            # Signatures first, sidecar second: _load() keeps the shorter of the two
+            with open(self.matrix_path, "ab") as f:
+                f.write(signature.tobytes())
+            with open(self.sidecar_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"id": row_id, **(metadata or {})}) + "\n")
+
+            self._ids.append(row_id)
+            self._metadata.append(dict(metadata or {}))
+            self._signatures = np.vstack([self._signatures, signature])
+            self._bucket(len(self._ids) - 1)
+
+    def query(self, signature: np.ndarray, min_jaccard: float = 0.0) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Documents sharing an LSH band with ``signature``, as (id, estimated_jaccard, metadata)
+        sorted by similarity.
+        """
+        signature = np.asarray(signature, dtype=np.uint32).reshape(NUM_PERM)
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+            if not candidates:
+                return []
+
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            scores = (self._signatures[rows] == signature).mean(axis=1)
+            order = np.argsort(-scores)
+            return [
+                (self._ids[rows[i]], float(scores[i]), self._metadata[rows[i]])
+                for i in order if scores[i] >= min_jaccard
+            ]
+
+    def rebuild(self, rows: Iterable[Tuple[str, np.ndarray, Dict[str, Any]]]) -> int:
+        """Replace the whole index with ``rows`` of (id, signature, metadata), swapping files atomically."""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        tmp_matrix = self.matrix_path.with_suffix(".u32.tmp")
+        tmp_sidecar = self.sidecar_path.with_suffix(".jsonl.tmp")
+
+        ids, metadata, signatures = [], [], []
+        with open(tmp_matrix, "wb") as matrix_file, open(tmp_sidecar, "w", encoding="utf-8") as sidecar_file:
+            for row_id, signature, meta in rows:
+                signature = np.asarray(signature, dtype=np.uint32).reshape(NUM_PERM)
+                matrix_file.write(signature.tobytes())
+                sidecar_file.write(json.dumps({"id": row_id, **(meta or {})}) + "\n")
+                ids.append(row_id)
+                metadata.append(dict(meta or {}))
+                signatures.append(signature)
+
+        with self._lock:
+            os.replace(tmp_matrix, self.matrix_path)
+            os.replace(tmp_sidecar, self.sidecar_path)
+            self.header_path.write_text(json.dumps(self._header()), encoding="utf-8")
+            self._ids, self._metadata = ids, metadata
+            self._signatures = np.vstack(signatures) if signatures else np.empty((0, NUM_PERM), dtype=np.uint32)
+            self._buckets = {}
+            for row in range(len(ids)):
+                self._bucket(row)
+
+        logger.info(f"🔎 Rebuilt MinHash index with {len(ids)} signatures")
+        return len(ids)
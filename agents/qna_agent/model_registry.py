@@ -0,0 +1,132 @@
+"""
+Process-wide registry of reusable Vertex AI model handles.
+
+GenerativeModel handles are keyed by model name and generation config, and
+TextEmbeddingModel handles by model name, so requests stop paying for
+``from_pretrained`` lookups and model construction. The registry also keeps
+per-model call counters and latency statistics.
+"""
+import json
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from vertexai.generative_models import GenerativeModel
+from vertexai.language_models import TextEmbeddingModel
+
+logger = logging.getLogger(__name__)
+
+
+class _LatencyStats:
+    """Call/error counters plus a bounded window of recent latencies."""
+
+    def __init__(self, window: int = 512):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.recent = deque(maxlen=window)
+
+    def record(self, seconds: float, failed: bool):
+        self.calls += 1
+        self.errors += int(failed)
+        self.total_seconds += seconds
+        self.recent.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.recent)
+
+        def percentile(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "mean_seconds": self.total_seconds / self.calls if self.calls else 0.0,
+            "p50_seconds": percentile(0.50),
+            "p95_seconds": percentile(0.95),
+            "max_seconds": ordered[-1] if ordered else 0.0,
+        }
+
+
+class ModelRegistry:
+    """
+    Thread-safe cache of model handles with per-model call statistics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generative: Dict[Tuple[str, str], GenerativeModel] = {}
+        self._embedding: Dict[str, TextEmbeddingModel] = {}
+        self._stats: Dict[str, _LatencyStats] = {}
+
+    @staticmethod
+    def _config_key(generation_config: Optional[Dict[str, Any]]) -> str:
+        return json.dumps(generation_config or {}, sort_keys=True)
+
+    def generative_model(self,
+                         model_name: str,
+                         generation_config: Optional[Dict[str, Any]] = None) -> GenerativeModel:
+        """Return a shared GenerativeModel for ``model_name`` with ``generation_config`` baked in."""
+        key = (model_name, self._config_key(generation_config))
+        model = self._generative.get(key)
+        if model is None:
+            with self._lock:
+                model = self._generative.get(key)
+                if model is None:
+                    model = GenerativeModel(model_name, generation_config=generation_config)
+                    self._generative[key] = model
+                    logger.debug(f"🧩 Created model handle: {model_name} {key[1]}")
+        return model
+
+    def embedding_model(self, model_name: str) -> TextEmbeddingModel:
+        """Return a shared TextEmbeddingModel, calling from_pretrained only once per name."""
+        model = self._embedding.get(model_name)
+        if model is None:
+            with self._lock:
+                model = self._embedding.get(model_name)
+                if model is None:
+                    model = TextEmbeddingModel.from_pretrained(model_name)
+                    self._embedding[model_name] = model
+                    logger.debug(f"🧩 Loaded embedding model: {model_name}")
+        return model
+
+    def warm(self,
+             generative: Iterable[Tuple[str, Optional[Dict[str, Any]]]] = (),
+             embedding: Iterable[str] = ()):
+        """Create handles ahead of the first request."""
+        for model_name, generation_config in generative:
+            self.generative_model(model_name, generation_config)
+        for model_name in embedding:
+            self.embedding_model(model_name)
+        logger.info(f"🧩 Warmed {len(self._generative)} generative and {len(self._embedding)} embedding model handles")
+
+    @contextmanager
+    def track(self, model_name: str) -> Iterator[None]:
+        """Record the latency and outcome of one model call."""
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stats = self._stats.get(model_name)
+                if stats is None:
+                    stats = self._stats[model_name] = _LatencyStats()
+                stats.record(elapsed, failed)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-model call counters and latency statistics."""
+        with self._lock:
+            return {model_name: stats.snapshot() for model_name, stats in self._stats.items()}
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,140 @@
+"""
+Token-budgeted prompt assembly for answer().
+
+When the system prompt, question and every retrieved context fit the budget
+the prompt is built unchanged. Otherwise each context is split into
+sentences, sentences are ranked by how many query terms they cover (rarer
+terms across the contexts count more), and the highest-value sentences are
+kept until the budget is reached. Every context keeps at least its best
+sentence while budget allows; contexts that don't fit are dropped from the
+end so sources stay numbered 1..n in retrieval order.
+
+Token counts are local estimates (see context_optimizer.estimate_tokens).
+"""
+import re
+import math
+import logging
+from typing import Dict, List, Set, Tuple
+
+from .bm25_index import tokenize
+from .context_optimizer import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Sentence ends, or line breaks (lists, headings and Slack messages have no punctuation)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# Marks text removed between kept sentences of one context
+ELLIPSIS = "…"
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_RE.split(text) if sentence and sentence.strip()]
+
+
+def _source_block(number: int, text: str) -> str:
+    return f"Source {number}: {text}\n\n"
+
+
+class PromptPacker:
+    """
+    Build "system prompt + numbered sources + question" prompts within a token budget.
+    """
+
+    def __init__(self, token_budget: int = 6000):
+        """
+        Args:
+            token_budget: Estimated prompt tokens allowed (0 or None disables packing)
+        """
+        self.token_budget = token_budget
+
+    @staticmethod
+    def _frame(system_prompt: str, question: str) -> Tuple[str, str]:
+        return f"{system_prompt}\n\n", f"Question: {question}\n\nAnswer:"
+
+    def _compress(self, question: str, contexts: List[str], available: int) -> List[str]:
+        """Keep the highest-value sentences of each context within ``available`` tokens."""
+        query_terms = set(tokenize(question))
+        sentences = [split_sentences(context) for context in contexts]
+        sentence_terms: List[List[Set[str]]] = [[set(tokenize(s)) for s in group] for group in sentences]
+
+        # Inverse document frequency of each query term over all sentences
+        total = sum(len(group) for group in sentences) or 1
+        weights = {
+            term: math.log(1.0 + total / (1 + sum(term in terms for group in sentence_terms for terms in group)))
+            for term in query_terms
+        }
+
+        # Value per token, with earlier sources and sentences winning ties
+        ranked = []
+        for i, group in enumerate(sentences):
+            for j, sentence in enumerate(group):
+                coverage = sum(weights[term] for term in query_terms & sentence_terms[i][j])
+                tokens = estimate_tokens(sentence) + 1
+                ranked.append((coverage / math.sqrt(tokens), -i, -j, i, j, tokens))
+        ranked.sort(reverse=True)
+
+        kept: List[Set[int]] = [set() for _ in contexts]
+        # Each source's number and label cost a few tokens on top of its sentences
+        label = estimate_tokens(_source_block(len(contexts), ""))
+
+        # 1️⃣ Best sentence of each context, in retrieval order, while the budget allows
+        best = {}
+        for _, _, _, i, j, tokens in ranked:
+            best.setdefault(i, (j, tokens))
+        included = 0
+        for i in range(len(contexts)):
+            if i not in best or best[i][1] + label > available:
+                break
+            kept[i].add(best[i][0])
+            available -= best[i][1] + label
+            included += 1
+
+        # 2️⃣ Fill the rest of the budget with the highest-value remaining sentences
+        for _, _, _, i, j, tokens in ranked:
+            if i >= included or j in kept[i]:
+                continue
+            if tokens <= available:
+                kept[i].add(j)
+                available -= tokens
+
+        packed = []
+        for i in range(included):
+            if len(kept[i]) == len(sentences[i]):
+                packed.append(contexts[i])
+                continue
+            spans, previous = [], None
+            for j in sorted(kept[i]):
+                if previous is not None and j != previous + 1:
+                    spans.append(ELLIPSIS)
+                spans.append(sentences[i][j])
+                previous = j
+            packed.append(" ".join(spans))
+        return packed
+
+    def pack(self, question: str, contexts: List[str], system_prompt: str) -> Tuple[str, Dict[str, int]]:
+        """
+        Returns:
+            (prompt, report) with the estimated prompt tokens, the tokens trimmed
+            from contexts and the number of contexts compressed or dropped
+        """
+        head, tail = self._frame(system_prompt, question)
+        full_tokens = estimate_tokens(head + tail) + sum(
+            estimate_tokens(_source_block(i, context)) for i, context in enumerate(contexts, 1)
+        )
+
+        packed = contexts
+        if self.token_budget and full_tokens > self.token_budget:
+            available = self.token_budget - estimate_tokens(head + tail)
+            packed = self._compress(question, contexts, max(0, available))
+
+        prompt = head + "".join(_source_block(i, context) for i, context in enumerate(packed, 1)) + tail
+        prompt_tokens = estimate_tokens(prompt)
+        report = {
+            "prompt_tokens": prompt_tokens,
+            "trimmed_tokens": max(0, full_tokens - prompt_tokens) if packed is not contexts else 0,
+            "contexts": len(packed),
+            "compressed": sum(1 for before, after in zip(contexts, packed) if before != after),
+            "dropped": len(contexts) - len(packed),
+        }
+        return prompt, report
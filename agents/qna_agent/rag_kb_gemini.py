@@ -1,23 +1,52 @@
 import os
 import json
+import time
+import asyncio
 import hashlib
-from typing import Any, List, Dict, Optional, Tuple
+import functools
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, List, Dict, Optional, Tuple
 from pathlib import Path
 import logging
 from datetime import datetime
 import tempfile
+import textwrap
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 
+import aiohttp
+import numpy as np
 import vertexai
-from vertexai.generative_models import GenerativeModel
 from vertexai.preview import rag
 from vertexai.preview.rag import (
     RagEmbeddingModelConfig, RagVectorDbConfig,
     VertexPredictionEndpoint
 )
 from google.oauth2 import service_account
-from google.auth.transport.requests import AuthorizedSession
+from google.auth.transport.requests import AuthorizedSession, Request as AuthRequest
 from google.cloud import storage
+from google.api_core.exceptions import NotFound
+from requests.exceptions import Timeout as RequestsTimeout
 from utils.config import env_config
+from utils.ttl_cache import TTLCache
+from utils.metrics import metrics, Sample
+from .embedding_index import EmbeddingIndex, encode_embedding, decode_embedding
+from .embedding_batcher import EmbeddingBatcher
+from .hash_manifest import HashManifest
+from .bulk_ingest import BulkIngestor, MAX_IMPORT_PATHS
+from .sync_manifest import SyncManifest
+from .file_hasher import FileHasher
+from .minhash_index import MinHashIndex, minhash_signature, minhash_signatures
+from .bm25_index import BM25Index, TEXT_EXTENSIONS, reciprocal_rank_fusion
+from .context_optimizer import ContextOptimizer
+from .prompt_packer import PromptPacker
+from .corpus_shards import CorpusShards, DEFAULT_SHARD, shard_slug
+from .http_pool import HttpSettings, Hedger
+from .resilience import (
+    resilience, is_retryable, is_unavailable, is_unsent, CircuitBreaker, CircuitOpenError, VERTEX_RAG, VERTEX_LLM, GCS
+)
+from .answer_cache import SemanticAnswerCache
+from .model_registry import model_registry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -31,6 +60,16 @@ scopes =  [
     "https://www.googleapis.com/auth/generative-language.retriever", # RAG retrieval & upload
 ]
 
+answer_model_name = "gemini-2.0-flash-001"
+embedding_model_name = "text-embedding-004"
+# Precision of the per-document embedding objects kept in GCS
+embedding_storage_dtype = "float16"
+
+# "hybrid" fuses Vertex and BM25 results, "vector" and "bm25" use one source only
+retrieval_modes = ("hybrid", "vector", "bm25")
+# Wait before retrying a failed BM25 build from the request path
+keyword_index_retry_seconds = 300
+
 base_system_prompt = """
 You are a helpful AI assistant that answers questions based on provided knowledge base sources.
 
@@ -59,6 +98,30 @@ ERROR HANDLING:
 Remember: Prioritize safety, then provide accurate responses based on available sources while being transparent about limitations.
 """
 
+fallback_prompt = """
+                    You are a helpful AI assistant. Answer the user's question to the best of your ability, but be honest about the limitations of your knowledge. If the question involves dangerous, illegal, or harmful content, politely decline to answer.
+                        Question: {question}
+                        Answer:
+                    """
+
+fallback_answer_prefix = "I couldn't find relevant information in our knowledge base to answer your question. Here's what I can tell you based on my general knowledge: "
+
+error_answer_prefix = "I encountered an error while processing your question"
+
+error_answer = f"{error_answer_prefix}. Please try again in a few minutes."
+
+# Served (uncached) with knowledge base excerpts while Gemini is unavailable
+degraded_answer_prefix = "I can't generate an answer right now, but these knowledge base excerpts look relevant:"
+degraded_excerpt_chars = 400
+
+no_context_answer = "I couldn't find relevant information to answer your question. Please try rephrasing or check if the knowledge base contains information about this topic."
+
+class ReplacementAnswer(str):
+    """
+    Last item of an answer stream whose generation failed: the whole answer,
+    replacing the deltas streamed so far instead of extending them.
+    """
+
 class GeminiFAQSystem:
     """
     A comprehensive FAQ system using Gemini AI and Vertex AI RAG.
@@ -72,7 +135,29 @@ class GeminiFAQSystem:
                  location: str = "us-central1",
                  service_account_path: Optional[str] = None,
                  gcs_bucket: Optional[str] = None,
-                 corpus_name: str = "FAQ-Knowledge-Base"):
+                 corpus_name: str = "FAQ-Knowledge-Base",
+                 local_cache_dir: str = ".ella_cache",
+                 answer_cache_threshold: float = 0.95,
+                 answer_cache_ttl: float = 3600.0,
+                 answer_cache_size: int = 256,
+                 retrieval_cache_ttl: float = 300.0,
+                 retrieval_negative_ttl: float = 30.0,
+                 retrieval_cache_max_chars: int = 8_000_000,
+                 blocking_io_workers: int = 8,
+                 embedding_linger_ms: float = 10.0,
+                 hash_workers: Optional[int] = None,
+                 near_duplicate_threshold: float = 0.9,
+                 near_duplicate_escalation: float = 0.5,
+                 retrieval_mode: str = "hybrid",
+                 hybrid_vector_timeout: float = 4.0,
+                 context_options: Optional[Dict[str, Any]] = None,
+                 prompt_token_budget: int = 6000,
+                 shard_corpora: bool = False,
+                 max_shards: int = 20,
+                 shard_fanout: int = 4,
+                 http_options: Optional[Dict[str, Any]] = None,
+                 hedge_options: Optional[Dict[str, Any]] = None,
+                 resilience_options: Optional[Dict[str, Dict[str, Any]]] = None):
         """
         Initialize the Gemini FAQ System.
         
@@ -81,7 +166,33 @@ class GeminiFAQSystem:
             location: GCP location for Vertex AI
             service_account_path: Path to service account JSON file
             corpus_name: Name for the RAG corpus
+            local_cache_dir: Directory for local indexes kept alongside the corpus
+            answer_cache_threshold: Question similarity needed to reuse a cached answer
+            answer_cache_ttl: Seconds a cached answer stays valid
+            answer_cache_size: Maximum number of cached answers
+            retrieval_cache_ttl: Seconds retrieved contexts stay cached
+            retrieval_negative_ttl: Seconds a query with zero contexts stays cached
+            retrieval_cache_max_chars: Total characters of cached contexts before LRU eviction
+            blocking_io_workers: Threads used by the async API for blocking SDK calls
+            embedding_linger_ms: How long embedding requests wait to share a batch
+            hash_workers: Threads used to hash local files (defaults to the CPU count)
+            near_duplicate_threshold: Estimated Jaccard at or above which a new document is a near duplicate
+            near_duplicate_escalation: Estimated Jaccard above which a candidate gets the embedding check
+            retrieval_mode: Default retrieval source: "hybrid", "vector" or "bm25"
+            hybrid_vector_timeout: Seconds hybrid retrieval waits for Vertex before serving BM25 results alone
+            context_options: Default ContextOptimizer settings (overridable per answer call)
+            prompt_token_budget: Estimated prompt tokens before contexts are compressed (0 disables)
+            shard_corpora: Import into per-team/per-category corpora routed by path or category
+            max_shards: Shard corpora allowed besides the default corpus
+            shard_fanout: Shards searched per unscoped query when there are more than this many
+            http_options: HttpSettings for the RAG REST calls (pool size, keep-alive, connect/read timeouts)
+            hedge_options: Hedger settings for retrieval requests (hedging is off unless "enabled" is set)
+            resilience_options: Dependency settings keyed by dependency name ("vertex_rag", "vertex_llm",
+                "vertex_embeddings", "gcs"), e.g. {"vertex_llm": {"max_attempts": 3}}
         """
+        if retrieval_mode not in retrieval_modes:
+            raise ValueError(f"retrieval_mode must be one of {retrieval_modes}, got {retrieval_mode!r}")
+
         self.project_id = project_id
         self.location = location
         self.corpus_name = corpus_name
@@ -89,6 +200,77 @@ class GeminiFAQSystem:
         self.storage_client = None
         self.authed_session = None
         self.storage_bucket = gcs_bucket or f"{project_id}-rag-corpus-bucket"
+        self.local_cache_dir = Path(local_cache_dir) / corpus_name
+        
+        # Async API: bounded pool for sync SDK calls plus a lazily created HTTP session
+        self._executor = ThreadPoolExecutor(max_workers=blocking_io_workers, thread_name_prefix="faq-io")
+        self.download_workers = blocking_io_workers
+        # Semantic answer-cache embeddings, run alongside retrieval (answer() may itself run on _executor)
+        self._question_executor = ThreadPoolExecutor(max_workers=blocking_io_workers, thread_name_prefix="faq-question")
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        self._token_lock: Optional[asyncio.Lock] = None
+        
+        # Pool sizing and timeouts for the REST clients, and p95-delayed hedging of retrieval calls
+        self.http_settings = HttpSettings(**(http_options or {}))
+        self.hedger = Hedger(**(hedge_options or {}))
+        
+        # Retry/circuit-breaker settings per dependency (see resilience.py)
+        for dependency, options in (resilience_options or {}).items():
+            resilience.configure(dependency, **options)
+        self._degraded_counters = {"excerpt_answers": 0}
+        self.hash_manifest: Optional[HashManifest] = None
+        
+        # Local embedding index used for semantic deduplication
+        self.embedding_index = EmbeddingIndex(str(self.local_cache_dir / "embeddings"))
+        
+        # MinHash/LSH prefilter: rejects near duplicates before any embedding call
+        self.minhash_index = MinHashIndex(str(self.local_cache_dir / "minhash"))
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.near_duplicate_escalation = near_duplicate_escalation
+        
+        # BM25 keyword index fused with Vertex results, and served alone when Vertex is down
+        self.keyword_index = BM25Index(str(self.local_cache_dir / "bm25"))
+        self._keyword_index_lock = threading.Lock()
+        self._keyword_index_ready = False
+        self._keyword_index_attempted_at: Optional[float] = None
+        self.retrieval_mode = retrieval_mode
+        self.hybrid_vector_timeout = hybrid_vector_timeout
+        self._retrieval_counters = {"vector_failures": 0, "vector_timeouts": 0, "vector_rejected": 0, "bm25_fallbacks": 0}
+        
+        # Merges overlapping chunks, drops near duplicates and diversifies contexts before prompting
+        self.context_optimizer = ContextOptimizer(**(context_options or {}))
+        self._context_lock = threading.Lock()
+        self._context_counters = {
+            "requests": 0, "retrieved": 0, "merged": 0, "duplicates": 0, "selected": 0, "tokens_saved": 0,
+        }
+        
+        # Compresses contexts to the highest-value sentences when a prompt would exceed its budget
+        self.prompt_packer = PromptPacker(prompt_token_budget)
+        self._prompt_counters = {"prompts": 0, "prompt_tokens": 0, "trimmed_tokens": 0, "compressed": 0, "dropped": 0}
+        
+        # Cached, large-buffer file hashing for sync and hash-metadata rebuilds
+        self.file_hasher = FileHasher(str(self.local_cache_dir / "file_hashes.json"), max_workers=hash_workers)
+        
+        # Coalesces embedding calls from concurrent callers into batched requests
+        self.embedding_batcher = EmbeddingBatcher(embedding_model_name, linger_ms=embedding_linger_ms)
+        
+        # Bumped whenever the corpus changes; scopes every in-process cache
+        self.corpus_version = 0
+        self._version_lock = threading.Lock()
+        self.answer_cache = SemanticAnswerCache(
+            similarity_threshold=answer_cache_threshold,
+            ttl_seconds=answer_cache_ttl,
+            max_entries=answer_cache_size,
+        )
+        
+        # (normalized query, similarity_top_k, corpus_version) -> contexts
+        self.retrieval_negative_ttl = retrieval_negative_ttl
+        self.retrieval_cache = TTLCache(
+            max_entries=4096,
+            ttl_seconds=retrieval_cache_ttl,
+            max_size=retrieval_cache_max_chars,
+            sizeof=lambda contexts: sum(len(source) + len(text) for source, text in contexts) + 1,
+        )
         
         # Initialize credentials with explicit scopes (CRITICAL for service accounts)
         if service_account_path and os.path.exists(service_account_path):
@@ -106,6 +288,17 @@ class GeminiFAQSystem:
         
         self._initialize_clients()
         self._setup_corpus()
+        
+        # Per-team/per-category corpora; everything routes to the default corpus when disabled
+        self.shard_fanout = shard_fanout
+        self.shards = CorpusShards(
+            corpus_name,
+            str(self.local_cache_dir / "shards.json"),
+            create_corpus=self._create_corpus,
+            enabled=shard_corpora,
+            max_shards=max_shards,
+        )
+        self._fanout_executor = ThreadPoolExecutor(max_workers=max(1, shard_fanout), thread_name_prefix="faq-fanout")
     
     def _initialize_clients(self):
         """Initialize all required GCP clients."""
@@ -124,7 +317,13 @@ class GeminiFAQSystem:
             )
             
             # Initialize authorized session for RAG API calls
-            self.authed_session = AuthorizedSession(self.credentials)
+            self.authed_session = self.http_settings.mount(AuthorizedSession(self.credentials))
+            
+            # Content-hash manifest for exact deduplication (loaded lazily)
+            self.hash_manifest = HashManifest(
+                self.storage_client.bucket(self.storage_bucket),
+                self.corpus_name
+            )
             
             logger.info("✅ All clients initialized successfully")
             
@@ -133,7 +332,25 @@ class GeminiFAQSystem:
             raise
     
     def _setup_corpus(self):
-        """Set up or retrieve existing RAG corpus."""
+        """
+        Set up or retrieve existing RAG corpus.
+        
+        A locally cached corpus resource name is used straight away and
+        revalidated in the background, skipping the list_corpora round trip.
+        """
+        cached = self._load_cached_corpus()
+        if cached is not None:
+            self.corpus = cached
+            logger.info(f"📂 Using cached corpus: {cached.name}")
+            threading.Thread(
+                target=self._revalidate_corpus, name="corpus-revalidate", daemon=True
+            ).start()
+            return
+        
+        self._resolve_corpus()
+
+    def _resolve_corpus(self):
+        """Find the corpus by display name (or create it) and cache its resource name."""
         try:
             # Check for existing corpus
             existing_corpora = list(rag.list_corpora())
@@ -143,69 +360,263 @@ class GeminiFAQSystem:
                 self.corpus = existing[0]
                 logger.info(f"📂 Using existing corpus: {self._get_safe_corpus_metadata()['corpus_name']}")
             else:
-                # Create new corpus with embedding model
-                embedding_model_config = RagEmbeddingModelConfig(
-                    vertex_prediction_endpoint=VertexPredictionEndpoint(
-                        publisher_model="publishers/google/models/text-embedding-005"
-                    )
-                )
-                
-                self.corpus = rag.create_corpus(
-                    display_name=self.corpus_name,
-                    backend_config=RagVectorDbConfig(
-                        rag_embedding_model_config=embedding_model_config
-                    ),
-                )
+                self.corpus = self._create_corpus(self.corpus_name)
                 logger.info(f"✅ Created new corpus: {self._get_safe_corpus_metadata()['corpus_name']}")
+            
+            self._save_cached_corpus()
                 
         except Exception as e:
             logger.error(f"❌ Failed to setup corpus: {str(e)}")
             raise
+
+    def _create_corpus(self, display_name: str):
+        """Create a RAG corpus with the embedding model shared by every corpus and shard."""
+        embedding_model_config = RagEmbeddingModelConfig(
+            vertex_prediction_endpoint=VertexPredictionEndpoint(
+                publisher_model="publishers/google/models/text-embedding-005"
+            )
+        )
+        
+        return rag.create_corpus(
+            display_name=display_name,
+            backend_config=RagVectorDbConfig(
+                rag_embedding_model_config=embedding_model_config
+            ),
+        )
+
+    def _shard_corpus_name(self, shard: str, create: bool = False) -> Optional[str]:
+        """Resource name of a shard's corpus (the default shard is the main corpus)."""
+        return self.shards.corpus_name_for(shard, self._get_safe_corpus_metadata()['corpus_name'], create=create)
+
+    def _corpus_cache_path(self) -> Path:
+        return self.local_cache_dir / "corpus.json"
+
+    def _load_cached_corpus(self) -> Optional[Any]:
+        """Return the cached RagCorpus for this project/location/display name, if any."""
+        try:
+            path = self._corpus_cache_path()
+            if not path.exists():
+                return None
+            cached = json.loads(path.read_text(encoding="utf-8"))
+            if (cached.get("project_id"), cached.get("location"), cached.get("display_name")) != \
+                    (self.project_id, self.location, self.corpus_name):
+                return None
+            return rag.RagCorpus(name=cached["name"], display_name=cached["display_name"])
+        except Exception as e:
+            logger.warning(f"⚠️ Ignoring unreadable corpus cache: {str(e)}")
+            return None
+
+    def _save_cached_corpus(self):
+        try:
+            assert self.corpus is not None
+            path = self._corpus_cache_path()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps({
+                "project_id": self.project_id,
+                "location": self.location,
+                "display_name": self.corpus.display_name,
+                "name": self.corpus.name,
+            }), encoding="utf-8")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to cache corpus name: {str(e)}")
+
+    def _revalidate_corpus(self):
+        """Confirm the cached corpus still exists, re-resolving it if it was deleted."""
+        try:
+            assert self.corpus is not None
+            self.corpus = rag.get_corpus(name=self.corpus.name)
+            logger.debug(f"📂 Cached corpus revalidated: {self.corpus.name}")
+        except NotFound:
+            logger.warning("⚠️ Cached corpus no longer exists, resolving it again")
+            try:
+                self._resolve_corpus()
+            except Exception:
+                pass  # already logged by _resolve_corpus
+        except Exception as e:
+            logger.warning(f"⚠️ Could not revalidate cached corpus: {str(e)}")
     
+    def _bump_corpus_version(self):
+        """Record that the corpus changed so cached answers and contexts are discarded."""
+        with self._version_lock:
+            self.corpus_version += 1
+            self.answer_cache.invalidate(self.corpus_version)
+        self.retrieval_cache.clear()
+        logger.info(f"🔄 Corpus changed, version {self.corpus_version}")
+
+    async def run_blocking(self, fn, *args, **kwargs):
+        """Run a blocking call on the bounded I/O executor without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def _map_downloads(self, fn, items) -> List[Any]:
+        """
+        Run ``fn`` over ``items`` on a short-lived pool of its own.
+        Index rebuilds can run inside ``self._executor`` (aadd_document), where
+        waiting on tasks queued to that same pool would starve it.
+        """
+        items = list(items)
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=self.download_workers, thread_name_prefix="faq-download") as pool:
+            return list(pool.map(fn, items))
+
+    async def _get_http_session(self) -> aiohttp.ClientSession:
+        """Return the shared aiohttp session, creating it on first use."""
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession(
+                connector=self.http_settings.connector(),
+                timeout=self.http_settings.aiohttp_timeout(),
+            )
+        return self._http_session
+
+    async def _auth_headers(self) -> Dict[str, str]:
+        """Bearer token headers, refreshing the credentials off the event loop when needed."""
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+        async with self._token_lock:
+            if not self.credentials.valid:
+                await self.run_blocking(self.credentials.refresh, AuthRequest())
+        return {"Authorization": f"Bearer {self.credentials.token}"}
+
+    async def aclose(self):
+        """Release the async HTTP session, the embedding batcher and the blocking I/O executor."""
+        if self._http_session is not None and not self._http_session.closed:
+            await self._http_session.close()
+        await self.run_blocking(self.embedding_batcher.close)
+        self.hedger.close()
+        self._fanout_executor.shutdown(wait=False)
+        self._question_executor.shutdown(wait=False)
+        self._executor.shutdown(wait=False)
+
+    def _generation_config(self, temperature: float, max_output_tokens: int = 1024) -> Dict[str, Any]:
+        """Generation settings shared by every Gemini call."""
+        return {
+            "temperature": temperature,
+            "top_p": 0.8,
+            "top_k": 40,
+            "max_output_tokens": max_output_tokens,
+        }
+
+    def warm_models(self):
+        """
+        Create the model handles used by answer(), llm() and dedup ahead of the
+        first request, and load (or build) the BM25 index used by retrieval.
+        """
+        try:
+            model_registry.warm(
+                generative=[
+                    (answer_model_name, self._generation_config(0.3)),
+                    (answer_model_name, self._generation_config(0.3, max_output_tokens=2048)),
+                    (answer_model_name, self._generation_config(0.7, max_output_tokens=2048)),
+                ],
+                embedding=[embedding_model_name],
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to warm model handles: {str(e)}")
+        
+        try:
+            self._ensure_keyword_index()
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to load BM25 index: {str(e)}")
+
+    def get_model_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-model call counters and latency statistics, plus embedding batching counters."""
+        return {
+            **model_registry.stats(),
+            "embedding_batcher": self.embedding_batcher.stats(),
+        }
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the in-process caches."""
+        return {
+            "corpus_version": self.corpus_version,
+            "answer_cache": self.answer_cache.stats(),
+            "retrieval_cache": self.retrieval_cache.stats(),
+            "keyword_index": {**self.keyword_index.stats(), **self._retrieval_counters},
+            "context_optimizer": dict(self._context_counters),
+            "prompt_packer": dict(self._prompt_counters),
+            "http": {**self.http_settings.options(), **self.hedger.stats()},
+            "resilience": {**resilience.stats(), **self._degraded_counters},
+        }
+
+    def metric_samples(self) -> Iterator[Sample]:
+        """Cache, hedging and circuit breaker stats as metrics samples (see utils.metrics)."""
+        for cache_name, cache in (("answer", self.answer_cache), ("retrieval", self.retrieval_cache)):
+            cache_stats = cache.stats()
+            for result in ("hits", "misses"):
+                yield ("cache_lookups_total", "counter", "Cache lookups by result",
+                       {"cache": cache_name, "result": result}, cache_stats.get(result, 0))
+            yield ("cache_entries", "gauge", "Entries held by a cache", {"cache": cache_name}, cache_stats.get("entries", 0))
+
+        hedge_stats = self.hedger.stats()
+        for counter in ("requests", "hedges_fired", "hedges_won"):
+            yield (f"retrieval_{counter}_total", "counter", f"Retrieval HTTP {counter.replace('_', ' ')}", {}, hedge_stats[counter])
+        yield ("retrieval_hedge_delay_seconds", "gauge", "Current hedge delay", {}, hedge_stats["hedge_delay"])
+
+        breaker_states = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+        for dependency, dependency_stats in resilience.stats().items():
+            labels = {"dependency": dependency}
+            breaker = dependency_stats["breaker"]
+            yield ("circuit_state", "gauge", "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+                   labels, breaker_states.get(breaker["state"], 0))
+            yield ("circuit_rejected_total", "counter", "Calls rejected by an open circuit", labels, breaker["rejected"])
+            for counter in ("calls", "retries", "failures"):
+                yield (f"dependency_{counter}_total", "counter", f"External dependency {counter}", labels, dependency_stats[counter])
+        yield ("excerpt_answers_total", "counter", "Excerpt-only answers served while Gemini was unavailable",
+               {}, self._degraded_counters["excerpt_answers"])
+
     def _get_existing_file_hashes(self) -> Dict[str, str]:
         """
-        Get hashes of existing files from GCS blob metadata.
+        Get hashes of existing files from the bucket's hash manifest.
         Returns dict mapping hash -> filename for deduplication.
         """
-        existing_files = {}
-        
         try:
-            if self.storage_client:
-                bucket = self.storage_client.bucket(self.storage_bucket)
-                blobs = bucket.list_blobs(prefix=f"{self.corpus_name}/")
-                
-                for blob in blobs:
-                    # Reload blob to get metadata
-                    blob.reload()
-                    if blob.metadata and "file_hash" in blob.metadata:
-                        file_hash = blob.metadata["file_hash"]
-                        filename = blob.name.replace(f"{self.corpus_name}/", "")
-                        existing_files[file_hash] = filename
-                    else:
-                        # For existing files without metadata, calculate hash from filename + size
-                        # This is a fallback for files uploaded before implementing hash tracking
-                        fallback_hash = hashlib.sha256(f"{blob.name}_{blob.size}".encode()).hexdigest()
-                        filename = blob.name.replace(f"{self.corpus_name}/", "")
-                        existing_files[fallback_hash] = filename
-                        logger.debug(f"📝 Using fallback hash for existing file: {filename}")
-                        
+            if self.hash_manifest:
+                return self.hash_manifest.hashes()
         except Exception as e:
             logger.warning(f"⚠️ Could not retrieve existing file hashes from GCS: {str(e)}")
         
-        return existing_files
+        return {}
+
+    def _record_file_hash(self, file_hash: str, blob, doc_type: Optional[str] = None, created_at: Optional[str] = None):
+        """Record an uploaded blob in the hash manifest without failing the upload."""
+        self._record_file_hashes([(file_hash, blob)], doc_type, created_at)
+
+    def _record_file_hashes(self,
+                            uploads: List[Tuple[str, Any]],
+                            doc_type: Optional[str] = None,
+                            created_at: Optional[str] = None):
+        """Record several (file_hash, blob) uploads with a single manifest write."""
+        try:
+            if self.hash_manifest:
+                self.hash_manifest.record_many(
+                    (file_hash, {
+                        "path": blob.name.replace(f"{self.corpus_name}/", "", 1),
+                        "size": blob.size,
+                        "generation": blob.generation,
+                        "doc_type": doc_type,
+                        "created_at": created_at or datetime.now().isoformat(),
+                    })
+                    for file_hash, blob in uploads
+                )
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to record {len(uploads)} hashes in manifest: {str(e)}")
+
+    def _forget_file_hashes(self, file_hashes: List[str]):
+        """Drop hashes of deleted or replaced blobs from the manifest without failing the caller."""
+        try:
+            if self.hash_manifest:
+                self.hash_manifest.remove_many(file_hashes)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to remove {len(file_hashes)} hashes from manifest: {str(e)}")
 
     def _calculate_file_hash(self, file_path: str) -> str:
         """Calculate SHA-256 hash of a file for deduplication."""
-        hash_sha256 = hashlib.sha256()
         try:
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_sha256.update(chunk)
-            return hash_sha256.hexdigest()
+            return self.file_hasher.hash_file(file_path)
         except Exception as e:
             logger.error(f"❌ Failed to calculate hash for {file_path}: {str(e)}")
             # Return a fallback hash based on filename and modification time
-            import time
             fallback_string = f"{file_path}_{os.path.getmtime(file_path)}"
             return hashlib.sha256(fallback_string.encode()).hexdigest()
 
@@ -242,91 +653,292 @@ class GeminiFAQSystem:
         
         return normalized
 
-    async def _check_semantic_similarity(self, new_content: str, similarity_threshold: float = 0.85) -> Optional[Dict]:
+    def _embed_for_similarity(self, content: str) -> np.ndarray:
+        """Embed normalized content with the model used for semantic deduplication."""
+        return self._embed_many_for_similarity([content])[0]
+
+    def _embed_many_for_similarity(self, contents: List[str]) -> List[np.ndarray]:
+        """Embed several documents for semantic deduplication in shared batches."""
+        normalized = [self._normalize_content_for_similarity(content) for content in contents]
+        return self.embedding_batcher.embed(normalized, task_type="RETRIEVAL_DOCUMENT")
+
+    def _extract_document_body(self, text: str) -> str:
+        """Strip the '# key: value' header written by add_document."""
+        lines = text.split('\n')
+        actual_content_start = 0
+        for i, line in enumerate(lines):
+            if line.strip() == "" and i > 0:  # Empty line after metadata
+                actual_content_start = i + 1
+                break
+        return '\n'.join(lines[actual_content_start:])
+
+    def _embedding_blob_name(self, filename: str) -> str:
+        """GCS object holding the binary embedding of documents/<filename>."""
+        return f"_embeddings/{self.corpus_name}/{filename}.emb"
+
+    def _store_embedding(self, bucket, filename: str, vector) -> str:
+        """Upload a document embedding as a compact binary object."""
+        blob_name = self._embedding_blob_name(filename)
+        payload = encode_embedding(vector, embedding_storage_dtype)
+        resilience[GCS].call(lambda: bucket.blob(blob_name).upload_from_string(
+            payload,
+            content_type="application/octet-stream"
+        ), idempotent=False)
+        return blob_name
+
+    def _ensure_embedding_index(self):
+        """Populate the local embedding index from GCS the first time it is needed."""
+        if not self.embedding_index.exists():
+            logger.info("📐 No local embedding index found, building it from GCS")
+            self.rebuild_embedding_index()
+
+    def rebuild_embedding_index(self) -> Dict[str, int]:
+        """
+        Rebuild the local embedding index from every document in the bucket.
+        Reads the binary embedding objects, falls back to legacy embeddings in
+        blob metadata, and re-embeds documents that have neither.
+        """
+        stats = {"indexed": 0, "embedded": 0, "legacy": 0, "failed": 0}
+        
+        if not self.storage_client:
+            logger.error("❌ Storage client not initialized")
+            return stats
+        
+        bucket = self.storage_client.bucket(self.storage_bucket)
+        prefix = f"{self.corpus_name}/documents/"
+        
+        def index_metadata(metadata: Dict[str, str]) -> Dict[str, str]:
+            return {
+                "original_title": metadata.get("original_title", "Unknown"),
+                "file_hash": metadata.get("file_hash", "Unknown"),
+            }
+        
+        def embed_missing(missing):
+            """Download and embed a group of documents with batched embedding requests."""
+            try:
+                bodies = self._map_downloads(
+                    lambda blob: self._extract_document_body(blob.download_as_text(encoding='utf-8')),
+                    [blob for blob, _, _ in missing]
+                )
+                vectors = self._embed_many_for_similarity(bodies)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not embed {len(missing)} documents: {str(e)}")
+                stats["failed"] += len(missing)
+                return
+            
+            for (blob, filename, metadata), vector in zip(missing, vectors):
+                try:
+                    self._store_embedding(bucket, filename, vector)
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not store embedding for {blob.name}: {str(e)}")
+                stats["embedded"] += 1
+                stats["indexed"] += 1
+                yield filename, vector, index_metadata(metadata)
+        
+        def rows():
+            # One listing tells us which documents already have a binary embedding
+            stored = {blob.name for blob in bucket.list_blobs(prefix=f"_embeddings/{self.corpus_name}/")}
+            missing = []
+            
+            # list_blobs already returns custom metadata, no per-blob reload needed
+            for blob in bucket.list_blobs(prefix=prefix):
+                try:
+                    filename = blob.name.replace(prefix, "")
+                    metadata = blob.metadata or {}
+                    embedding_blob_name = self._embedding_blob_name(filename)
+                    
+                    if embedding_blob_name in stored:
+                        vector = decode_embedding(bucket.blob(embedding_blob_name).download_as_bytes())
+                    elif metadata.get("content_embedding"):
+                        vector = np.array(metadata["content_embedding"].split(","), dtype=np.float32)
+                        stats["legacy"] += 1
+                    else:
+                        # Embedded later in batches
+                        missing.append((blob, filename, metadata))
+                        if len(missing) >= self.embedding_batcher.max_batch_size:
+                            yield from embed_missing(missing)
+                            missing = []
+                        continue
+                    
+                    stats["indexed"] += 1
+                    yield filename, vector, index_metadata(metadata)
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not index embedding for {blob.name}: {str(e)}")
+                    stats["failed"] += 1
+            
+            if missing:
+                yield from embed_missing(missing)
+        
+        try:
+            self.embedding_index.rebuild(rows())
+        except Exception as e:
+            logger.error(f"❌ Failed to rebuild embedding index: {str(e)}")
+        
+        logger.info(f"📊 Embedding index rebuild complete: {stats}")
+        return stats
+
+    def migrate_embedding_metadata(self) -> Dict[str, int]:
+        """
+        Move legacy comma-joined embeddings out of blob metadata into binary
+        embedding objects, then drop the metadata key.
+        """
+        stats = {"migrated": 0, "skipped": 0, "failed": 0}
+        
+        if not self.storage_client:
+            logger.error("❌ Storage client not initialized")
+            return stats
+        
+        bucket = self.storage_client.bucket(self.storage_bucket)
+        prefix = f"{self.corpus_name}/documents/"
+        
+        for blob in bucket.list_blobs(prefix=prefix):
+            metadata = blob.metadata or {}
+            stored_embedding = metadata.get("content_embedding")
+            if not stored_embedding:
+                stats["skipped"] += 1
+                continue
+            try:
+                filename = blob.name.replace(prefix, "")
+                vector = np.array(stored_embedding.split(","), dtype=np.float32)
+                self._store_embedding(bucket, filename, vector)
+                
+                # Setting a key to None deletes it on patch
+                blob.metadata = {"content_embedding": None}
+                resilience[GCS].call(blob.patch)
+                stats["migrated"] += 1
+                logger.info(f"✅ Migrated embedding: {filename}")
+            except Exception as e:
+                logger.error(f"❌ Failed to migrate embedding for {blob.name}: {str(e)}")
+                stats["failed"] += 1
+        
+        logger.info(f"📊 Embedding migration complete: {stats}")
+        return stats
+
+    def _ensure_minhash_index(self):
+        """Populate the local MinHash index from GCS the first time it is needed."""
+        if not self.minhash_index.exists():
+            logger.info("🔎 No local MinHash index found, building it from GCS")
+            # Reached from add_document inside the server process: no process pool here
+            self.rebuild_minhash_index(processes=0)
+
+    def rebuild_minhash_index(self, processes: Optional[int] = None) -> Dict[str, int]:
+        """
+        Rebuild the local MinHash index from every document in the bucket.
+        Signatures are computed on a process pool (``processes=0`` computes them in-process).
+        """
+        stats = {"indexed": 0, "failed": 0}
+        
+        if not self.storage_client:
+            logger.error("❌ Storage client not initialized")
+            return stats
+        
+        bucket = self.storage_client.bucket(self.storage_bucket)
+        prefix = f"{self.corpus_name}/documents/"
+        
+        def download(blob):
+            try:
+                return self._normalize_content_for_similarity(
+                    self._extract_document_body(blob.download_as_text(encoding='utf-8'))
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Could not download {blob.name}: {str(e)}")
+                return None
+        
+        blobs = list(bucket.list_blobs(prefix=prefix))
+        texts = self._map_downloads(download, blobs)
+        downloaded = [(blob, text) for blob, text in zip(blobs, texts) if text is not None]
+        stats["failed"] += len(blobs) - len(downloaded)
+        
+        try:
+            signatures = minhash_signatures([text for _, text in downloaded], processes=processes)
+            stats["indexed"] = self.minhash_index.rebuild(
+                (
+                    blob.name.replace(prefix, ""),
+                    signature,
+                    {
+                        "original_title": (blob.metadata or {}).get("original_title", "Unknown"),
+                        "file_hash": (blob.metadata or {}).get("file_hash", "Unknown"),
+                    },
+                )
+                for (blob, _), signature in zip(downloaded, signatures)
+            )
+        except Exception as e:
+            logger.error(f"❌ Failed to rebuild MinHash index: {str(e)}")
+        
+        logger.info(f"📊 MinHash index rebuild complete: {stats}")
+        return stats
+
+    def _check_candidate_similarity(self,
+                                    new_vector,
+                                    candidates: List[Tuple[str, float, Dict[str, Any]]],
+                                    similarity_threshold: float) -> Optional[Dict]:
+        """
+        Embedding check restricted to MinHash candidates; candidates without a
+        stored embedding are embedded (in one batch) and added to the index.
+        """
+        known = self.embedding_index.vectors(row_id for row_id, _, _ in candidates)
+        missing = [(row_id, metadata) for row_id, _, metadata in candidates if row_id not in known]
+        if missing:
+            assert self.storage_client is not None, "Storage client must be initialized"
+            bucket = self.storage_client.bucket(self.storage_bucket)
+            bodies = [
+                self._extract_document_body(
+                    bucket.blob(f"{self.corpus_name}/documents/{row_id}").download_as_text(encoding='utf-8')
+                )
+                for row_id, _ in missing
+            ]
+            for (row_id, metadata), vector in zip(missing, self._embed_many_for_similarity(bodies)):
+                self._store_embedding(bucket, row_id, vector)
+                self.embedding_index.add(row_id, vector, metadata)
+                known[row_id] = vector
+        
+        query = np.asarray(new_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        best = None
+        for row_id, _, metadata in candidates:
+            vector = np.asarray(known[row_id], dtype=np.float32)
+            similarity = float(np.dot(query, vector / (np.linalg.norm(vector) or 1.0)))
+            if similarity >= similarity_threshold and (best is None or similarity > best["similarity_score"]):
+                best = {
+                    "similar_file": row_id,
+                    "similarity_score": similarity,
+                    "original_title": metadata.get("original_title", "Unknown"),
+                    "existing_hash": metadata.get("file_hash", "Unknown"),
+                }
+        return best
+
+    def _check_semantic_similarity(self,
+                                   new_content: str,
+                                   similarity_threshold: float = 0.85,
+                                   new_vector: Optional[List[float]] = None) -> Optional[Dict]:
         """
         Check if new content is semantically similar to existing documents.
         
         Args:
             new_content: Content to check for similarity
             similarity_threshold: Minimum cosine similarity to consider duplicate (0.0 to 1.0)
+            new_vector: Precomputed embedding of new_content (optional)
             
         Returns:
             Dict with similarity info if duplicate found, None otherwise
         """
         try:
-            from vertexai.language_models import TextEmbeddingInput, TextEmbeddingModel
-            import numpy as np
-            from sklearn.metrics.pairwise import cosine_similarity
-            
-            # Get embedding model
-            embedding_model = TextEmbeddingModel.from_pretrained("text-embedding-004")
-            
-            # Normalize new content
-            normalized_new = self._normalize_content_for_similarity(new_content)
+            if new_vector is None:
+                new_vector = self._embed_for_similarity(new_content)
             
-            # Get embedding for new content
-            new_embedding_input = TextEmbeddingInput(text=normalized_new, task_type="RETRIEVAL_DOCUMENT")
-            new_embeddings = embedding_model.get_embeddings([new_embedding_input])
-            new_vector = np.array(new_embeddings[0].values).reshape(1, -1)
-            
-            # Get existing documents from GCS and check similarity
-            if not self.storage_client:
-                return None
-                
-            bucket = self.storage_client.bucket(self.storage_bucket)
-            blobs = bucket.list_blobs(prefix=f"{self.corpus_name}/documents/")
+            self._ensure_embedding_index()
             
-            for blob in blobs:
-                try:
-                    # Skip if no metadata
-                    blob.reload()
-                    if not blob.metadata:
-                        continue
-                    
-                    # Get stored embedding if available, otherwise compute it
-                    stored_embedding = blob.metadata.get("content_embedding")
-                    
-                    if not stored_embedding:
-                        # Download and get content for comparison
-                        content = blob.download_as_text(encoding='utf-8')
-                        
-                        # Extract actual content (skip metadata header)
-                        lines = content.split('\n')
-                        actual_content_start = 0
-                        for i, line in enumerate(lines):
-                            if line.strip() == "" and i > 0:  # Empty line after metadata
-                                actual_content_start = i + 1
-                                break
-                        
-                        actual_content = '\n'.join(lines[actual_content_start:])
-                        normalized_existing = self._normalize_content_for_similarity(actual_content)
-                        
-                        # Get embedding for existing content
-                        existing_embedding_input = TextEmbeddingInput(text=normalized_existing, task_type="RETRIEVAL_DOCUMENT")
-                        existing_embeddings = embedding_model.get_embeddings([existing_embedding_input])
-                        existing_vector = np.array(existing_embeddings[0].values).reshape(1, -1)
-                        
-                        # Store embedding in metadata for future use
-                        blob.metadata["content_embedding"] = ",".join(map(str, existing_embeddings[0].values))
-                        blob.patch()
-                    else:
-                        # Use stored embedding
-                        existing_vector = np.array([float(x) for x in stored_embedding.split(",")]).reshape(1, -1)
-                    
-                    # Calculate cosine similarity
-                    similarity = cosine_similarity(new_vector, existing_vector)[0][0]
-                    
-                    if similarity >= similarity_threshold:
-                        return {
-                            "similar_file": blob.name.replace(f"{self.corpus_name}/documents/", ""),
-                            "similarity_score": float(similarity),
-                            "original_title": blob.metadata.get("original_title", "Unknown"),
-                            "existing_hash": blob.metadata.get("file_hash", "Unknown")
-                        }
-                        
-                except Exception as e:
-                    logger.warning(f"⚠️ Error checking similarity for {blob.name}: {str(e)}")
-                    continue
+            # One matrix-vector product against every stored document
+            matches = self.embedding_index.search(new_vector, k=1)
+            if matches:
+                similar_file, similarity, metadata = matches[0]
+                if similarity >= similarity_threshold:
+                    return {
+                        "similar_file": similar_file,
+                        "similarity_score": float(similarity),
+                        "original_title": metadata.get("original_title", "Unknown"),
+                        "existing_hash": metadata.get("file_hash", "Unknown")
+                    }
             
             return None
             
@@ -342,7 +954,44 @@ class GeminiFAQSystem:
                     chunk_size: int = 512,
                     chunk_overlap: int = 100,
                     similarity_threshold: float = 0.85,
-                    enable_semantic_dedup: bool = True) -> Dict[str, Any]:
+                    enable_semantic_dedup: bool = True,
+                    near_duplicate_prefilter: bool = True) -> Dict[str, Any]:
+        """Alias of aadd_document() kept for existing callers."""
+        return await self.aadd_document(
+            content, title, doc_type, metadata, chunk_size, chunk_overlap,
+            similarity_threshold, enable_semantic_dedup, near_duplicate_prefilter
+        )
+
+    async def aadd_document(self,
+                            content: str,
+                            title: str,
+                            doc_type: str = "text",
+                            metadata: Optional[Dict] = None,
+                            chunk_size: int = 512,
+                            chunk_overlap: int = 100,
+                            similarity_threshold: float = 0.85,
+                            enable_semantic_dedup: bool = True,
+                            near_duplicate_prefilter: bool = True) -> Dict[str, Any]:
+        """
+        Async add_document: the GCS, embedding and import calls run on the I/O executor.
+        Arguments and return value are the same as add_document_sync().
+        """
+        return await self.run_blocking(
+            self.add_document_sync,
+            content, title, doc_type, metadata, chunk_size, chunk_overlap,
+            similarity_threshold, enable_semantic_dedup, near_duplicate_prefilter
+        )
+
+    def add_document_sync(self, 
+                          content: str, 
+                          title: str,
+                          doc_type: str = "text", 
+                          metadata: Optional[Dict] = None,
+                          chunk_size: int = 512,
+                          chunk_overlap: int = 100,
+                          similarity_threshold: float = 0.85,
+                          enable_semantic_dedup: bool = True,
+                          near_duplicate_prefilter: bool = True) -> Dict[str, Any]:
         """
         Add a document directly from content string with advanced deduplication.
         
@@ -355,11 +1004,14 @@ class GeminiFAQSystem:
             chunk_overlap: Overlap between chunks
             similarity_threshold: Cosine similarity threshold for semantic deduplication (0.0 to 1.0)
             enable_semantic_dedup: Whether to enable semantic similarity checking
+            near_duplicate_prefilter: Use the MinHash index to reject near duplicates and
+                check ambiguous candidates first; the local embedding index is still
+                searched when LSH finds nothing close
             
         Returns:
             Dict with status, hash, similarity info, and processing details
         """
-        stats = {"uploaded": 0, "skipped": 0, "failed": 0}
+        stats = {"uploaded": 0, "skipped": 0, "failed": 0, "semantic_dedup_skipped": 0}
         
         try:
             assert self.storage_client is not None, "Storage client must be initialized"
@@ -377,25 +1029,87 @@ class GeminiFAQSystem:
             # Calculate content hash for exact deduplication
             content_hash = self._calculate_content_hash(content, doc_metadata)
             
-            # Get existing file hashes for exact deduplication
-            existing_hashes = self._get_existing_file_hashes()
+            # Check for exact duplicates first (single manifest lookup)
+            existing_entry = None
+            try:
+                if self.hash_manifest:
+                    with metrics.stage("add_document.exact_dedup"):
+                        existing_entry = self.hash_manifest.lookup(content_hash)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not check hash manifest: {str(e)}")
             
-            # Check for exact duplicates first (faster)
-            if content_hash in existing_hashes:
+            if existing_entry:
                 logger.info(f"⏭️ Skipped (exact duplicate): {title}")
                 stats["skipped"] += 1
                 return {
                     "status": "skipped",
                     "reason": "exact_duplicate",
                     "hash": content_hash,
-                    "existing_file": existing_hashes[content_hash],
+                    "existing_file": existing_entry["path"],
                     "stats": stats
                 }
             
             # Check for semantic similarity if enabled
             similarity_result = None
+            content_vector = None
+            signature = None
+            try:
+                signature = minhash_signature(self._normalize_content_for_similarity(content))
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to compute MinHash signature: {str(e)}")
+            
             if enable_semantic_dedup:
-                similarity_result = await self._check_semantic_similarity(content, similarity_threshold)
+                # MinHash prefilter: near-identical text is rejected without an embedding call
+                candidates = None
+                if near_duplicate_prefilter and signature is not None:
+                    try:
+                        with metrics.stage("add_document.near_dedup"):
+                            self._ensure_minhash_index()
+                            candidates = self.minhash_index.query(signature, min_jaccard=self.near_duplicate_escalation)
+                    except Exception as e:
+                        logger.warning(f"⚠️ MinHash prefilter failed: {str(e)}")
+                
+                if candidates and candidates[0][1] >= self.near_duplicate_threshold:
+                    similar_file, jaccard, candidate_metadata = candidates[0]
+                    logger.info(f"⏭️ Skipped (near duplicate): {title} (jaccard: {jaccard:.3f})")
+                    stats["skipped"] += 1
+                    return {
+                        "status": "skipped",
+                        "reason": "near_duplicate",
+                        "hash": content_hash,
+                        "similarity_info": {
+                            "similar_file": similar_file,
+                            "similarity_score": jaccard,
+                            "original_title": candidate_metadata.get("original_title", "Unknown"),
+                            "existing_hash": candidate_metadata.get("file_hash", "Unknown"),
+                        },
+                        "stats": stats
+                    }
+                
+                # Always embedded: LSH can miss paraphrases, and the vector is stored for later checks
+                try:
+                    with metrics.stage("add_document.embed"):
+                        content_vector = self._embed_for_similarity(content)
+                except Exception as e:
+                    logger.warning(f"⚠️ Failed to embed content for semantic dedup: {str(e)}")
+                    if is_unavailable(e):
+                        # Degraded: only the exact-hash and MinHash checks ran
+                        stats["semantic_dedup_skipped"] += 1
+                
+                if content_vector is not None:
+                    with metrics.stage("add_document.semantic_dedup"):
+                        if candidates:
+                            try:
+                                similarity_result = self._check_candidate_similarity(
+                                    content_vector, candidates, similarity_threshold
+                                )
+                            except Exception as e:
+                                logger.warning(f"⚠️ Candidate similarity check failed: {str(e)}")
+                        if not similarity_result:
+                            # No LSH candidates (or none close enough): search the local index
+                            similarity_result = self._check_semantic_similarity(
+                                content, similarity_threshold, new_vector=content_vector
+                            )
                 
                 if similarity_result:
                     logger.info(f"⏭️ Skipped (semantic duplicate): {title} (similarity: {similarity_result['similarity_score']:.3f})")
@@ -428,14 +1142,18 @@ class GeminiFAQSystem:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 filename = f"{safe_title}_{timestamp}_{content_hash[:8]}.txt"
                 
-                gcs_path = f"{self.corpus_name}/documents/{filename}"
+                # Categorized documents live under documents/<shard>/ and import into that shard
+                shard = self.shards.route_category(doc_type)
+                doc_name = filename if shard == DEFAULT_SHARD else f"{shard}/{filename}"
+                gcs_path = f"{self.corpus_name}/documents/{doc_name}"
                 gs_uri = f"gs://{self.storage_bucket}/{gcs_path}"
                 
                 # 1️⃣ Upload to GCS
                 blob = bucket.blob(gcs_path)
-                blob.upload_from_filename(temp_file_path)
+                with metrics.stage("add_document.upload"):
+                    resilience[GCS].call(lambda: blob.upload_from_filename(temp_file_path), idempotent=False)
                 
-                # Store hash, metadata, and embedding in blob metadata for future deduplication
+                # Store hash and metadata in blob metadata for future deduplication
                 blob.metadata = {
                     "file_hash": content_hash,
                     "original_title": title,
@@ -444,44 +1162,60 @@ class GeminiFAQSystem:
                     "content_length": str(len(content))
                 }
                 
-                # Store content embedding for future semantic similarity checks
-                if enable_semantic_dedup:
-                    try:
-                        from vertexai.language_models import TextEmbeddingInput, TextEmbeddingModel
-                        embedding_model = TextEmbeddingModel.from_pretrained("text-embedding-004")
-                        normalized_content = self._normalize_content_for_similarity(content)
-                        embedding_input = TextEmbeddingInput(text=normalized_content, task_type="RETRIEVAL_DOCUMENT")
-                        embeddings = embedding_model.get_embeddings([embedding_input])
-                        blob.metadata["content_embedding"] = ",".join(map(str, embeddings[0].values))
-                    except Exception as e:
-                        logger.warning(f"⚠️ Failed to store embedding: {str(e)}")
-                
                 if metadata:
                     # Add custom metadata with prefix to avoid conflicts
                     for key, value in metadata.items():
                         blob.metadata[f"custom_{key}"] = str(value)
                 
-                blob.patch()
+                resilience[GCS].call(blob.patch)
+                self._record_file_hash(content_hash, blob, doc_type, doc_metadata['created_at'])
+                
+                # Store content embedding for future semantic similarity checks
+                if content_vector is not None:
+                    try:
+                        self._store_embedding(bucket, doc_name, content_vector)
+                    except Exception as e:
+                        logger.warning(f"⚠️ Failed to store embedding for {filename}: {str(e)}")
                 
                 # 2️⃣ Import into RAG corpus
-                rag.import_files(
-                    self._get_safe_corpus_metadata()['corpus_name'],
-                    paths=[gs_uri],
-                    transformation_config=rag.TransformationConfig(
-                        chunking_config=rag.ChunkingConfig(
-                            chunk_size=chunk_size, 
-                            chunk_overlap=chunk_overlap
-                        )
-                    )
-                )
+                corpus_resource = self._shard_corpus_name(shard, create=True)
+                with metrics.stage("add_document.import"):
+                    self._import_files(corpus_resource, [gs_uri], chunk_size, chunk_overlap)
                 
                 logger.info(f"✅ Added document: {title} (hash: {content_hash[:8]}...)")
                 stats["uploaded"] += 1
                 
+                # Keyword index gets exactly the text that was imported
+                self._index_keywords(
+                    self._keyword_doc_id(gcs_path),
+                    Path(temp_file_path).read_text(encoding='utf-8')
+                )
+                self._bump_corpus_version()
+                
+                # 3️⃣ Make the new document visible to future dedup checks
+                if signature is not None and self.minhash_index.exists():
+                    try:
+                        self.minhash_index.add(doc_name, signature, {
+                            "original_title": title,
+                            "file_hash": content_hash,
+                        })
+                    except Exception as e:
+                        logger.warning(f"⚠️ Failed to update MinHash index: {str(e)}")
+                
+                if content_vector is not None:
+                    try:
+                        self.embedding_index.add(doc_name, content_vector, {
+                            "original_title": title,
+                            "file_hash": content_hash,
+                        })
+                    except Exception as e:
+                        logger.warning(f"⚠️ Failed to update embedding index: {str(e)}")
+                
                 return {
                     "status": "success",
                     "hash": content_hash,
                     "filename": filename,
+                    "shard": shard,
                     "gcs_path": gcs_path,
                     "gs_uri": gs_uri,
                     "stats": stats,
@@ -525,50 +1259,61 @@ class GeminiFAQSystem:
                     rel_path = file_path.relative_to(docs_path).as_posix()
                     local_files[rel_path] = file_path
             
+            # Pair blobs without hash metadata (listings include custom metadata) with local files
+            pending = {}
             for blob in blobs:
+                filename = blob.name.replace(f"{self.corpus_name}/", "")
+                if blob.metadata and "file_hash" in blob.metadata:
+                    stats["matched"] += 1
+                elif filename in local_files:
+                    pending[str(local_files[filename])] = (filename, blob)
+                else:
+                    logger.warning(f"⚠️ No local file found for: {filename}")
+            
+            # Hash every matched local file in parallel
+            hashed = []
+            for file_path, local_file_hash in self.file_hasher.hash_many(pending):
+                filename, blob = pending[file_path]
+                if local_file_hash is None:
+                    stats["failed"] += 1
+                    continue
                 try:
-                    filename = blob.name.replace(f"{self.corpus_name}/", "")
-                    
-                    # Skip if already has hash metadata
-                    blob.reload()
-                    if blob.metadata and "file_hash" in blob.metadata:
-                        stats["matched"] += 1
-                        continue
+                    # Update blob metadata
+                    if not blob.metadata:
+                        blob.metadata = {}
+                    blob.metadata["file_hash"] = local_file_hash
+                    resilience[GCS].call(blob.patch)
+                    hashed.append((local_file_hash, blob))
                     
-                    # Find matching local file
-                    if filename in local_files:
-                        local_file_hash = self._calculate_file_hash(str(local_files[filename]))
-                        
-                        # Update blob metadata
-                        if not blob.metadata:
-                            blob.metadata = {}
-                        blob.metadata["file_hash"] = local_file_hash
-                        blob.patch()
-                        
-                        stats["updated"] += 1
-                        logger.info(f"✅ Updated hash for: {filename}")
-                    else:
-                        logger.warning(f"⚠️ No local file found for: {filename}")
-                        
+                    stats["updated"] += 1
+                    logger.info(f"✅ Updated hash for: {filename}")
                 except Exception as e:
                     logger.error(f"❌ Failed to update hash for {blob.name}: {str(e)}")
                     stats["failed"] += 1
+            
+            self._record_file_hashes(hashed)
                     
         except Exception as e:
             logger.error(f"❌ Failed to rebuild hash metadata: {str(e)}")
+        finally:
+            self.file_hasher.save()
             
         logger.info(f"📊 Hash metadata rebuild complete: {stats}")
         return stats
 
     def clear_corpus_files(self) -> Dict[str, int]:
         """
-        Remove all files from the corpus (useful for testing or cleanup).
+        Remove all files from the corpus and its shards (useful for testing or cleanup).
         Returns stats about deletion.
         """
         stats = {"deleted": 0, "failed": 0}
         
         try:
-            files = list(rag.list_files(corpus_name=self._get_safe_corpus_metadata()['corpus_name']))
+            files = [
+                rag_file
+                for corpus_resource in self._shard_corpora(self.shards.known())
+                for rag_file in rag.list_files(corpus_name=corpus_resource)
+            ]
             
             for file in files:
                 try:
@@ -581,6 +1326,11 @@ class GeminiFAQSystem:
                     
         except Exception as e:
             logger.error(f"❌ Failed to list files for deletion: {str(e)}")
+        
+        if stats["deleted"]:
+            # Keep keyword retrieval in step with the emptied corpus
+            self.keyword_index.rebuild([])
+            self._bump_corpus_version()
             
         logger.info(f"📊 Deletion complete: {stats}")
         return stats
@@ -601,154 +1351,788 @@ class GeminiFAQSystem:
             logger.error(f"❌ Failed to get corpus metadata: {str(e)}")
             return {"error": str(e)}
     
-    def update(self,
-            documents_path: str,
-            file_extensions: List[str] = [".md", ".txt", ".pdf"],
-            batch_size: int = 10) -> Dict[str, int]:
-        """
-        Update the RAG corpus with documents, using hash-based deduplication.
-        """
-        stats = {"uploaded": 0, "skipped": 0, "failed": 0}
-        assert self.storage_client is not None, "Storage client must be initialized"
-        bucket = self.storage_client.bucket(self.storage_bucket)
+    @staticmethod
+    def _source_uris(rag_file) -> List[str]:
+        gcs_source = getattr(rag_file, "gcs_source", None)
+        return list(getattr(gcs_source, "uris", None) or [])
 
-        # Get existing file hashes for deduplication
-        existing_hashes = self._get_existing_file_hashes()
-        logger.info(f"📋 Found {len(existing_hashes)} existing files in corpus")
+    def _rag_file_names(self) -> Dict[str, str]:
+        """Map each imported file's source GCS URI to its RAG file name (one list_files call per shard)."""
+        names = {}
+        for corpus_resource in self._shard_corpora(self.shards.known()):
+            for rag_file in rag.list_files(corpus_name=corpus_resource):
+                for uri in self._source_uris(rag_file):
+                    names[uri] = rag_file.name
+        return names
 
-        # Gather all files matching extensions
-        docs = []
-        for ext in file_extensions:
-            docs.extend(Path(documents_path).rglob(f"*{ext}"))
-        if not docs:
-            logger.warning(f"⚠️ No docs found in {documents_path}")
-            return stats
-
-        for i in range(0, len(docs), batch_size):
-            for doc in docs[i : i + batch_size]:
-                try:
-                    rel_path = doc.relative_to(documents_path).as_posix()
-                    
-                    # Calculate file hash for deduplication
-                    file_hash = self._calculate_file_hash(str(doc))
-                    
-                    # Check if file already exists (by hash)
-                    if file_hash in existing_hashes:
-                        logger.info(f"⏭️ Skipped (duplicate): {rel_path}")
-                        stats["skipped"] += 1
-                        continue
-                    
-                    gcs_path = f"{self.corpus_name}/{rel_path}"
-                    gs_uri = f"gs://{self.storage_bucket}/{gcs_path}"
+    def _import_files(self, corpus_resource: str, paths: List[str], chunk_size: int = 512, chunk_overlap: int = 100):
+        """
+        rag.import_files without duplicate imports.
 
-                    # 1️⃣ Upload to GCS
-                    blob = bucket.blob(gcs_path)
-                    blob.upload_from_filename(str(doc))
-                    
-                    # Store hash in blob metadata for future deduplication
-                    blob.metadata = {"file_hash": file_hash}
-                    blob.patch()
-
-                    # 2️⃣ Import into RAG corpus
-                    rag.import_files(
-                        self._get_safe_corpus_metadata()['corpus_name'],
-                        paths=[gs_uri],
-                        transformation_config=rag.TransformationConfig(
-                            chunking_config=rag.ChunkingConfig(
-                                chunk_size=512, 
-                                chunk_overlap=100
-                            )
-                        )
+        The call isn't idempotent, so it is only retried when it surely had no
+        effect. After an ambiguous failure (a timeout, a 500) the corpus is
+        listed and only the paths that didn't land are imported again, once.
+        """
+        def import_paths(batch: List[str]):
+            return resilience[VERTEX_RAG].call(lambda: rag.import_files(
+                corpus_resource,
+                paths=batch,
+                transformation_config=rag.TransformationConfig(
+                    chunking_config=rag.ChunkingConfig(
+                        chunk_size=chunk_size,
+                        chunk_overlap=chunk_overlap
                     )
+                )
+            ), idempotent=False)
+        
+        try:
+            return import_paths(paths)
+        except Exception as e:
+            if not is_retryable(e) or is_unsent(e):
+                raise
+            # The import operation may have started server-side before the client gave up
+            logger.warning(f"⚠️ Import of {len(paths)} files ended ambiguously ({str(e)[:120]}), checking the corpus")
+            imported = {
+                uri
+                for rag_file in resilience[VERTEX_RAG].call(lambda: list(rag.list_files(corpus_name=corpus_resource)))
+                for uri in self._source_uris(rag_file)
+            }
+            missing = [path for path in paths if path not in imported]
+            if not missing:
+                logger.info(f"✅ All {len(paths)} files were imported despite the error")
+                return None
+            return import_paths(missing)
 
-                    logger.info(f"✅ Imported: {rel_path} (hash: {file_hash[:8]}...)")
-                    stats["uploaded"] += 1
-                    
-                    # Add to existing hashes to prevent duplicates in same batch
-                    existing_hashes[file_hash] = rel_path
+    def _sync_manifest_path(self, documents_path: str) -> Path:
+        """Local sync manifest for one source directory."""
+        key = hashlib.sha256(str(Path(documents_path).resolve()).encode("utf-8")).hexdigest()[:16]
+        return self.local_cache_dir / "sync" / f"{key}.json"
 
-                except Exception as e:
-                    logger.error(f"❌ {doc.name} → {e}")
-                    stats["failed"] += 1
+    @staticmethod
+    def _iter_documents(documents_path: str, file_extensions: List[str]) -> Iterator[Path]:
+        """Yield files under documents_path with a matching extension, in a single directory walk."""
+        extensions = tuple(file_extensions)
+        for root, dirs, files in os.walk(documents_path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(extensions):
+                    yield Path(root) / name
+
+    def update(self,
+            documents_path: str,
+            file_extensions: List[str] = [".md", ".txt", ".pdf"],
+            batch_size: int = MAX_IMPORT_PATHS,
+            max_workers: int = 8,
+            max_concurrent_imports: int = 2,
+            incremental: bool = False) -> Dict[str, int]:
+        """
+        Update the RAG corpus with documents, using hash-based deduplication.
+        
+        Files are hashed and uploaded concurrently and imported with one
+        rag.import_files call per batch. In incremental mode a local manifest
+        of (path, size, mtime_ns, hash, rag_file_name) lets unchanged files be
+        skipped without reading them, replaces the RAG file of modified files,
+        and removes files that were deleted locally.
+        
+        Args:
+            documents_path: Local directory to ingest
+            file_extensions: File extensions to include
+            batch_size: Files per rag.import_files call
+            max_workers: Concurrency cap for hashing and uploads
+            max_concurrent_imports: Import operations allowed in flight at once
+            incremental: Sync against the local change manifest (opt-in; the default
+                rehashes every file as before)
+            
+        Returns:
+            Per-stage counters (discovered, unchanged, hashed, skipped, uploaded, imported, deleted, failed)
+        """
+        manifest = SyncManifest(str(self._sync_manifest_path(documents_path))) if incremental else None
+
+        ingestor = BulkIngestor(
+            self,
+            batch_size=batch_size,
+            max_workers=max_workers,
+            max_concurrent_imports=max_concurrent_imports,
+            manifest=manifest,
+        )
+        try:
+            stats = ingestor.run(documents_path, self._iter_documents(documents_path, file_extensions))
+        finally:
+            self.file_hasher.save()
+        if not stats["discovered"]:
+            logger.warning(f"⚠️ No docs found in {documents_path}")
+        if stats["imported"] or stats["deleted"]:
+            self._bump_corpus_version()
 
         logger.info(f"📊 Update done: {stats}")
         return stats
 
-    
-    def _retrieve_contexts(self, query: str, max_contexts: int = 5) -> List[str]:
-        """Retrieve relevant contexts from the RAG corpus."""
-        try:
-            # Use v1beta1 API version (not v1)
-            parent = f"projects/{self.project_id}/locations/{self.location}"
-            endpoint = f"https://{self.location}-aiplatform.googleapis.com/v1beta1/{parent}:retrieveContexts"
-            
-            # Correct request body format based on the latest API docs
-            body = {
-                "vertex_rag_store": {  # Note: underscore, not camelCase
-                    "rag_resources": [  # This should be an array
-                        {
-                            "rag_corpus": self._get_safe_corpus_metadata()['corpus_name']
-                        }
-                    ]
-                },
-                "query": {
-                    "text": query,
-                    "similarity_top_k": max_contexts  # This should be inside query object
-                }
+    def _keyword_doc_id(self, gcs_path: str) -> str:
+        """BM25 document id of a corpus object: its path relative to the corpus prefix."""
+        prefix = f"{self.corpus_name}/"
+        return gcs_path[len(prefix):] if gcs_path.startswith(prefix) else gcs_path
+
+    def _index_keywords(self, doc_id: str, text: str):
+        """
+        Add or replace a document in the BM25 index (text documents only).
+        Ingest never builds the index: until the first search builds it from
+        the bucket, which already holds this document, the add is skipped.
+        """
+        if not doc_id.endswith(TEXT_EXTENSIONS):
+            return
+        try:
+            # Waits out an in-flight build so its listing can't miss this document
+            with self._keyword_index_lock:
+                if not self._keyword_index_ready and not self.keyword_index.exists():
+                    return
+            self.keyword_index.add(doc_id, text)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to update BM25 index for {doc_id}: {str(e)}")
+
+    def _unindex_keywords(self, doc_id: str):
+        try:
+            self.keyword_index.remove(doc_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to remove {doc_id} from BM25 index: {str(e)}")
+
+    def _ensure_keyword_index(self):
+        """
+        Populate the local BM25 index from GCS before its first search.
+        Concurrent callers wait for one build; a failed build is retried after keyword_index_retry_seconds.
+        """
+        if self._keyword_index_ready:
+            return
+        with self._keyword_index_lock:
+            if self._keyword_index_ready:
+                return
+            if not self.keyword_index.exists():
+                attempted_at = self._keyword_index_attempted_at
+                if attempted_at is not None and time.monotonic() - attempted_at < keyword_index_retry_seconds:
+                    return
+                self._keyword_index_attempted_at = time.monotonic()
+                logger.info("🔎 No local BM25 index found, building it from GCS")
+                self.rebuild_keyword_index()
+            self._keyword_index_ready = self.keyword_index.exists()
+
+    def rebuild_keyword_index(self) -> Dict[str, int]:
+        """
+        Rebuild the local BM25 index from every text document in the bucket
+        (synced knowledge_base/ files and add_document payloads).
+        """
+        stats = {"indexed": 0, "failed": 0}
+        
+        if not self.storage_client:
+            logger.error("❌ Storage client not initialized")
+            return stats
+        
+        bucket = self.storage_client.bucket(self.storage_bucket)
+        
+        def download(blob):
+            try:
+                return blob.download_as_text(encoding='utf-8')
+            except Exception as e:
+                logger.warning(f"⚠️ Could not download {blob.name}: {str(e)}")
+                return None
+        
+        try:
+            blobs = [
+                blob for blob in bucket.list_blobs(prefix=f"{self.corpus_name}/")
+                if blob.name.endswith(TEXT_EXTENSIONS)
+            ]
+            texts = self._map_downloads(download, blobs)
+            stats["failed"] = sum(text is None for text in texts)
+            stats["indexed"] = self.keyword_index.rebuild(
+                (self._keyword_doc_id(blob.name), text)
+                for blob, text in zip(blobs, texts) if text is not None
+            )
+        except Exception as e:
+            logger.error(f"❌ Failed to rebuild BM25 index: {str(e)}")
+        
+        self.retrieval_cache.clear()
+        logger.info(f"📊 BM25 index rebuild complete: {stats}")
+        return stats
+
+    def reimport_shard(self, shard: str, batch_size: int = MAX_IMPORT_PATHS) -> Dict[str, int]:
+        """
+        Rebuild one shard's RAG corpus from the documents already in GCS,
+        leaving every other shard untouched.
+
+        Args:
+            shard: Shard name (see shards.known())
+            batch_size: Files per rag.import_files call
+
+        Returns:
+            Counters (deleted, imported, failed)
+        """
+        stats = {"deleted": 0, "imported": 0, "failed": 0}
+        shard = shard_slug(shard)
+        corpus_resource = self._shard_corpus_name(shard, create=True)
+
+        if not self.storage_client:
+            logger.error("❌ Storage client not initialized")
+            return stats
+
+        # 1️⃣ Drop the shard's current RAG files
+        for rag_file in list(rag.list_files(corpus_name=corpus_resource)):
+            try:
+                rag.delete_file(name=rag_file.name)
+                stats["deleted"] += 1
+            except Exception as e:
+                logger.error(f"❌ Failed to delete {rag_file.display_name}: {str(e)}")
+                stats["failed"] += 1
+
+        # 2️⃣ Re-import the shard's documents, MAX_IMPORT_PATHS URIs per call
+        bucket = self.storage_client.bucket(self.storage_bucket)
+        prefix = f"{self.corpus_name}/"
+        uris = [
+            f"gs://{self.storage_bucket}/{blob.name}"
+            for blob in bucket.list_blobs(prefix=prefix)
+            if self.shards.route_path(blob.name[len(prefix):]) == shard
+        ]
+        batch_size = max(1, min(batch_size, MAX_IMPORT_PATHS))
+        for i in range(0, len(uris), batch_size):
+            batch = uris[i:i + batch_size]
+            try:
+                self._import_files(corpus_resource, batch)
+                stats["imported"] += len(batch)
+            except Exception as e:
+                logger.error(f"❌ Re-import of {len(batch)} files into shard {shard} failed → {e}")
+                stats["failed"] += len(batch)
+
+        # 3️⃣ Recorded RAG file names of this shard are stale; the next sync re-resolves them
+        for manifest_path in (self.local_cache_dir / "sync").glob("*.json"):
+            manifest = SyncManifest(str(manifest_path))
+            for rel_path, entry in manifest.items():
+                if entry.get("rag_file_name") and self.shards.route_path(rel_path) == shard:
+                    manifest.update(rel_path, rag_file_name=None)
+            manifest.save()
+
+        self._bump_corpus_version()
+        logger.info(f"📊 Shard {shard} re-import complete: {stats}")
+        return stats
+
+    def _retrieval_request(self,
+                           query: str,
+                           max_contexts: int,
+                           corpus_resource: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """Return the (endpoint, body) of a :retrieveContexts call against one corpus (default: the main corpus)."""
+        # Use v1beta1 API version (not v1)
+        parent = f"projects/{self.project_id}/locations/{self.location}"
+        endpoint = f"https://{self.location}-aiplatform.googleapis.com/v1beta1/{parent}:retrieveContexts"
+        
+        # Correct request body format based on the latest API docs
+        body = {
+            "vertex_rag_store": {  # Note: underscore, not camelCase
+                "rag_resources": [  # This should be an array
+                    {
+                        "rag_corpus": corpus_resource or self._get_safe_corpus_metadata()['corpus_name']
+                    }
+                ]
+            },
+            "query": {
+                "text": query,
+                "similarity_top_k": max_contexts  # This should be inside query object
             }
-            
-            assert self.authed_session is not None, "Authorized session must be initialized"
-            response = self.authed_session.post(endpoint, json=body)
+        }
+        return endpoint, body
+
+    def _parse_contexts(self, data: Dict[str, Any]) -> List[Tuple[str, str, float]]:
+        """Extract (source URI, text, score) from a :retrieveContexts response; higher scores are better."""
+        logger.debug(f"📥 Retrieved response: {json.dumps(data, indent=2)}")
+        
+        # Extract contexts from the response
+        contexts = []
+        
+        # Check if the response structure matches expected format
+        if "contexts" in data:
+            if "contexts" in data["contexts"]:
+                # Nested structure: {"contexts": {"contexts": [...]}}
+                context_list = data["contexts"]["contexts"]
+            else:
+                # Direct structure: {"contexts": [...]}
+                context_list = data["contexts"]
+                
+            for ctx in context_list:
+                source = ctx.get("sourceUri") or ctx.get("source_uri") or ""
+                # Try different possible field names for the text content
+                text = (ctx.get("text") or 
+                        ctx.get("content") or 
+                        source)
+                
+                # Newer responses carry a relevance score, older ones a vector distance
+                score = ctx["score"] if "score" in ctx else -float(ctx.get("distance", 0.0))
+                
+                if text and text.strip():
+                    contexts.append((source, text.strip(), float(score)))
+        return contexts
+
+    def _retrieval_cache_key(self,
+                             query: str,
+                             max_contexts: int,
+                             mode: str,
+                             scope: Optional[Tuple[str, ...]]) -> Tuple:
+        return (self._normalize_content_for_similarity(query), max_contexts, mode, scope, self.corpus_version)
+
+    def _cached_contexts(self, cache_key: Tuple, query: str) -> Optional[List[Tuple[str, str]]]:
+        cached = self.retrieval_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"📚 Retrieval cache hit ({len(cached)} contexts) for query: '{query[:50]}...'")
+            return list(cached)
+        return None
+
+    def _cache_contexts(self, cache_key: Tuple, query: str, contexts: List[Tuple[str, str]]):
+        logger.info(f"📚 Retrieved {len(contexts)} contexts for query: '{query[:50]}...'")
+        
+        # Empty results are cached briefly so bursts don't re-query a cold topic
+        self.retrieval_cache.set(
+            cache_key,
+            tuple(contexts),
+            ttl_seconds=None if contexts else self.retrieval_negative_ttl
+        )
+
+    def _resolve_retrieval_mode(self, mode: Optional[str]) -> str:
+        mode = mode or self.retrieval_mode
+        if mode not in retrieval_modes:
+            raise ValueError(f"retrieval mode must be one of {retrieval_modes}, got {mode!r}")
+        return mode
+
+    def _normalize_scope(self, scope: Optional[List[str]]) -> Optional[Tuple[str, ...]]:
+        """Explicit shard scope as a sorted tuple of shard names (None when unscoped)."""
+        if not scope:
+            return None
+        return tuple(sorted({shard_slug(name) for name in scope}))
+
+    def _select_shards(self, query: str, scope: Optional[Tuple[str, ...]]) -> List[str]:
+        """
+        Shards to search: the explicit scope, every shard when there are few, or
+        otherwise the default shard plus the shards with the most BM25 weight for the query.
+        """
+        known = self.shards.known()
+        if scope:
+            return [shard for shard in known if shard in scope]
+        if len(known) <= self.shard_fanout:
+            return known
+        
+        weight: Dict[str, float] = {}
+        self._ensure_keyword_index()
+        for doc_id, score, _ in self.keyword_index.search(query, k=50):
+            shard = self.shards.route_path(doc_id)
+            weight[shard] = weight.get(shard, 0.0) + score
+        ranked = sorted((shard for shard in weight if shard != DEFAULT_SHARD), key=weight.get, reverse=True)
+        if not ranked:
+            return known
+        return [DEFAULT_SHARD] + ranked[:self.shard_fanout - 1]
+
+    def _keyword_contexts(self,
+                          query: str,
+                          max_contexts: int,
+                          scope: Optional[Tuple[str, ...]] = None) -> List[Tuple[str, str]]:
+        """Top BM25 passages for query from the local keyword index, with the same source URIs as Vertex."""
+        doc_filter = (lambda doc_id: self.shards.route_path(doc_id) in scope) if scope else None
+        try:
+            self._ensure_keyword_index()
+            with metrics.stage("retrieval_bm25"):
+                return [
+                    (f"gs://{self.storage_bucket}/{self.corpus_name}/{doc_id}", text)
+                    for doc_id, _, text in self.keyword_index.search(query, k=max_contexts, doc_filter=doc_filter)
+                ]
+        except Exception as e:
+            logger.warning(f"⚠️ BM25 retrieval failed: {str(e)}")
+            return []
+
+    def _fuse_contexts(self,
+                       query: str,
+                       vector_contexts: Optional[List[Tuple[str, str]]],
+                       keyword_contexts: List[Tuple[str, str]],
+                       max_contexts: int) -> List[Tuple[str, str]]:
+        """
+        Reciprocal-rank fusion of Vertex and BM25 results. ``vector_contexts`` is
+        None when Vertex failed or timed out, in which case BM25 results are served alone.
+        """
+        if vector_contexts is None:
+            if keyword_contexts:
+                self._retrieval_counters["bm25_fallbacks"] += 1
+                logger.warning(f"⚠️ Serving BM25 results only for query: '{query[:50]}...'")
+            return keyword_contexts[:max_contexts]
+        if not keyword_contexts:
+            return vector_contexts[:max_contexts]
+        return reciprocal_rank_fusion(
+            [vector_contexts, keyword_contexts], key=lambda context: context[1]
+        )[:max_contexts]
+
+    @staticmethod
+    def _merge_shard_contexts(results: List[List[Tuple[str, str, float]]], max_contexts: int) -> List[Tuple[str, str]]:
+        """Merge per-shard results by score (every shard uses the same embedding model)."""
+        merged = [context for contexts in results for context in contexts]
+        if len(results) > 1:
+            merged.sort(key=lambda context: context[2], reverse=True)
+        seen, contexts = set(), []
+        for source, text, _ in merged:
+            if text not in seen:
+                seen.add(text)
+                contexts.append((source, text))
+        return contexts[:max_contexts]
+
+    def _shard_corpora(self, shards: Optional[List[str]]) -> List[str]:
+        """Resource names of the shards that have a corpus."""
+        names = [self._shard_corpus_name(shard) for shard in (shards or [DEFAULT_SHARD])]
+        return [name for name in names if name]
+
+    def _vector_shard_contexts(self,
+                               query: str,
+                               max_contexts: int,
+                               timeout: Optional[float],
+                               corpus_resource: str) -> List[Tuple[str, str, float]]:
+        """Vertex RAG :retrieveContexts call against one corpus (hedged when enabled); raises on failure."""
+        endpoint, body = self._retrieval_request(query, max_contexts, corpus_resource)
+        
+        assert self.authed_session is not None, "Authorized session must be initialized"
+        
+        def post() -> Dict[str, Any]:
+            response = self.authed_session.post(endpoint, json=body, timeout=self.http_settings.requests_timeout(timeout))
             
             # Debug logging to help troubleshoot
             if response.status_code != 200:
                 logger.error(f"❌ API Error {response.status_code}: {response.text}")
                 logger.error(f"Request body was: {json.dumps(body, indent=2)}")
                 response.raise_for_status()
-                
-            data = response.json()
-            logger.debug(f"📥 Retrieved response: {json.dumps(data, indent=2)}")
-            
-            # Extract contexts from the response
-            contexts = []
-            
-            # Check if the response structure matches expected format
-            if "contexts" in data:
-                if "contexts" in data["contexts"]:
-                    # Nested structure: {"contexts": {"contexts": [...]}}
-                    context_list = data["contexts"]["contexts"]
-                else:
-                    # Direct structure: {"contexts": [...]}
-                    context_list = data["contexts"]
-                    
-                for ctx in context_list:
-                    # Try different possible field names for the text content
-                    text = (ctx.get("text") or 
-                            ctx.get("content") or 
-                            ctx.get("source_uri", ""))
-                    
-                    if text and text.strip():
-                        contexts.append(text.strip())
-            
-            logger.info(f"📚 Retrieved {len(contexts)} contexts for query: '{query[:50]}...'")
-            return contexts
+            return response.json()
             
+        # With a local fallback (timeout set) fail fast instead of retrying
+        attempts = 1 if timeout else None
+        return self._parse_contexts(resilience[VERTEX_RAG].call(lambda: self.hedger.call(post), attempts=attempts))
+
+    def _vector_contexts(self,
+                         query: str,
+                         max_contexts: int,
+                         timeout: Optional[float] = None,
+                         shards: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+        """
+        Vertex retrieval across shards, fanned out in parallel and merged by score.
+        Raises only if every shard fails.
+        """
+        corpora = self._shard_corpora(shards)
+        if len(corpora) == 1:
+            return self._merge_shard_contexts(
+                [self._vector_shard_contexts(query, max_contexts, timeout, corpora[0])], max_contexts
+            )
+        
+        futures = [
+            self._fanout_executor.submit(self._vector_shard_contexts, query, max_contexts, timeout, corpus)
+            for corpus in corpora
+        ]
+        results, errors = [], []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                errors.append(e)
+        if errors and not results:
+            raise errors[0]
+        if errors:
+            logger.warning(f"⚠️ {len(errors)} of {len(corpora)} shards failed, using partial results: {str(errors[0])}")
+        return self._merge_shard_contexts(results, max_contexts)
+
+    async def _avector_shard_contexts(self,
+                                      query: str,
+                                      max_contexts: int,
+                                      timeout: Optional[float],
+                                      corpus_resource: str) -> List[Tuple[str, str, float]]:
+        """Async _vector_shard_contexts using a non-blocking aiohttp request (hedged when enabled)."""
+        endpoint, body = self._retrieval_request(query, max_contexts, corpus_resource)
+        session = await self._get_http_session()
+        headers = await self._auth_headers()
+        
+        async def post() -> Dict[str, Any]:
+            async with session.post(endpoint, json=body, headers=headers,
+                                    timeout=self.http_settings.aiohttp_timeout(timeout)) as response:
+                if response.status != 200:
+                    logger.error(f"❌ API Error {response.status}: {await response.text()}")
+                    logger.error(f"Request body was: {json.dumps(body, indent=2)}")
+                    response.raise_for_status()
+                return await response.json()
+        
+        attempts = 1 if timeout else None
+        return self._parse_contexts(await resilience[VERTEX_RAG].acall(lambda: self.hedger.acall(post), attempts=attempts))
+
+    async def _avector_contexts(self,
+                                query: str,
+                                max_contexts: int,
+                                timeout: Optional[float] = None,
+                                shards: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+        """Async _vector_contexts: one concurrent request per shard."""
+        corpora = self._shard_corpora(shards)
+        outcomes = await asyncio.gather(
+            *(self._avector_shard_contexts(query, max_contexts, timeout, corpus) for corpus in corpora),
+            return_exceptions=True,
+        )
+        results = [outcome for outcome in outcomes if not isinstance(outcome, BaseException)]
+        errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        if errors and not results:
+            raise errors[0]
+        if errors:
+            logger.warning(f"⚠️ {len(errors)} of {len(corpora)} shards failed, using partial results: {str(errors[0])}")
+        return self._merge_shard_contexts(results, max_contexts)
+
+    def _vector_failed(self, e: Exception):
+        """Count and log a failed Vertex retrieval call."""
+        if isinstance(e, (asyncio.TimeoutError, RequestsTimeout)):
+            self._retrieval_counters["vector_timeouts"] += 1
+            logger.warning(f"⚠️ Vertex retrieval timed out: {str(e)}")
+            return
+        if isinstance(e, CircuitOpenError):
+            self._retrieval_counters["vector_rejected"] += 1
+            logger.warning(f"⚠️ Skipping Vertex retrieval: {str(e)}")
+            return
+        self._retrieval_counters["vector_failures"] += 1
+        logger.error(f"❌ Failed to retrieve contexts: {str(e)}")
+        # If it's a requests error, log more details
+        if getattr(e, 'response', None) is not None:
+            logger.error(f"Response status: {e.response.status_code}") # type: ignore
+            logger.error(f"Response body: {e.response.text}") # type: ignore
+
+    def _retrieve_sourced_contexts(self,
+                                   query: str,
+                                   max_contexts: int = 5,
+                                   mode: Optional[str] = None,
+                                   scope: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+        """
+        Retrieve relevant (source URI, text) contexts, cached per corpus version.
+        
+        Args:
+            query: Search query
+            max_contexts: Maximum number of contexts to return
+            mode: "hybrid", "vector" or "bm25" (defaults to self.retrieval_mode)
+            scope: Shards to search (defaults to the shards relevant to the query)
+        """
+        return self._search_contexts(query, max_contexts, mode, scope)[0]
+
+    def _search_contexts(self,
+                         query: str,
+                         max_contexts: int = 5,
+                         mode: Optional[str] = None,
+                         scope: Optional[List[str]] = None) -> Tuple[List[Tuple[str, str]], bool]:
+        """
+        _retrieve_sourced_contexts plus whether retrieval was complete: False when
+        Vertex failed and only BM25 results (or nothing) could be served.
+        """
+        mode = self._resolve_retrieval_mode(mode)
+        scope = self._normalize_scope(scope)
+        cache_key = self._retrieval_cache_key(query, max_contexts, mode, scope)
+        cached = self._cached_contexts(cache_key, query)
+        if cached is not None:
+            return cached, True
+        
+        keyword_contexts = self._keyword_contexts(query, max_contexts, scope) if mode != "vector" else []
+        vector_contexts = None
+        if mode != "bm25":
+            try:
+                # Only bound the wait when there is something to fall back on
+                timeout = self.hybrid_vector_timeout if keyword_contexts else None
+                shards = self._select_shards(query, scope)
+                with metrics.stage("retrieval_vector"):
+                    vector_contexts = self._vector_contexts(query, max_contexts, timeout=timeout, shards=shards)
+            except Exception as e:
+                self._vector_failed(e)
+        
+        if mode == "bm25":
+            contexts = keyword_contexts
+        else:
+            contexts = self._fuse_contexts(query, vector_contexts, keyword_contexts, max_contexts)
+        # Degraded results are not cached, so the next question retries Vertex
+        complete = vector_contexts is not None or mode == "bm25"
+        if complete:
+            self._cache_contexts(cache_key, query, contexts)
+        return contexts, complete
+
+    async def _aretrieve_sourced_contexts(self,
+                                          query: str,
+                                          max_contexts: int = 5,
+                                          mode: Optional[str] = None,
+                                          scope: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+        """Async _retrieve_sourced_contexts: Vertex via non-blocking aiohttp requests, BM25 on the I/O executor."""
+        return (await self._asearch_contexts(query, max_contexts, mode, scope))[0]
+
+    async def _asearch_contexts(self,
+                                query: str,
+                                max_contexts: int = 5,
+                                mode: Optional[str] = None,
+                                scope: Optional[List[str]] = None) -> Tuple[List[Tuple[str, str]], bool]:
+        """Async _search_contexts."""
+        mode = self._resolve_retrieval_mode(mode)
+        scope = self._normalize_scope(scope)
+        cache_key = self._retrieval_cache_key(query, max_contexts, mode, scope)
+        cached = self._cached_contexts(cache_key, query)
+        if cached is not None:
+            return cached, True
+        
+        keyword_contexts = await self.run_blocking(self._keyword_contexts, query, max_contexts, scope) if mode != "vector" else []
+        vector_contexts = None
+        if mode != "bm25":
+            try:
+                timeout = self.hybrid_vector_timeout if keyword_contexts else None
+                shards = await self.run_blocking(self._select_shards, query, scope)
+                with metrics.stage("retrieval_vector"):
+                    vector_contexts = await self._avector_contexts(query, max_contexts, timeout=timeout, shards=shards)
+            except Exception as e:
+                self._vector_failed(e)
+        
+        if mode == "bm25":
+            contexts = keyword_contexts
+        else:
+            contexts = self._fuse_contexts(query, vector_contexts, keyword_contexts, max_contexts)
+        complete = vector_contexts is not None or mode == "bm25"
+        if complete:
+            self._cache_contexts(cache_key, query, contexts)
+        return contexts, complete
+
+    def _retrieve_contexts(self,
+                           query: str,
+                           max_contexts: int = 5,
+                           mode: Optional[str] = None,
+                           scope: Optional[List[str]] = None) -> List[str]:
+        """Retrieve relevant context texts (see _retrieve_sourced_contexts)."""
+        return [text for _, text in self._retrieve_sourced_contexts(query, max_contexts, mode, scope)]
+
+    async def aretrieve_contexts(self,
+                                 query: str,
+                                 max_contexts: int = 5,
+                                 mode: Optional[str] = None,
+                                 scope: Optional[List[str]] = None) -> List[str]:
+        """Async _retrieve_contexts."""
+        return [text for _, text in await self._aretrieve_sourced_contexts(query, max_contexts, mode, scope)]
+
+    def _context_optimizer(self, context_options: Optional[Dict[str, Any]]) -> ContextOptimizer:
+        """The default optimizer, or a copy with per-call overrides."""
+        if not context_options:
+            return self.context_optimizer
+        return self.context_optimizer.with_options(**context_options)
+
+    def _optimize_contexts(self,
+                           question: str,
+                           contexts: List[Tuple[str, str]],
+                           max_contexts: int,
+                           optimizer: ContextOptimizer) -> List[str]:
+        """Run the post-retrieval optimizer, log and count the tokens it saved, and return context texts."""
+        try:
+            selected, report = optimizer.optimize(question, contexts, max_contexts)
         except Exception as e:
-            logger.error(f"❌ Failed to retrieve contexts: {str(e)}")
-            # If it's a requests error, log more details
-            if hasattr(e, 'response'):
-                logger.error(f"Response status: {e.response.status_code}") # type: ignore
-                logger.error(f"Response body: {e.response.text}") # type: ignore
-            return []
+            logger.warning(f"⚠️ Context optimization failed, using raw contexts: {str(e)}")
+            return [text for _, text in contexts[:max_contexts]]
+        
+        if optimizer.enabled and contexts:
+            with self._context_lock:
+                for key in ("retrieved", "merged", "duplicates", "selected", "tokens_saved"):
+                    self._context_counters[key] += report[key]
+                self._context_counters["requests"] += 1
+            logger.info(
+                f"📐 Contexts {report['retrieved']} → {report['selected']} "
+                f"(merged {report['merged']}, duplicates {report['duplicates']}), "
+                f"~{report['tokens_saved']} tokens saved"
+            )
+        return [text for _, text in selected]
+
+    def _prepare_contexts(self,
+                          question: str,
+                          max_contexts: int,
+                          context_options: Optional[Dict[str, Any]] = None,
+                          scope: Optional[List[str]] = None) -> Tuple[List[str], bool]:
+        """
+        Retrieve extra candidates and optimize them down to max_contexts.
+        Returns (context texts, whether retrieval was complete).
+        """
+        optimizer = self._context_optimizer(context_options)
+        with metrics.stage("retrieval"):
+            contexts, complete = self._search_contexts(question, optimizer.fetch_count(max_contexts), scope=scope)
+        with metrics.stage("context_optimize"):
+            return self._optimize_contexts(question, contexts, max_contexts, optimizer), complete
+
+    async def _aprepare_contexts(self,
+                                 question: str,
+                                 max_contexts: int,
+                                 context_options: Optional[Dict[str, Any]] = None,
+                                 scope: Optional[List[str]] = None) -> Tuple[List[str], bool]:
+        """Async _prepare_contexts."""
+        optimizer = self._context_optimizer(context_options)
+        with metrics.stage("retrieval"):
+            contexts, complete = await self._asearch_contexts(question, optimizer.fetch_count(max_contexts), scope=scope)
+        with metrics.stage("context_optimize"):
+            return await self.run_blocking(self._optimize_contexts, question, contexts, max_contexts, optimizer), complete
     
+    def _build_prompt(self, question: str, contexts: List[str], system_prompt: Optional[str] = None) -> str:
+        """Build the RAG prompt with numbered sources, compressed to the prompt token budget."""
+        # Build prompt with improved system prompt
+        if system_prompt is None:
+            system_prompt = base_system_prompt
+
+        with metrics.stage("prompt_build"):
+            prompt, report = self.prompt_packer.pack(question, contexts, system_prompt)
+        
+        with self._context_lock:
+            self._prompt_counters["prompts"] += 1
+            for key in ("prompt_tokens", "trimmed_tokens", "compressed", "dropped"):
+                self._prompt_counters[key] += report[key]
+        logger.info(
+            f"📐 Prompt ~{report['prompt_tokens']} tokens, {report['contexts']} sources"
+            + (f" (trimmed ~{report['trimmed_tokens']} tokens, {report['compressed']} compressed, "
+               f"{report['dropped']} dropped)" if report["trimmed_tokens"] else "")
+        )
+        return prompt
+
+    def _embed_question(self, normalized_question: str):
+        """Unit-length question embedding for the answer cache, or None on failure."""
+        try:
+            vector = self.embedding_batcher.embed_one(normalized_question, task_type="SEMANTIC_SIMILARITY")
+            norm = float(np.linalg.norm(vector))
+            return vector / norm if norm > 0 else None
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to embed question for answer cache: {str(e)}")
+            return None
+
+    def _cached_answer(self, question: str, normalized: str, variant: str, corpus_version: int) -> Optional[str]:
+        """Exact-match answer cache lookup; the semantic lookup waits for the question embedding."""
+        with metrics.stage("answer_cache_lookup"):
+            cached = self.answer_cache.get(normalized, variant, corpus_version)
+        if cached is not None:
+            logger.info(f"🎯 Answer cache hit for: '{question[:50]}...'")
+        return cached
+
+    def _similar_answer(self, question: str, variant: str, corpus_version: int, vector) -> Optional[str]:
+        """Semantic answer cache lookup with an already computed question embedding."""
+        with metrics.stage("answer_cache_semantic_lookup"):
+            cached = self.answer_cache.get_similar(variant, corpus_version, vector)
+        if cached is not None:
+            logger.info(f"🎯 Semantic answer cache hit for: '{question[:50]}...'")
+        return cached
+
+    def _answer_cache_key(self,
+                          question: str,
+                          system_prompt: Optional[str],
+                          max_contexts: int,
+                          temperature: float,
+                          enable_fallback: bool,
+                          context_options: Optional[Dict[str, Any]] = None,
+                          scope: Optional[List[str]] = None) -> Tuple[str, str]:
+        """Return (normalized question, variant) for the answer cache."""
+        prompt_hash = hashlib.sha256((system_prompt or base_system_prompt).encode('utf-8')).hexdigest()[:16]
+        variant = f"fallback={enable_fallback}|k={max_contexts}|t={temperature}|prompt={prompt_hash}"
+        if context_options:
+            variant += f"|contexts={json.dumps(context_options, sort_keys=True)}"
+        if scope:
+            variant += f"|scope={','.join(self._normalize_scope(scope))}"
+        return self._normalize_content_for_similarity(question), variant
+
     def answer(self, 
                question: str,
                system_prompt: Optional[str] = None,
                max_contexts: int = 5,
                temperature: float = 0.3,
-               enable_fallback: bool = True) -> str:
+               enable_fallback: bool = True,
+               context_options: Optional[Dict[str, Any]] = None,
+               scope: Optional[List[str]] = None) -> str:
         """
         Generate an answer to a question using RAG and Gemini.
+        Repeated or near-identical questions are served from the answer cache.
         
         Args:
             question: User's question
@@ -756,65 +2140,340 @@ class GeminiFAQSystem:
             max_contexts: Maximum number of contexts to retrieve
             temperature: Generation temperature (0.0 to 1.0)
             enable_fallback: Whether to use fallback LLM when no contexts found
+            context_options: Per-call ContextOptimizer overrides, e.g. {"mmr_lambda": 0.5}
+                or {"enabled": False}
+            scope: Shards to search, e.g. ["team_a"] (defaults to the shards relevant to the question)
             
         Returns:
             Generated answer
         """
+        corpus_version = self.corpus_version
+        normalized, variant = self._answer_cache_key(
+            question, system_prompt, max_contexts, temperature, enable_fallback, context_options, scope
+        )
+        cached = self._cached_answer(question, normalized, variant, corpus_version)
+        if cached is not None:
+            return cached
+        
+        # The question embedding for the semantic cache runs alongside retrieval, not before it
+        vector_future = self._question_executor.submit(self._embed_question, normalized)
+        answer, grounded = self._generate_answer(
+            question, system_prompt, max_contexts, temperature, enable_fallback, context_options, scope,
+            similar_answer=lambda: self._similar_answer(question, variant, corpus_version, vector_future.result()),
+        )
+        if grounded:
+            self.answer_cache.store(normalized, variant, corpus_version, answer, vector_future.result())
+        return answer
+
+    def _generate_answer(self,
+                         question: str,
+                         system_prompt: Optional[str] = None,
+                         max_contexts: int = 5,
+                         temperature: float = 0.3,
+                         enable_fallback: bool = True,
+                         context_options: Optional[Dict[str, Any]] = None,
+                         scope: Optional[List[str]] = None,
+                         similar_answer: Optional[Callable[[], Optional[str]]] = None) -> Tuple[str, bool]:
+        """
+        Uncached RAG + Gemini answer generation used by answer().
+        ``similar_answer`` is checked once contexts are retrieved; a semantic cache hit skips generation.
+        Returns (answer, grounded): only answers built on a complete retrieval may be cached.
+        """
+        contexts: List[str] = []
         try:
-            # Retrieve relevant contexts
-            contexts = self._retrieve_contexts(question, max_contexts)
+            # Retrieve relevant contexts, then merge, deduplicate and diversify them
+            contexts, grounded = self._prepare_contexts(question, max_contexts, context_options, scope)
+            
+            cached = similar_answer() if similar_answer else None
+            if cached is not None:
+                return cached, False
             
             if not contexts:
                 if enable_fallback:
                     # Use fallback system without knowledge base context
-                    fallback_prompt = """
-                    You are a helpful AI assistant. Answer the user's question to the best of your ability, but be honest about the limitations of your knowledge. If the question involves dangerous, illegal, or harmful content, politely decline to answer.
-                        Question: {question}
-                        Answer:
-                    """
-                    model = GenerativeModel("gemini-2.0-flash-001")
-                    response = model.generate_content(
-                        fallback_prompt.format(question=question),
-                        generation_config={
-                            "temperature": temperature,
-                            "top_p": 0.8,
-                            "top_k": 40,
-                            "max_output_tokens": 1024,
-                        }
-                    )
-                    return f"I couldn't find relevant information in our knowledge base to answer your question. Here's what I can tell you based on my general knowledge: {response.text}"
+                    text = self._generate_text(fallback_prompt.format(question=question), temperature)
+                    return f"{fallback_answer_prefix}{text}", grounded
                 else:
-                    return "I couldn't find relevant information to answer your question. Please try rephrasing or check if the knowledge base contains information about this topic."
+                    return no_context_answer, grounded
             
-            # Build prompt with improved system prompt
-            if system_prompt is None:
-                system_prompt = base_system_prompt
+            prompt = self._build_prompt(question, contexts, system_prompt)
+            
+            # Generate response using a shared Vertex AI GenerativeModel handle
+            return self._generate_text(prompt, temperature), grounded
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to generate answer: {str(e)}")
+            return self._failed_answer(e, contexts), False
 
-            prompt = f"{system_prompt}\n\n"
+    def _generate_text(self, prompt: str, temperature: float, model_name: str = answer_model_name, max_output_tokens: int = 1024) -> str:
+        """One Gemini generation through the LLM retry policy and circuit breaker."""
+        model = model_registry.generative_model(model_name, self._generation_config(temperature, max_output_tokens))
+        
+        def generate():
+            with model_registry.track(model_name):
+                return model.generate_content(prompt)
+        
+        with metrics.stage("generation"):
+            return resilience[VERTEX_LLM].call(generate).text
+
+    async def _agenerate_text(self, prompt: str, temperature: float, model_name: str = answer_model_name, max_output_tokens: int = 1024) -> str:
+        """Async _generate_text()."""
+        model = model_registry.generative_model(model_name, self._generation_config(temperature, max_output_tokens))
+        
+        async def generate():
+            with model_registry.track(model_name):
+                return await model.generate_content_async(prompt)
+        
+        with metrics.stage("generation"):
+            return (await resilience[VERTEX_LLM].acall(generate)).text
+
+    def _failed_answer(self, error: Exception, contexts: List[str]) -> str:
+        """
+        Reply when generation failed. While Gemini is unavailable (open circuit,
+        throttling, outages) the best retrieved contexts are served as excerpts;
+        other errors get a generic message, never the raw exception text.
+        """
+        if not contexts or not is_unavailable(error):
+            return error_answer
+        self._degraded_counters["excerpt_answers"] += 1
+        excerpts = [
+            f"Source {i}: {textwrap.shorten(' '.join(context.split()), width=degraded_excerpt_chars, placeholder=' …')}"
+            for i, context in enumerate(contexts[:3], 1)
+        ]
+        return f"{degraded_answer_prefix}\n\n" + "\n\n".join(excerpts)
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        try:
+            return chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. finish metadata)
+            return ""
+
+    def _generate_stream(self, prompt: str, temperature: float) -> Iterator[str]:
+        """Yield text deltas from a streaming Gemini generation."""
+        model = model_registry.generative_model(answer_model_name, self._generation_config(temperature))
+        
+        def start():
+            responses = iter(model.generate_content(prompt, stream=True))
+            return responses, next(responses, None)
+        
+        # Latency covers the whole stream, including time the consumer spends per chunk
+        with model_registry.track(answer_model_name), metrics.stage("generation_stream"):
+            # Retried until the first chunk arrives; once text is flowing a failure ends the stream
+            with metrics.stage("generation_first_chunk"):
+                responses, first = resilience[VERTEX_LLM].call(start)
+            for chunk in itertools.chain([first] if first is not None else [], responses):
+                text = self._chunk_text(chunk)
+                if text:
+                    yield text
+
+    def answer_stream(self,
+                      question: str,
+                      system_prompt: Optional[str] = None,
+                      max_contexts: int = 5,
+                      temperature: float = 0.3,
+                      enable_fallback: bool = True,
+                      context_options: Optional[Dict[str, Any]] = None,
+                      scope: Optional[List[str]] = None) -> Iterator[str]:
+        """
+        Stream an answer as text deltas. Same arguments and final text as answer().
+        
+        Yields:
+            Text deltas in generation order; on failure a final ReplacementAnswer
+            that replaces everything yielded before it
+        """
+        corpus_version = self.corpus_version
+        normalized, variant = self._answer_cache_key(
+            question, system_prompt, max_contexts, temperature, enable_fallback, context_options, scope
+        )
+        cached = self._cached_answer(question, normalized, variant, corpus_version)
+        if cached is not None:
+            yield cached
+            return
+        
+        vector_future = self._question_executor.submit(self._embed_question, normalized)
+        deltas: List[str] = []
+        contexts: List[str] = []
+        try:
+            contexts, grounded = self._prepare_contexts(question, max_contexts, context_options, scope)
             
-            # Add contexts with source numbers
-            for i, context in enumerate(contexts, 1):
-                prompt += f"Source {i}: {context}\n\n"
+            cached = self._similar_answer(question, variant, corpus_version, vector_future.result())
+            if cached is not None:
+                yield cached
+                return
             
-            prompt += f"Question: {question}\n\nAnswer:"
+            if not contexts:
+                if enable_fallback:
+                    deltas.append(fallback_answer_prefix)
+                    yield fallback_answer_prefix
+                    for delta in self._generate_stream(fallback_prompt.format(question=question), temperature):
+                        deltas.append(delta)
+                        yield delta
+                else:
+                    deltas.append(no_context_answer)
+                    yield no_context_answer
+            else:
+                prompt = self._build_prompt(question, contexts, system_prompt)
+                for delta in self._generate_stream(prompt, temperature):
+                    deltas.append(delta)
+                    yield delta
             
-            # Generate response using Vertex AI GenerativeModel
-            model = GenerativeModel("gemini-2.0-flash-001")
-            response = model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": temperature,
-                    "top_p": 0.8,
-                    "top_k": 40,
-                    "max_output_tokens": 1024,
-                }
-            )
+        except Exception as e:
+            logger.error(f"❌ Failed to stream answer: {str(e)}")
+            # Replaces any partial text, so excerpts are fine even mid-stream
+            yield ReplacementAnswer(self._failed_answer(e, contexts))
+            return
+        
+        # Answers built while Vertex retrieval was failing are not cached (see _search_contexts)
+        if grounded:
+            self.answer_cache.store(normalized, variant, corpus_version, "".join(deltas), vector_future.result())
+
+    async def aanswer(self,
+                      question: str,
+                      system_prompt: Optional[str] = None,
+                      max_contexts: int = 5,
+                      temperature: float = 0.3,
+                      enable_fallback: bool = True,
+                      context_options: Optional[Dict[str, Any]] = None,
+                      scope: Optional[List[str]] = None) -> str:
+        """
+        Async answer(): non-blocking retrieval and generation, same arguments and result.
+        """
+        corpus_version = self.corpus_version
+        normalized, variant = self._answer_cache_key(
+            question, system_prompt, max_contexts, temperature, enable_fallback, context_options, scope
+        )
+        cached = self._cached_answer(question, normalized, variant, corpus_version)
+        if cached is not None:
+            return cached
+        
+        vector_task = asyncio.ensure_future(self.run_blocking(self._embed_question, normalized))
+        
+        async def similar_answer() -> Optional[str]:
+            return self._similar_answer(question, variant, corpus_version, await vector_task)
+        
+        answer, grounded = await self._agenerate_answer(
+            question, system_prompt, max_contexts, temperature, enable_fallback, context_options, scope,
+            similar_answer=similar_answer,
+        )
+        if grounded:
+            self.answer_cache.store(normalized, variant, corpus_version, answer, await vector_task)
+        return answer
+
+    async def _agenerate_answer(self,
+                                question: str,
+                                system_prompt: Optional[str] = None,
+                                max_contexts: int = 5,
+                                temperature: float = 0.3,
+                                enable_fallback: bool = True,
+                                context_options: Optional[Dict[str, Any]] = None,
+                                scope: Optional[List[str]] = None,
+                                similar_answer: Optional[Callable[[], Awaitable[Optional[str]]]] = None) -> Tuple[str, bool]:
+        """Uncached async RAG + Gemini answer generation used by aanswer(); returns (answer, grounded)."""
+        contexts: List[str] = []
+        try:
+            contexts, grounded = await self._aprepare_contexts(question, max_contexts, context_options, scope)
+            
+            cached = await similar_answer() if similar_answer else None
+            if cached is not None:
+                return cached, False
+            
+            if not contexts:
+                if enable_fallback:
+                    text = await self._agenerate_text(fallback_prompt.format(question=question), temperature)
+                    return f"{fallback_answer_prefix}{text}", grounded
+                else:
+                    return no_context_answer, grounded
             
-            return response.text
+            prompt = self._build_prompt(question, contexts, system_prompt)
+            return await self._agenerate_text(prompt, temperature), grounded
             
         except Exception as e:
             logger.error(f"❌ Failed to generate answer: {str(e)}")
-            return f"I encountered an error while processing your question: {str(e)}"
+            return self._failed_answer(e, contexts), False
+
+    async def _agenerate_stream(self, prompt: str, temperature: float) -> AsyncIterator[str]:
+        """Yield text deltas from a non-blocking streaming Gemini generation."""
+        model = model_registry.generative_model(answer_model_name, self._generation_config(temperature))
+        
+        async def start():
+            responses = (await model.generate_content_async(prompt, stream=True)).__aiter__()
+            try:
+                return responses, await responses.__anext__()
+            except StopAsyncIteration:
+                return responses, None
+        
+        # Latency covers the whole stream, including time the consumer spends per chunk
+        with model_registry.track(answer_model_name), metrics.stage("generation_stream"):
+            # Retried until the first chunk arrives; once text is flowing a failure ends the stream
+            with metrics.stage("generation_first_chunk"):
+                responses, first = await resilience[VERTEX_LLM].acall(start)
+            if first is not None:
+                text = self._chunk_text(first)
+                if text:
+                    yield text
+            async for chunk in responses:
+                text = self._chunk_text(chunk)
+                if text:
+                    yield text
+
+    async def aanswer_stream(self,
+                             question: str,
+                             system_prompt: Optional[str] = None,
+                             max_contexts: int = 5,
+                             temperature: float = 0.3,
+                             enable_fallback: bool = True,
+                             context_options: Optional[Dict[str, Any]] = None,
+                             scope: Optional[List[str]] = None) -> AsyncIterator[str]:
+        """
+        Async answer_stream(): yields text deltas without blocking the event loop.
+        """
+        corpus_version = self.corpus_version
+        normalized, variant = self._answer_cache_key(
+            question, system_prompt, max_contexts, temperature, enable_fallback, context_options, scope
+        )
+        cached = self._cached_answer(question, normalized, variant, corpus_version)
+        if cached is not None:
+            yield cached
+            return
+        
+        vector_task = asyncio.ensure_future(self.run_blocking(self._embed_question, normalized))
+        deltas: List[str] = []
+        contexts: List[str] = []
+        try:
+            contexts, grounded = await self._aprepare_contexts(question, max_contexts, context_options, scope)
+            
+            cached = self._similar_answer(question, variant, corpus_version, await vector_task)
+            if cached is not None:
+                yield cached
+                return
+            
+            if not contexts:
+                if enable_fallback:
+                    deltas.append(fallback_answer_prefix)
+                    yield fallback_answer_prefix
+                    async for delta in self._agenerate_stream(fallback_prompt.format(question=question), temperature):
+                        deltas.append(delta)
+                        yield delta
+                else:
+                    deltas.append(no_context_answer)
+                    yield no_context_answer
+            else:
+                prompt = self._build_prompt(question, contexts, system_prompt)
+                async for delta in self._agenerate_stream(prompt, temperature):
+                    deltas.append(delta)
+                    yield delta
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to stream answer: {str(e)}")
+            # Replaces any partial text, so excerpts are fine even mid-stream
+            yield ReplacementAnswer(self._failed_answer(e, contexts))
+            return
+        
+        # Answers built while Vertex retrieval was failing are not cached (see _search_contexts)
+        if grounded:
+            self.answer_cache.store(normalized, variant, corpus_version, "".join(deltas), await vector_task)
     
     def chat(self, 
              question: str,
@@ -842,6 +2501,29 @@ class GeminiFAQSystem:
         # Generate answer
         answer = self.answer(question, chat_system_prompt, enable_fallback=enable_fallback)
         
+        return answer, self._append_history(conversation_history, question, answer)
+
+    async def achat(self,
+                    question: str,
+                    conversation_history: Optional[List[Dict[str, str]]] = None,
+                    system_prompt: Optional[str] = None,
+                    enable_fallback: bool = True) -> Tuple[str, List[Dict[str, str]]]:
+        """
+        Async chat(): same arguments and result, built on aanswer().
+        """
+        if conversation_history is None:
+            conversation_history = []
+        
+        chat_system_prompt = system_prompt or base_system_prompt
+        answer = await self.aanswer(question, chat_system_prompt, enable_fallback=enable_fallback)
+        
+        return answer, self._append_history(conversation_history, question, answer)
+
+    def _append_history(self,
+                        conversation_history: List[Dict[str, str]],
+                        question: str,
+                        answer: str) -> List[Dict[str, str]]:
+        """Append one exchange and trim the history."""
         # Update conversation history
         conversation_history.append({"role": "user", "content": question})
         conversation_history.append({"role": "assistant", "content": answer})
@@ -850,11 +2532,11 @@ class GeminiFAQSystem:
         if len(conversation_history) > 20:
             conversation_history = conversation_history[-20:]
         
-        return answer, conversation_history
+        return conversation_history
     
     def llm(self, 
             prompt: str,
-            model_name: str = "gemini-2.0-flash-001",
+            model_name: str = answer_model_name,
             temperature: float = 0.7) -> str:
         """
         Direct access to the LLM for custom prompts.
@@ -868,33 +2550,48 @@ class GeminiFAQSystem:
             Generated response
         """
         try:
-            model = GenerativeModel(model_name)
-            response = model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": temperature,
-                    "top_p": 0.8,
-                    "top_k": 40,
-                    "max_output_tokens": 2048,
-                }
-            )
-            return response.text
+            return self._generate_text(prompt, temperature, model_name, max_output_tokens=2048)
+            
+        except Exception as e:
+            logger.error(f"❌ LLM call failed: {str(e)}")
+            return f"Error: {str(e)}"
+
+    async def allm(self,
+                   prompt: str,
+                   model_name: str = answer_model_name,
+                   temperature: float = 0.7) -> str:
+        """
+        Async llm(): non-blocking generation, same arguments and result.
+        """
+        try:
+            return await self._agenerate_text(prompt, temperature, model_name, max_output_tokens=2048)
             
         except Exception as e:
             logger.error(f"❌ LLM call failed: {str(e)}")
             return f"Error: {str(e)}"
     
     def get_corpus_info(self) -> Dict:
-        """Get information about the current corpus."""
+        """Get information about the current corpus (files of all shards included)."""
         try:
-            files = list(rag.list_files(corpus_name=self._get_safe_corpus_metadata()['corpus_name']))
-            return {
+            files = []
+            shard_files = {}
+            for shard in self.shards.known():
+                corpus_resource = self._shard_corpus_name(shard)
+                if not corpus_resource:
+                    continue
+                listed = list(rag.list_files(corpus_name=corpus_resource))
+                shard_files[shard] = len(listed)
+                files.extend(listed)
+            info = {
                 "corpus_name": self._get_safe_corpus_metadata()['display_name'],
                 "corpus_id": self._get_safe_corpus_metadata()['corpus_name'],
                 "total_files": len(files),
                 "file_names": [f.display_name for f in files],
                 "created_at": getattr(self.corpus, 'create_time', 'Unknown'),
             }
+            if self.shards.enabled:
+                info["shards"] = shard_files
+            return info
         except Exception as e:
             logger.error(f"❌ Failed to get corpus info: {str(e)}")
             return {"error": str(e)}
@@ -903,9 +2600,17 @@ class GeminiFAQSystem:
         """Delete the current corpus (use with caution!)."""
         try:
             if self.corpus:
+                for shard in self.shards.known()[1:]:
+                    shard_corpus = self._shard_corpus_name(shard)
+                    rag.delete_corpus(name=shard_corpus)
+                    self.shards.forget(shard)
+                    logger.info(f"🗑️ Deleted shard corpus: {shard_corpus}")
                 rag.delete_corpus(name=self._get_safe_corpus_metadata()['corpus_name'])
                 logger.info(f"🗑️ Deleted corpus: {self._get_safe_corpus_metadata()['corpus_name']}")
                 self.corpus = None
+                self._corpus_cache_path().unlink(missing_ok=True)
+                self.keyword_index.rebuild([])
+                self._bump_corpus_version()
             else:
                 logger.warning("⚠️ No corpus to delete")
         except Exception as e:
@@ -917,10 +2622,42 @@ LOCATION = env_config.google_location
 SERVICE_ACCOUNT_PATH = env_config.google_credentials_path
 KNOWLEDGE_BASE_PATH = "knowledge_base"
 
-faq_system = GeminiFAQSystem(
-            project_id=PROJECT_ID,
-            location=LOCATION,
-            service_account_path=SERVICE_ACCOUNT_PATH,
-            corpus_name="FAQ-Knowledge-Base",
-            gcs_bucket=env_config.google_storage_bucket,
-        )
\ No newline at end of file
+_faq_system: Optional[GeminiFAQSystem] = None
+_faq_system_lock = threading.Lock()
+
+
+def get_faq_system() -> GeminiFAQSystem:
+    """Return the shared GeminiFAQSystem, building it on first use."""
+    global _faq_system
+    if _faq_system is None:
+        with _faq_system_lock:
+            if _faq_system is None:
+                _faq_system = GeminiFAQSystem(
+                    project_id=PROJECT_ID,
+                    location=LOCATION,
+                    service_account_path=SERVICE_ACCOUNT_PATH,
+                    corpus_name="FAQ-Knowledge-Base",
+                    gcs_bucket=env_config.google_storage_bucket,
+                    local_cache_dir=env_config.local_cache_dir,
+                    shard_corpora=env_config.shard_corpora,
+                    hedge_options={"enabled": env_config.hedge_retrieval},
+                )
+    return _faq_system
+
+
+def peek_faq_system() -> Optional[GeminiFAQSystem]:
+    """Return the shared GeminiFAQSystem if it has been built, without building it."""
+    return _faq_system
+
+
+class _LazyFAQSystem:
+    """
+    Module-level stand-in for the shared GeminiFAQSystem.
+    Importing this module stays cheap; the real instance is built on first attribute access.
+    """
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_faq_system(), name)
+
+
+faq_system: GeminiFAQSystem = _LazyFAQSystem()  # type: ignore[assignment]
@@ -0,0 +1,323 @@
+"""
+Retries with jittered exponential backoff and per-dependency circuit breakers
+for Vertex AI and GCS calls.
+
+Each external dependency (VERTEX_RAG, VERTEX_LLM, VERTEX_EMBEDDINGS, GCS) has
+one Dependency in the process-wide ``resilience`` registry. A call through it:
+
+1. fails fast with CircuitOpenError while the dependency's breaker is open,
+2. is retried on retryable errors (HTTP 429 and 5xx gateway codes, gRPC
+   RESOURCE_EXHAUSTED / UNAVAILABLE / DEADLINE_EXCEEDED, timeouts and dropped
+   connections) after a full-jitter exponential backoff,
+3. counts toward the breaker only on retryable errors; a 400 or 404 shows the
+   dependency is up and answering.
+
+Calls that are not idempotent (RAG imports, unconditional uploads) pass
+``idempotent=False`` and are only retried when the request surely had no
+effect: the connection was never made, or the server throttled or refused it
+(429 / 503). A timeout may have left the work running server-side, so it is
+raised instead of blindly repeated.
+
+After ``failure_threshold`` consecutive retryable failures the breaker opens
+for ``reset_timeout`` seconds, then lets one probe call through (half-open);
+the probe's outcome closes or re-opens it.
+"""
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import aiohttp
+from google.api_core.exceptions import GoogleAPICallError
+from requests.exceptions import (
+    ConnectionError as RequestsConnectionError,
+    ConnectTimeout as RequestsConnectTimeout,
+    Timeout as RequestsTimeout,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+VERTEX_RAG = "vertex_rag"
+VERTEX_LLM = "vertex_llm"
+VERTEX_EMBEDDINGS = "vertex_embeddings"
+GCS = "gcs"
+
+# Throttling and transient server-side failures
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# Rejected before any work started: safe to repeat even for non-idempotent calls
+UNSENT_STATUS = frozenset({429, 503})
+
+_UNSENT_TYPES = (
+    ConnectionRefusedError,
+    RequestsConnectTimeout,
+    aiohttp.ClientConnectorError,
+)
+
+_RETRYABLE_TYPES = (
+    TimeoutError,
+    ConnectionError,
+    asyncio.TimeoutError,
+    RequestsTimeout,
+    RequestsConnectionError,
+    aiohttp.ClientConnectionError,
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, dependency: str, retry_after: float):
+        super().__init__(f"{dependency} is unavailable (circuit open, next probe in {retry_after:.0f}s)")
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+
+def _status(error: BaseException) -> Optional[int]:
+    """HTTP status carried by a google-api-core, requests or aiohttp error, if any."""
+    if isinstance(error, GoogleAPICallError):
+        return error.code if isinstance(error.code, int) else None
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether ``error`` is transient (throttling, unavailability, timeouts, dropped connections)."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, _RETRYABLE_TYPES):
+        return True
+    return _status(error) in RETRYABLE_STATUS
+
+
+def is_unsent(error: BaseException) -> bool:
+    """Whether ``error`` means the request had no effect (no connection made, or throttled / refused)."""
+    if isinstance(error, _UNSENT_TYPES):
+        return True
+    return _status(error) in UNSENT_STATUS
+
+
+def is_unavailable(error: BaseException) -> bool:
+    """Whether ``error`` means the dependency itself is down or throttled (open circuit or transient failure)."""
+    return isinstance(error, CircuitOpenError) or is_retryable(error)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker with a single half-open probe.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            name: Dependency name used in errors and logs
+            failure_threshold: Consecutive retryable failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before a probe is allowed
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._counters = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def before_call(self):
+        """Admit a call or raise CircuitOpenError."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self._state == self.OPEN and remaining <= 0:
+                self._state = self.HALF_OPEN
+                self._probing = False
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self._counters["rejected"] += 1
+        raise CircuitOpenError(self.name, max(0.0, remaining))
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"✅ {self.name} recovered, circuit closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._counters["opened"] += 1
+                    logger.warning(f"⚠️ {self.name} circuit opened after {self._failures} failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self._state, "consecutive_failures": self._failures, **self._counters}
+
+
+class Dependency:
+    """
+    Retry policy plus circuit breaker for one external dependency.
+    """
+
+    def __init__(self,
+                 name: str,
+                 max_attempts: int = 4,
+                 base_delay: float = 0.5,
+                 max_delay: float = 8.0,
+                 failure_threshold: int = 5,
+                 reset_timeout: float = 30.0):
+        """
+        Args:
+            name: Dependency name
+            max_attempts: Calls made before giving up on a retryable error
+            base_delay: Backoff cap of the first retry in seconds (doubles per attempt)
+            max_delay: Upper bound of the backoff cap
+            failure_threshold: Consecutive retryable failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before a probe
+        """
+        self.name = name
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "retries": 0, "failures": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(max_delay, base_delay * 2**attempt)]."""
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _on_error(self, error: Exception, attempt: int, attempts: int, idempotent: bool = True) -> Optional[float]:
+        """Record a failed attempt; returns the backoff before the next one, or None to give up."""
+        if not is_retryable(error):
+            # The dependency answered; the request itself was bad
+            self.breaker.record_success()
+            return None
+        self.breaker.record_failure()
+        # A non-idempotent request that may have reached the server must not be repeated
+        unsafe = not idempotent and not is_unsent(error)
+        if unsafe or attempt + 1 >= attempts or self.breaker.state == CircuitBreaker.OPEN:
+            self._count("failures")
+            return None
+        self._count("retries")
+        delay = self._backoff(attempt)
+        logger.warning(f"⚠️ {self.name} call failed ({str(error)[:120]}), retry {attempt + 1} in {delay:.2f}s")
+        return delay
+
+    def call(self, fn: Callable[[], T], attempts: Optional[int] = None, idempotent: bool = True) -> T:
+        """
+        Run ``fn`` with retries and the circuit breaker.
+
+        Args:
+            fn: Zero-argument callable making the request
+            attempts: Override of max_attempts (1 = breaker only, for callers with a local fallback)
+            idempotent: False for requests with side effects; those are only retried when
+                the error shows the request had no effect (see is_unsent)
+        """
+        attempts = attempts or self.max_attempts
+        self._count("calls")
+        for attempt in range(attempts):
+            self.breaker.before_call()
+            try:
+                result = fn()
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                delay = self._on_error(e, attempt, attempts, idempotent)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+        raise AssertionError("unreachable")
+
+    async def acall(self,
+                    factory: Callable[[], Awaitable[T]],
+                    attempts: Optional[int] = None,
+                    idempotent: bool = True) -> T:
+        """Async call(): ``factory`` returns a fresh awaitable per attempt."""
+        attempts = attempts or self.max_attempts
+        self._count("calls")
+        for attempt in range(attempts):
+            self.breaker.before_call()
+            try:
+                result = await factory()
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                delay = self._on_error(e, attempt, attempts, idempotent)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+        raise AssertionError("unreachable")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        return {**counters, "breaker": self.breaker.stats()}
+
+
+class ResilienceRegistry:
+    """
+    Process-wide Dependency objects, created with default settings on first use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dependencies: Dict[str, Dependency] = {}
+
+    def __getitem__(self, name: str) -> Dependency:
+        dependency = self._dependencies.get(name)
+        if dependency is None:
+            with self._lock:
+                dependency = self._dependencies.setdefault(name, Dependency(name))
+        return dependency
+
+    def configure(self, name: str, **options):
+        """Replace a dependency's retry/breaker settings (counters restart)."""
+        with self._lock:
+            self._dependencies[name] = Dependency(name, **options)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-dependency call/retry/failure counters and breaker state."""
+        with self._lock:
+            dependencies = dict(self._dependencies)
+        return {name: dependency.stats() for name, dependency in dependencies.items()}
+
+
+resilience = ResilienceRegistry()
@@ -0,0 +1,99 @@
+"""
+Local change manifest used by GeminiFAQSystem.update() for incremental sync.
+
+One JSON file per synced directory maps each relative path to the file's last
+seen ``size`` and ``mtime_ns``, its content ``hash``, the ``gcs_path`` it was
+uploaded to and the ``rag_file_name`` of the imported RAG file. Files whose
+stat is unchanged are skipped without being read.
+"""
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+class SyncManifest:
+    """
+    Thread-safe path -> file state map persisted atomically to a JSON file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: JSON file backing the manifest
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+        self._dirty = False
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            if self.path.exists():
+                payload = json.loads(self.path.read_text(encoding="utf-8"))
+                if payload.get("version") == MANIFEST_VERSION:
+                    return payload.get("files", {})
+                logger.warning(f"⚠️ Ignoring sync manifest with unknown version: {self.path}")
+        except Exception as e:
+            logger.warning(f"⚠️ Ignoring unreadable sync manifest {self.path}: {str(e)}")
+        return {}
+
+    def get(self, rel_path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(rel_path)
+            return dict(entry) if entry is not None else None
+
+    def unchanged(self, rel_path: str, stat: os.stat_result) -> bool:
+        """True if ``rel_path`` was synced and its size and mtime are the same."""
+        with self._lock:
+            entry = self._entries.get(rel_path)
+            return (entry is not None
+                    and entry.get("size") == stat.st_size
+                    and entry.get("mtime_ns") == stat.st_mtime_ns)
+
+    def set(self, rel_path: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries[rel_path] = entry
+            self._dirty = True
+
+    def update(self, rel_path: str, **fields):
+        """Merge ``fields`` into an existing entry."""
+        with self._lock:
+            if rel_path in self._entries:
+                self._entries[rel_path].update(fields)
+                self._dirty = True
+
+    def remove(self, rel_path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.pop(rel_path, None)
+            self._dirty = self._dirty or entry is not None
+            return entry
+
+    def paths(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def items(self) -> Iterator:
+        with self._lock:
+            return iter([(rel_path, dict(entry)) for rel_path, entry in self._entries.items()])
+
+    def save(self):
+        """Write the manifest if it changed (temp file + rename, so a crash never truncates it)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = json.dumps({"version": MANIFEST_VERSION, "files": self._entries})
+            self._dirty = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(payload, encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,72 @@
+"""
+Startup-time benchmark for the modules every entry point imports.
+
+Each measurement runs in a fresh interpreter so module caches don't hide
+import cost. Run from the repository root:
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --construct
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# (label, python statement) measured in a fresh interpreter
+TARGETS = [
+    ("import rag_kb_gemini", "import agents.qna_agent.rag_kb_gemini"),
+    ("import modules.answers", "import modules.answers"),
+    ("import modules.qna_utils", "import modules.qna_utils"),
+    ("import main (FastAPI app)", "import main"),
+]
+
+CONSTRUCT_TARGET = (
+    "build faq_system",
+    "from agents.qna_agent.rag_kb_gemini import get_faq_system; get_faq_system()",
+)
+
+TIMER = """
+import time
+_start = time.perf_counter()
+{statement}
+print(time.perf_counter() - _start)
+"""
+
+
+def measure(statement: str) -> float:
+    """Seconds taken by ``statement`` in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-c", TIMER.format(statement=statement)],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "failed")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and boot cost of the Ella app")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument("--construct", action="store_true",
+                        help="Also time building the faq_system singleton (needs GCP credentials)")
+    args = parser.parse_args()
+
+    targets = TARGETS + ([CONSTRUCT_TARGET] if args.construct else [])
+
+    print(f"{'target':<30} {'median':>9} {'min':>9} {'max':>9}")
+    for label, statement in targets:
+        try:
+            samples = [measure(statement) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{label:<30} error: {e}")
+            continue
+        print(f"{label:<30} {statistics.median(samples):>8.3f}s {min(samples):>8.3f}s {max(samples):>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
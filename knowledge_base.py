@@ -1,8 +1,68 @@
 from utils.config import env_config
 from agents.qna_agent.rag_kb_gemini import faq_system
+import argparse
 import json
 import os
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync and query the Ella knowledge base")
+    parser.add_argument("--rebuild-embedding-index", action="store_true",
+                        help="Rebuild the local semantic dedup index from GCS and exit")
+    parser.add_argument("--rebuild-minhash-index", action="store_true",
+                        help="Rebuild the local near-duplicate (MinHash) index from GCS and exit")
+    parser.add_argument("--rebuild-keyword-index", action="store_true",
+                        help="Rebuild the local BM25 keyword index from GCS and exit")
+    parser.add_argument("--reimport-shard", metavar="SHARD",
+                        help="Delete and re-import one corpus shard from GCS and exit")
+    parser.add_argument("--migrate-embeddings", action="store_true",
+                        help="Move embeddings from GCS blob metadata to binary objects and exit")
+    parser.add_argument("--batch-size", type=int, default=25,
+                        help="Files per RAG import call (max 25)")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Concurrent hashing/upload workers")
+    parser.add_argument("--import-concurrency", type=int, default=2,
+                        help="RAG import operations allowed in flight at once")
+    parser.add_argument("--hash-workers", type=int, default=None,
+                        help="Threads used to hash local files (defaults to the CPU count)")
+    parser.add_argument("--rebuild-hash-metadata", action="store_true",
+                        help="Backfill file_hash metadata on GCS blobs from the local knowledge base and exit")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Sync against the local change manifest instead of rehashing every file")
+    args = parser.parse_args()
+
+    if args.hash_workers:
+        faq_system.file_hasher.max_workers = args.hash_workers
+
+    if args.rebuild_hash_metadata:
+        stats = faq_system.rebuild_hash_metadata("knowledge_base")
+        print(f"Hash metadata stats: {stats}")
+        print(f"Hashing stats: {faq_system.file_hasher.stats()}")
+        raise SystemExit(0)
+
+    if args.migrate_embeddings:
+        stats = faq_system.migrate_embedding_metadata()
+        print(f"Embedding migration stats: {stats}")
+        raise SystemExit(0)
+
+    if args.rebuild_minhash_index:
+        stats = faq_system.rebuild_minhash_index()
+        print(f"MinHash index stats: {stats}")
+        raise SystemExit(0)
+
+    if args.rebuild_keyword_index:
+        stats = faq_system.rebuild_keyword_index()
+        print(f"BM25 index stats: {stats}")
+        raise SystemExit(0)
+
+    if args.reimport_shard:
+        stats = faq_system.reimport_shard(args.reimport_shard)
+        print(f"Shard re-import stats: {stats}")
+        raise SystemExit(0)
+
+    if args.rebuild_embedding_index:
+        stats = faq_system.rebuild_embedding_index()
+        print(f"Embedding index stats: {stats}")
+        raise SystemExit(0)
+
     # Configuration - Update these with your actual values
     PROJECT_ID = env_config.google_project_id
     LOCATION = env_config.google_location
@@ -12,8 +72,15 @@ if __name__ == "__main__":
     # Initialize the FAQ system
     try:
         if os.path.exists(KNOWLEDGE_BASE_PATH):
-            stats = faq_system.update(KNOWLEDGE_BASE_PATH)
+            stats = faq_system.update(
+                KNOWLEDGE_BASE_PATH,
+                batch_size=args.batch_size,
+                max_workers=args.workers,
+                max_concurrent_imports=args.import_concurrency,
+                incremental=args.incremental,
+            )
             print(f"Upload stats: {stats}")
+            print(f"Hashing stats: {faq_system.file_hasher.stats()}")
         else:
             print(f"⚠️ Knowledge base path not found: {KNOWLEDGE_BASE_PATH}")
         
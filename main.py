@@ -3,13 +3,22 @@ import os
 from typing import Dict
 os.environ["PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION"] = "python"
 import uvicorn
-import asyncio, shlex, argparse
+import asyncio, shlex, argparse, time
 from fastapi import Request
+from fastapi.responses import PlainTextResponse
 from slack_bolt.adapter.fastapi.async_handler import AsyncSlackRequestHandler
 from utils.slack_app import app as slack_bolt_app
+from utils.slack_users import user_directory
+from utils.metrics import metrics
+from utils.job_scheduler import (
+    job_scheduler, SchedulerSaturated,
+    PRIORITY_INTERACTIVE, PRIORITY_INGEST, PRIORITY_STATS
+)
 from google.adk.cli.fast_api import get_fast_api_app
-from modules.answers import get_answer
+from modules.answers import get_answer_stream, single_flight_samples
 from modules.qna_utils import add_to_document, get_document_stats
+from agents.qna_agent.rag_kb_gemini import faq_system, get_faq_system, peek_faq_system
+from agents.qna_agent.corpus_shards import shard_slug
 
 app = get_fast_api_app(
     agents_dir="agents",    # where your `root_agent` modules live
@@ -18,15 +27,26 @@ app = get_fast_api_app(
 
 slack_handler = AsyncSlackRequestHandler(slack_bolt_app)
 
+metrics.register_collector(job_scheduler.metric_samples)
+metrics.register_collector(single_flight_samples)
+# Resolved per scrape; nothing to report until the FAQ system has been built
+metrics.register_collector(lambda: system.metric_samples() if (system := peek_faq_system()) else ())
+
+# Minimum seconds between chat_update calls while an answer streams in
+# (chat.update is a Tier 3 method, ~50 calls/minute per workspace)
+STREAM_UPDATE_INTERVAL = 1.0
+
 
 @slack_bolt_app.command("/ask_ella")
 async def handle_ask_ella(ack, body, respond):
+    received = time.perf_counter()
     text = body.get("text", "")
 
     try:
         tokens = text.split()
         parser = argparse.ArgumentParser(prog="/ask_ella", add_help=False)
         parser.add_argument("-a", "--anonymous", action="store_true")
+        parser.add_argument("-s", "--scope", help="Comma-separated corpus shards to search")
         args, remainder = parser.parse_known_args(tokens)
         question = " ".join(remainder).strip()
         if not question:
@@ -34,18 +54,47 @@ async def handle_ask_ella(ack, body, respond):
     except Exception:
         await ack()
         return await respond(
-            ":warning: Usage: `/ask_ella [--anonymous|-a] <your question>`\n"
+            ":warning: Usage: `/ask_ella [--anonymous|-a] [--scope|-s team_a,team_b] <your question>`\n"
             "Example: `/ask_ella -a What time is the meeting?`",
             response_type="ephemeral"
         )
 
+    # Ack before anything that may build the FAQ system (Slack's 3-second deadline)
+    await ack()
+    metrics.observe("stage_duration_seconds", time.perf_counter() - received, "Stage latency", stage="ask_ella.ack")
+
+    scope = None
+    if args.scope:
+        scope = sorted({shard_slug(name) for name in args.scope.split(",") if name.strip()})
+        # First use builds the system, so resolve shards off the event loop
+        known = await asyncio.get_running_loop().run_in_executor(None, lambda: get_faq_system().shards.known())
+        unknown = [name for name in scope if name not in known]
+        if unknown:
+            return await respond(
+                f":warning: Unknown scope: {', '.join(unknown)}. Available: {', '.join(known)}",
+                response_type="ephemeral"
+            )
+
     # Patch values into the body for downstream use
     body["text"] = question
     body["keep_anonymous"] = args.anonymous
+    body["scope"] = scope
 
-    await ack()
-    await respond(":hourglass: Working on it…")
-    asyncio.create_task(process_and_respond(body, slack_bolt_app.client))
+    try:
+        position = job_scheduler.submit(
+            "interactive",
+            lambda: process_and_respond(body, slack_bolt_app.client),
+            priority=PRIORITY_INTERACTIVE,
+            kind="ask_ella"
+        )
+    except SchedulerSaturated:
+        return await respond(
+            ":no_entry: I'm answering a lot of questions right now. Please try again in a minute.",
+            response_type="ephemeral"
+        )
+    # A free worker posts the "Working on it…" placeholder right away; only a wait needs a note
+    if position:
+        await respond(f":hourglass: You're #{position} in line, I'll answer shortly…")
 
 
 @slack_bolt_app.command("/add_to_document")
@@ -74,17 +123,31 @@ async def handle_add_to_document(ack, body, respond):
         )
 
     await ack()
-    await respond(":hourglass: Analyzing content relevance and adding to database…")
     
     # Process the document addition in background
-    asyncio.create_task(process_document_addition(
-        body, 
-        slack_bolt_app.client, 
-        content, 
-        args.title, 
-        args.category, 
-        args.force
-    ))
+    try:
+        position = job_scheduler.submit(
+            "background",
+            lambda: process_document_addition(
+                body, 
+                slack_bolt_app.client, 
+                content, 
+                args.title, 
+                args.category, 
+                args.force
+            ),
+            priority=PRIORITY_INGEST,
+            kind="add_to_document"
+        )
+    except SchedulerSaturated:
+        return await respond(
+            ":no_entry: I'm adding a lot of documents right now. Please try again in a few minutes.",
+            response_type="ephemeral"
+        )
+    if position:
+        await respond(f":hourglass: You're #{position} in line, I'll analyze and add your content shortly…")
+    else:
+        await respond(":hourglass: Analyzing content relevance and adding to database…")
 
 
 @slack_bolt_app.event("app_mention")
@@ -120,53 +183,13 @@ async def handle_app_mention(event, client):
         if _is_number_command(text):
             count = _parse_number_command(text)
             
-            # Get the last N messages
-            content = await get_last_n_messages(client, channel_id, thread_ts, count)
-            
-            # Add to knowledge base with default values
-            result = await add_to_document(
-                content=content,
-                title="Slack Thread",
-                category="general",
-                force_add=True,  # Skip relevance check for number-based saves
-                user_id=user_id,
-                context_info=f"Last {count} messages"
-            )
-            
-            # Remove hourglass reaction
-            try:
-                await client.reactions_remove(
-                    channel=channel_id,
-                    timestamp=message_ts,
-                    name="hourglass_flowing_sand"
-                )
-            except:
-                pass
-            
-            if result["status"] == "success":
-                await client.reactions_add(
-                    channel=channel_id,
-                    timestamp=message_ts,
-                    name="white_check_mark"
-                )
-                
-                await client.chat_postMessage(
-                    channel=channel_id,
-                    thread_ts=thread_ts or message_ts,
-                    text=f"✅ Saved last {count} messages to the knowledge base."
-                )
-            else:
-                await client.reactions_add(
-                    channel=channel_id,
-                    timestamp=message_ts,
-                    name="x"
-                )
-                
-                await client.chat_postMessage(
-                    channel=channel_id,
-                    thread_ts=thread_ts or message_ts,
-                    text=f":x: Error saving messages: {result.get('error', 'Unknown error occurred')}"
+            # Save in the background, behind interactive questions
+            await _schedule_mention_job(
+                client, channel_id, thread_ts, message_ts, "save_last_n",
+                lambda: process_last_n_messages_addition(
+                    client, channel_id, user_id, thread_ts, message_ts, count
                 )
+            )
             return
         
         # Check if this is an add_doc command
@@ -199,9 +222,12 @@ async def handle_app_mention(event, client):
                 return
             
             # Process in background
-            asyncio.create_task(process_mention_document_addition(
-                client, channel_id, user_id, thread_ts, message_ts, parsed_command
-            ))
+            await _schedule_mention_job(
+                client, channel_id, thread_ts, message_ts, "add_doc_mention",
+                lambda: process_mention_document_addition(
+                    client, channel_id, user_id, thread_ts, message_ts, parsed_command
+                )
+            )
             return
             
         # If we get here, check if it's a test message
@@ -352,6 +378,80 @@ def _parse_add_doc_command(text: str, user_id: str) -> Dict:
         }
 
 
+async def process_last_n_messages_addition(client, channel_id, user_id, thread_ts, message_ts, count: int):
+    """
+    Save the last N messages of a thread or channel to the knowledge base.
+    """
+    # Get the last N messages
+    content = await get_last_n_messages(client, channel_id, thread_ts, count)
+    
+    # Add to knowledge base with default values
+    result = await add_to_document(
+        content=content,
+        title="Slack Thread",
+        category="general",
+        force_add=True,  # Skip relevance check for number-based saves
+        user_id=user_id,
+        context_info=f"Last {count} messages"
+    )
+    
+    # Remove hourglass reaction
+    try:
+        await client.reactions_remove(
+            channel=channel_id,
+            timestamp=message_ts,
+            name="hourglass_flowing_sand"
+        )
+    except:
+        pass
+    
+    if result["status"] == "success":
+        await client.reactions_add(
+            channel=channel_id,
+            timestamp=message_ts,
+            name="white_check_mark"
+        )
+        
+        await client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts or message_ts,
+            text=f"✅ Saved last {count} messages to the knowledge base."
+        )
+    else:
+        await client.reactions_add(
+            channel=channel_id,
+            timestamp=message_ts,
+            name="x"
+        )
+        
+        await client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts or message_ts,
+            text=f":x: Error saving messages: {result.get('error', 'Unknown error occurred')}"
+        )
+
+
+async def _schedule_mention_job(client, channel_id, thread_ts, message_ts, kind, job):
+    """
+    Queue a document save triggered by an app mention, telling the user if it has to wait.
+    """
+    try:
+        position = job_scheduler.submit("background", job, priority=PRIORITY_INGEST, kind=kind)
+    except SchedulerSaturated:
+        await client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts or message_ts,
+            text=":no_entry: I'm saving a lot of documents right now. Please try again in a few minutes."
+        )
+        return
+    if position:
+        await client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts or message_ts,
+            text=f":hourglass: You're #{position} in line, I'll reply here when it's saved."
+        )
+
+
 async def process_mention_document_addition(client, channel_id, user_id, thread_ts, message_ts, parsed_command):
     """
     Process document addition from app mention (works in threads).
@@ -485,6 +585,11 @@ async def get_thread_context_for_mention(client, channel_id, thread_ts, addition
             messages = response["messages"]
             context_info = f"{len(messages)} messages from thread"
             
+            # Resolve every author once, up front
+            usernames = await user_directory.display_names(
+                client, (msg.get("user", "Unknown") for msg in messages)
+            )
+            
             # Format the thread conversation
             thread_content = []
             for msg in messages:
@@ -495,12 +600,7 @@ async def get_thread_context_for_mention(client, channel_id, thread_ts, addition
                 if not text.strip() or user_id == "bot":
                     continue
                 
-                # Get user info for better formatting
-                try:
-                    user_info = await client.users_info(user=user_id)
-                    username = user_info.get("user", {}).get("real_name") or user_info.get("user", {}).get("name") or f"User-{user_id}"
-                except:
-                    username = f"User-{user_id}"
+                username = usernames[user_id]
                 
                 # Clean up bot mentions from the text
                 import re
@@ -537,11 +637,19 @@ async def handle_document_stats(ack, body, respond):
     """
     await ack()
     
+    # Background processing with private follow-up
+    try:
+        job_scheduler.submit(
+            "background",
+            lambda: fetch_and_send_stats_private(respond),
+            priority=PRIORITY_STATS,
+            kind="document_stats"
+        )
+    except SchedulerSaturated:
+        return await respond(":no_entry: I'm busy right now. Please try again in a few minutes.", response_type="ephemeral")
+    
     # First private response
     await respond(":hourglass: Gathering knowledge base statistics...", response_type="ephemeral")
-    
-    # Background processing with private follow-up
-    asyncio.create_task(fetch_and_send_stats_private(respond))
 
 
 async def fetch_and_send_stats_private(respond):
@@ -549,8 +657,8 @@ async def fetch_and_send_stats_private(respond):
     Background task that uses the original respond function (always private).
     """
     try:
-        # This can take as long as needed
-        stats = get_document_stats()
+        # This can take as long as needed; run it off the event loop
+        stats = await faq_system.run_blocking(get_document_stats)
         
         if "error" in stats:
             message = f":warning: Error retrieving stats: {stats['error']}"
@@ -568,7 +676,7 @@ async def fetch_and_send_stats_private(respond):
     await respond(message, response_type="ephemeral")
 
 
-def _format_answer(answer: str, user_id: str, question: str, is_error: bool = False) -> str:
+def _format_answer(answer: str, user_id: str, question: str, is_error: bool = False, is_partial: bool = False) -> str:
     """
     Format the answer to include user mention and question context.
     """
@@ -578,6 +686,13 @@ def _format_answer(answer: str, user_id: str, question: str, is_error: bool = Fa
             f"Unfortunately, I couldn't find an answer for that. Either the question is invalid, or the answer is not in our knowledge base.\n\n"
             "But I have posted your question in the #faq channel for others to help out!"
         )
+    if is_partial:
+        if not answer:
+            return f"{user_id} asked:\n> {question}\n\n:hourglass: Working on it…"
+        return (
+            f"{user_id} asked:\n> {question}\n\n"
+            f"Here's what I found:\n> {answer} :writing_hand:"
+        )
     return (
         f"{user_id} asked:\n> {question}\n\n"
         f"Here's what I found:\n> {answer}. If this was helpful, feel free to upvote it! :thumbsup:\n\n"
@@ -585,32 +700,65 @@ def _format_answer(answer: str, user_id: str, question: str, is_error: bool = Fa
 
 
 async def process_and_respond(body, client):
+    with metrics.stage("ask_ella.respond"):
+        await _process_and_respond(body, client)
+
+
+async def _process_and_respond(body, client):
     question     = body["text"]
     user_id      = body["user_id"]
     channel_id   = body["channel_id"]
     is_anonymous = body.get("keep_anonymous", False)
+    scope        = body.get("scope")
     
     if is_anonymous:
         user_id = "Someone"
     else:
         user_id = f"<@{user_id}>"
 
-    llm_answer = await get_answer(
+    # Post a placeholder right away and edit it as the answer streams in
+    placeholder = await client.chat_postMessage(
+        channel=channel_id,
+        text=_format_answer("", user_id, question, is_partial=True)
+    )
+    message_ts = placeholder["ts"]
+    last_update = 0.0
+
+    async def on_partial(partial_answer: str):
+        nonlocal last_update
+        now = time.monotonic()
+        if now - last_update < STREAM_UPDATE_INTERVAL:
+            return
+        last_update = now
+        try:
+            with metrics.stage("ask_ella.slack_update"):
+                await client.chat_update(
+                    channel=channel_id,
+                    ts=message_ts,
+                    text=_format_answer(partial_answer, user_id, question, is_partial=True)
+                )
+        except Exception as e:
+            print(f"Error updating streamed answer: {e}")
+
+    llm_answer = await get_answer_stream(
         question=question,
         user_id=user_id,
-        client=client
+        client=client,
+        on_partial=on_partial,
+        scope=scope
     )
     
     
     if llm_answer["status"] == "error":
-        await client.chat_postMessage(
-            channel=channel_id,
-            text=_format_answer(llm_answer["error_message"], user_id, question, is_error=True)
-        )
+        final_text = _format_answer(llm_answer["error_message"], user_id, question, is_error=True)
     else:
-        await client.chat_postMessage(
+        final_text = _format_answer(llm_answer["message"], user_id, question)
+
+    with metrics.stage("ask_ella.slack_update"):
+        await client.chat_update(
             channel=channel_id,
-            text=_format_answer(llm_answer["message"], user_id, question)
+            ts=message_ts,
+            text=final_text
         )
 
 
@@ -692,6 +840,13 @@ async def get_message_context(client, channel_id, original_content, thread_ts=No
                 messages = response["messages"]
                 context_info = f"{len(messages)} messages from thread"
                 
+                # Resolve every author once, up front
+                usernames = await user_directory.display_names(
+                    client,
+                    (msg.get("user", "Unknown") for msg in messages),
+                    fallback=lambda user_id: user_id
+                )
+                
                 # Format the thread conversation
                 thread_content = []
                 for msg in messages:
@@ -699,12 +854,7 @@ async def get_message_context(client, channel_id, original_content, thread_ts=No
                     text = msg.get("text", "")
                     timestamp = msg.get("ts", "")
                     
-                    # Get user info for better formatting
-                    try:
-                        user_info = await client.users_info(user=user_id)
-                        username = user_info.get("user", {}).get("real_name") or user_info.get("user", {}).get("name") or user_id
-                    except:
-                        username = user_id
+                    username = usernames[user_id]
                     
                     if text.strip():  # Only include non-empty messages
                         thread_content.append(f"**{username}:** {text}")
@@ -775,6 +925,11 @@ async def get_last_n_messages(client, channel_id, thread_ts, count: int):
             )
             messages = response.get("messages", [])[1:]  # Exclude the mention message
         
+        # Resolve every author once, up front
+        usernames = await user_directory.display_names(
+            client, (msg.get("user", "Unknown") for msg in messages)
+        )
+        
         # Format messages
         formatted_messages = []
         for msg in messages:
@@ -784,12 +939,7 @@ async def get_last_n_messages(client, channel_id, thread_ts, count: int):
             if not text:
                 continue
                 
-            # Get user info for better formatting
-            try:
-                user_info = await client.users_info(user=user_id)
-                username = user_info.get("user", {}).get("real_name") or user_info.get("user", {}).get("name") or f"User-{user_id}"
-            except:
-                username = f"User-{user_id}"
+            username = usernames[user_id]
             
             formatted_messages.append(f"**{username}:** {text}")
         
@@ -811,5 +961,30 @@ async def slack_events(request: Request):
 async def slack_ping():
     return {"status": "ok"}
 
+@app.get("/slack/_jobs")
+async def slack_jobs():
+    # Queue depth, wait time and service time of background Slack jobs
+    return job_scheduler.stats()
+
+@app.get("/metrics")
+def prometheus_metrics():
+    # Sync route: rendering runs collectors under their locks; the FAQ system is only peeked, never built here
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("startup")
+async def warm_faq_system():
+    # Build the FAQ system and its model handles in the background so the port binds immediately
+    asyncio.get_running_loop().run_in_executor(None, lambda: get_faq_system().warm_models())
+    # Prefetch the Slack user directory so thread capture rarely needs users_info
+    asyncio.create_task(user_directory.warm(slack_bolt_app.client))
+
+@app.on_event("shutdown")
+async def close_faq_system():
+    await job_scheduler.shutdown()
+    # Never build the FAQ system just to close it
+    system = peek_faq_system()
+    if system is not None:
+        await system.aclose()
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -1,5 +1,8 @@
-from typing import Dict, Optional
-from agents.qna_agent.rag_kb_gemini import faq_system
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from slack_sdk.errors import SlackApiError
+from agents.qna_agent.rag_kb_gemini import faq_system, ReplacementAnswer
+from utils.metrics import metrics, Sample
 
 
 unanswered_questions = [
@@ -8,16 +11,47 @@ unanswered_questions = [
     "I couldn't find relevant information in our knowledge base to answer your question"
 ]
 
+# Bot token (one per workspace) -> #faq channel ID
+_faq_channel_ids: Dict[str, str] = {}
+
+# Errors meaning the cached #faq channel ID is no longer usable
+_stale_channel_errors = {"channel_not_found", "is_archived"}
+
 async def find_or_create_faq_channel(client) -> str:
     """
     Ensure a public channel named 'faq' exists, returning its channel ID.
+    The ID is cached per workspace; the channel list is only scanned on a miss.
     """
-    resp = await client.conversations_list(types="public_channel", limit=1000)
-    for ch in resp.get("channels", []):
-        if ch.get("name") == "faq":
-            return ch["id"]
-    resp = await client.conversations_create(name="faq", is_private=False)
-    return resp["channel"]["id"]
+    cached = _faq_channel_ids.get(client.token)
+    if cached:
+        return cached
+
+    channel_id = None
+    cursor = None
+    while channel_id is None:
+        resp = await client.conversations_list(
+            types="public_channel", exclude_archived=True, limit=1000, cursor=cursor
+        )
+        for ch in resp.get("channels", []):
+            if ch.get("name") == "faq":
+                channel_id = ch["id"]
+                break
+        cursor = resp.get("response_metadata", {}).get("next_cursor")
+        if not cursor:
+            break
+
+    if channel_id is None:
+        resp = await client.conversations_create(name="faq", is_private=False)
+        channel_id = resp["channel"]["id"]
+
+    _faq_channel_ids[client.token] = channel_id
+    return channel_id
+
+def invalidate_faq_channel(client):
+    """
+    Forget the cached #faq channel ID for the client's workspace.
+    """
+    _faq_channel_ids.pop(client.token, None)
 
 async def post_question_to_faq(client, faq_ch: str, question: str, user_id: str) -> Optional[str]:
     """
@@ -32,28 +66,166 @@ async def post_question_to_faq(client, faq_ch: str, question: str, user_id: str)
     )
     return resp.get("ts")
 
-async def get_answer(question: str, user_id: str, client) -> Dict[str, str]:
+def _parse_strict_flag(question: str) -> Tuple[str, bool]:
+    """
+    Strip the --strict flag, returning (question, enable_fallback).
+    """
+    if "--strict" in question:
+        return question.replace("--strict", "").strip(), False
+    return question, True
+
+async def _finalize_answer(answer: str, question: str, user_id: str, client) -> Dict[str, str]:
+    """
+    Post unanswered questions to #faq and build the response dict.
+    """
+    unanswered_question = any(q in answer for q in unanswered_questions)
+    if unanswered_question:
+        with metrics.stage("answer.faq_fallback"):
+            faq_ch = await find_or_create_faq_channel(client)
+            try:
+                await post_question_to_faq(client, faq_ch, question, user_id)
+            except SlackApiError as e:
+                if e.response.get("error") not in _stale_channel_errors:
+                    raise
+                # Channel was deleted or archived since we cached it; resolve it again
+                invalidate_faq_channel(client)
+                faq_ch = await find_or_create_faq_channel(client)
+                await post_question_to_faq(client, faq_ch, question, user_id)
+        return {
+            "status": "error",
+            "error_message": (
+                "I'm sorry, I don't have an answer right now. "
+                "I've posted your question in #faq—please check there."
+            )
+        }
+    return {"status": "success", "message": answer}
+
+class _InflightAnswer:
+    """
+    One answer being generated, shared by every requester of the same question.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.version = 0
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, delta: str):
+        # A failed generation's final answer replaces the partial text
+        self.text = str(delta) if isinstance(delta, ReplacementAnswer) else self.text + delta
+        self.version += 1
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def follow(self) -> AsyncIterator[str]:
+        """
+        Yield the answer generated so far each time it changes, from the start.
+        """
+        seen = -1
+        while True:
+            changed = self._changed
+            if self.version != seen:
+                seen = self.version
+                yield self.text
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+# (normalized question, enable_fallback, scope) -> answer currently being generated
+_inflight_answers: Dict[Tuple[str, bool, Tuple[str, ...]], _InflightAnswer] = {}
+_single_flight_stats = {"leaders": 0, "followers": 0}
+
+def _question_key(question: str,
+                  enable_fallback: bool,
+                  scope: Optional[List[str]] = None) -> Tuple[str, bool, Tuple[str, ...]]:
+    return " ".join(question.lower().split()).rstrip("?!. "), enable_fallback, tuple(sorted(scope or ()))
+
+async def _generate_shared(key: Tuple[str, bool, Tuple[str, ...]],
+                           inflight: _InflightAnswer,
+                           question: str,
+                           enable_fallback: bool,
+                           scope: Optional[List[str]] = None):
+    try:
+        with metrics.stage("answer.generate"):
+            async for delta in faq_system.aanswer_stream(question, enable_fallback=enable_fallback, scope=scope):
+                inflight.publish(delta)
+        inflight.finish()
+    except Exception as e:
+        inflight.finish(e)
+    finally:
+        # Nothing outlives the request: later askers start a fresh generation
+        _inflight_answers.pop(key, None)
+
+def _join_answer(question: str, enable_fallback: bool, scope: Optional[List[str]] = None) -> _InflightAnswer:
+    """
+    Return the in-flight answer for this question and scope, starting one if none is running.
+    """
+    key = _question_key(question, enable_fallback, scope)
+    inflight = _inflight_answers.get(key)
+    if inflight is not None:
+        _single_flight_stats["followers"] += 1
+        return inflight
+    inflight = _inflight_answers[key] = _InflightAnswer()
+    _single_flight_stats["leaders"] += 1
+    # Own task, so one requester going away doesn't cancel it for the others
+    asyncio.create_task(_generate_shared(key, inflight, question, enable_fallback, scope))
+    return inflight
+
+def get_single_flight_stats() -> Dict[str, int]:
+    """
+    Generations started vs. requests that joined one already in flight.
+    """
+    return {**_single_flight_stats, "in_flight": len(_inflight_answers)}
+
+def single_flight_samples() -> Iterator[Sample]:
+    """
+    get_single_flight_stats() as metrics samples.
+    """
+    stats = get_single_flight_stats()
+    yield ("answer_generations_total", "counter", "Answer generations started", {}, stats["leaders"])
+    yield ("answer_joins_total", "counter", "Requests that joined an answer already in flight", {}, stats["followers"])
+    yield ("answer_generations_in_flight", "gauge", "Answer generations currently running", {}, stats["in_flight"])
+
+async def get_answer(question: str, user_id: str, client, scope: Optional[List[str]] = None) -> Dict[str, str]:
     """
     Query the LLM and fall back to posting in #faq if needed.
+    Non-streaming get_answer_stream(): shares its single-flight generation.
+    """
+    async def ignore_partial(_: str):
+        pass
+
+    return await get_answer_stream(question, user_id, client, ignore_partial, scope)
+
+async def get_answer_stream(question: str,
+                            user_id: str,
+                            client,
+                            on_partial: Callable[[str], Awaitable[None]],
+                            scope: Optional[List[str]] = None) -> Dict[str, str]:
+    """
+    Stream the LLM answer, calling on_partial with the text generated so far.
+    Identical questions asked while one is being answered share its generation.
+    ``scope`` limits retrieval to these corpus shards (None searches all).
+    Returns the same dict as get_answer once generation finishes.
     """
     try:
-        enable_fallback = True
-        if "--strict" in question:
-            enable_fallback = False
-            question = question.replace("--strict", "").strip()
-        (answer,_) = faq_system.chat(question, enable_fallback = enable_fallback)
-        unanswered_question = any(q in answer for q in unanswered_questions)
-        if unanswered_question:
-            faq_ch = await find_or_create_faq_channel(client)
-            await post_question_to_faq(client, faq_ch, question, user_id)
-            return {
-                "status": "error",
-                "error_message": (
-                    "I'm sorry, I don't have an answer right now. "
-                    "I've posted your question in #faq—please check there."
-                )
-            }
-        return {"status": "success", "message": answer}
+        question, enable_fallback = _parse_strict_flag(question)
+        answer = ""
+        async for answer in _join_answer(question, enable_fallback, scope).follow():
+            if answer:
+                await on_partial(answer)
+        return await _finalize_answer(answer, question, user_id, client)
     except Exception as e:
         print(f"Error processing question: {e}")
-        return {"status": "error", "error_message": "Internal error, please try again later."}
\ No newline at end of file
+        return {"status": "error", "error_message": "Internal error, please try again later."}
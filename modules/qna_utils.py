@@ -7,6 +7,7 @@ from langchain.schema import Document
 from langchain.text_splitter import CharacterTextSplitter
 
 from agents.qna_agent.rag_kb_gemini import faq_system
+from utils.metrics import metrics
 
 
 RELEVANCE_PROMPT = """
@@ -55,7 +56,8 @@ async def check_content_relevance(content: str, title: str | None = None, catego
             category=category or "No category provided"
         )
 
-        response = faq_system.llm(prompt, temperature=0.3)
+        with metrics.stage("add_document.relevance_check"):
+            response = await faq_system.allm(prompt, temperature=0.3)
         try:
             clean_response = response.strip()
             if clean_response.startswith("```json"):
@@ -119,16 +121,18 @@ async def add_document_to_vectorstore(content: str, title: str, category: str, u
         }
         
         # Use the new add_document method with semantic deduplication
-        result = await faq_system.add_document(
-            content=content,
-            title=title,
-            doc_type=category,
-            metadata=metadata,
-            chunk_size=1000,
-            chunk_overlap=200,
-            similarity_threshold=similarity_threshold,
-            enable_semantic_dedup=enable_semantic_dedup
-        )
+        with metrics.stage("add_document.store"):
+            result = await faq_system.aadd_document(
+                content=content,
+                title=title,
+                doc_type=category,
+                metadata=metadata,
+                chunk_size=1000,
+                chunk_overlap=200,
+                similarity_threshold=similarity_threshold,
+                enable_semantic_dedup=enable_semantic_dedup
+            )
+        metrics.inc("documents_added_total", 1, "Slack-added documents by outcome", status=result.get("status", "error"))
         
         assert isinstance(result, dict), "Expected result to be a dictionary"
         
@@ -253,22 +257,18 @@ def get_document_stats() -> Dict:
         # Initialize document types counter
         document_types = {}
         
-        # Try to get document type information from GCS metadata
+        # Get document type information from the hash manifest (one cached object, no per-blob reloads)
         try:
-            if faq_system.storage_client:
-                bucket = faq_system.storage_client.bucket(faq_system.storage_bucket)
-                blobs = bucket.list_blobs(prefix=f"{faq_system.corpus_name}/documents/")
-                
-                for blob in blobs:
+            if faq_system.hash_manifest:
+                for entry in faq_system.hash_manifest.entries().values():
                     try:
-                        blob.reload()
-                        if blob.metadata and "doc_type" in blob.metadata:
-                            doc_type = blob.metadata["doc_type"]
-                        elif blob.metadata and "custom_doc_type" in blob.metadata:
-                            doc_type = blob.metadata["custom_doc_type"]
-                        else:
+                        if not entry["path"].startswith("documents/"):
+                            continue
+                        
+                        doc_type = entry.get("doc_type")
+                        if not doc_type:
                             # Fallback: try to infer from filename
-                            filename = blob.name.split("/")[-1]
+                            filename = entry["path"].split("/")[-1]
                             if filename.endswith(".txt"):
                                 doc_type = "text"
                             elif filename.endswith(".md"):
@@ -279,7 +279,7 @@ def get_document_stats() -> Dict:
                         document_types[doc_type] = document_types.get(doc_type, 0) + 1
                         
                     except Exception as e:
-                        # If we can't get metadata for a specific blob, count it as "unknown"
+                        # If an entry is malformed, count it as "unknown"
                         document_types["unknown"] = document_types.get("unknown", 0) + 1
                         
         except Exception as e:
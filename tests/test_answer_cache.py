@@ -0,0 +1,76 @@
+import numpy as np
+
+from agents.qna_agent.answer_cache import SemanticAnswerCache
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_exact_hit_skips_embedding():
+    cache = SemanticAnswerCache()
+    cache.store("how do i deploy", "v", 0, "answer")
+
+    def embed(question):
+        raise AssertionError("exact hits must not embed")
+
+    assert cache.lookup("how do i deploy", "v", 0, embed) == ("answer", None)
+    assert cache.stats()["hits"] == 1
+
+
+def test_semantic_hit_above_threshold():
+    cache = SemanticAnswerCache(similarity_threshold=0.9)
+    cache.store("how do i deploy", "v", 0, "answer", unit(1, 0))
+
+    assert cache.get("how can i deploy", "v", 0) is None
+    assert cache.get_similar("v", 0, unit(1, 0.1)) == "answer"
+    assert cache.get_similar("v", 0, unit(1, 1)) is None
+
+    stats = cache.stats()
+    assert (stats["semantic_hits"], stats["misses"]) == (1, 1)
+
+
+def test_variants_never_share_answers():
+    cache = SemanticAnswerCache()
+    cache.store("q", "strict", 0, "answer", unit(1, 0))
+
+    assert cache.get("q", "fallback", 0) is None
+    assert cache.get_similar("fallback", 0, unit(1, 0)) is None
+
+
+def test_corpus_version_change_invalidates():
+    cache = SemanticAnswerCache()
+    cache.store("q", "v", 0, "answer", unit(1, 0))
+
+    assert cache.get("q", "v", 1) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_answer_generated_against_old_corpus_is_not_stored():
+    cache = SemanticAnswerCache()
+    cache.invalidate(2)
+    cache.store("q", "v", 1, "stale answer")
+
+    assert cache.get("q", "v", 2) is None
+
+
+def test_expired_entries_miss():
+    cache = SemanticAnswerCache(ttl_seconds=-1)
+    cache.store("q", "v", 0, "answer", unit(1, 0))
+
+    assert cache.get("q", "v", 0) is None
+    assert cache.get_similar("v", 0, unit(1, 0)) is None
+
+
+def test_lru_eviction():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.store("a", "v", 0, "A")
+    cache.store("b", "v", 0, "B")
+    cache.get("a", "v", 0)
+    cache.store("c", "v", 0, "C")
+
+    assert cache.get("b", "v", 0) is None
+    assert cache.get("a", "v", 0) == "A"
+    assert cache.stats()["evictions"] == 1
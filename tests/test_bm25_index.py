@@ -0,0 +1,94 @@
+from agents.qna_agent.bm25_index import BM25Index, reciprocal_rank_fusion, split_passages, tokenize
+
+DOCS = {
+    "deploy.md": "Deploy the commerceiq-client-extensions service with the release pipeline.",
+    "oncall.md": "The on-call rotation is listed in PagerDuty. Escalate after 15 minutes.",
+    "pipelines.md": "Data pipelines run on Airflow; each pipeline owns its DAG.",
+}
+
+
+def build(tmp_path, docs=DOCS):
+    index = BM25Index(str(tmp_path))
+    index.rebuild(docs.items())
+    return index
+
+
+def test_tokenize_keeps_compound_names_and_parts():
+    terms = tokenize("The client-extensions repo")
+
+    assert "client-extensions" in terms
+    assert {"client", "extensions", "repo"} <= set(terms)
+    assert "the" not in terms
+
+
+def test_split_passages_overlap():
+    text = " ".join(str(i) for i in range(10))
+    passages = [text[start:end] for start, end in split_passages(text, passage_words=4, overlap=2)]
+
+    assert passages == ["0 1 2 3", "2 3 4 5", "4 5 6 7", "6 7 8 9"]
+    assert split_passages("   ") == []
+
+
+def test_reciprocal_rank_fusion_merges_duplicates():
+    fused = reciprocal_rank_fusion([["a", "b  c"], ["b c", "d"]])
+
+    assert fused[0] == "b  c"
+    assert set(fused) == {"a", "b  c", "d"}
+
+
+def test_exact_term_ranks_its_document_first(tmp_path):
+    index = build(tmp_path)
+
+    results = index.search("commerceiq-client-extensions")
+
+    assert results[0][0] == "deploy.md"
+    assert "commerceiq-client-extensions" in results[0][2]
+
+
+def test_doc_filter_and_unknown_terms(tmp_path):
+    index = build(tmp_path)
+
+    assert index.search("pipeline", doc_filter=lambda doc_id: doc_id != "pipelines.md")[0][0] == "deploy.md"
+    assert index.search("kubernetes") == []
+
+
+def test_add_replace_and_remove(tmp_path):
+    index = build(tmp_path)
+    index.add("oncall.md", "Incidents go to Opsgenie now.")
+    index.remove("pipelines.md")
+
+    assert index.search("pagerduty") == []
+    assert index.search("opsgenie")[0][0] == "oncall.md"
+    assert index.search("airflow") == []
+    assert not index.remove("pipelines.md")
+
+
+def test_log_replays_on_load(tmp_path):
+    index = build(tmp_path)
+    index.add("new.md", "Grafana dashboards live in the observability folder.")
+    index.remove("oncall.md")
+
+    reloaded = BM25Index(str(tmp_path))
+
+    assert len(reloaded) == 3
+    assert reloaded.search("grafana")[0][0] == "new.md"
+    assert reloaded.search("pagerduty") == []
+
+
+def test_exists_requires_a_rebuild(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add("a.md", "partial log")
+    assert not index.exists()
+
+    index.rebuild([])
+    assert index.exists()
+
+
+def test_compaction_keeps_results(tmp_path):
+    index = BM25Index(str(tmp_path), compact_ratio=0.1)
+    index.rebuild(DOCS.items())
+    for i in range(5):
+        index.add("deploy.md", f"Deploy revision {i} with the release pipeline.")
+
+    assert index.search("revision")[0][2].endswith("revision 4 with the release pipeline.")
+    assert len(BM25Index(str(tmp_path))) == 3
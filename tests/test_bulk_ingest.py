@@ -0,0 +1,166 @@
+import hashlib
+
+import pytest
+
+from agents.qna_agent import bulk_ingest
+from agents.qna_agent.bulk_ingest import BulkIngestor, MAX_IMPORT_PATHS
+from agents.qna_agent.sync_manifest import SyncManifest
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.metadata = None
+
+    def upload_from_filename(self, filename):
+        self.bucket.objects[self.name] = filename
+
+    def patch(self):
+        pass
+
+    def delete(self):
+        del self.bucket.objects[self.name]
+
+
+class FakeBucket:
+    def __init__(self):
+        self.objects = {}
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+
+class FakeStorageClient:
+    def __init__(self):
+        self.fake_bucket = FakeBucket()
+
+    def bucket(self, name):
+        return self.fake_bucket
+
+
+class FakeShards:
+    def route_path(self, rel_path):
+        return rel_path.split("/")[0] if "/" in rel_path else "default"
+
+
+class FakeFAQSystem:
+    """The parts of GeminiFAQSystem that BulkIngestor calls."""
+
+    def __init__(self):
+        self.storage_client = FakeStorageClient()
+        self.storage_bucket = "bucket"
+        self.corpus_name = "corpus"
+        self.shards = FakeShards()
+        self.hashes = {}
+        self.imports = []
+        self.fail_imports = False
+
+    def _get_existing_file_hashes(self):
+        return dict(self.hashes)
+
+    def _calculate_file_hash(self, path):
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def _shard_corpus_name(self, shard, create=False):
+        return f"corpora/{shard}"
+
+    def _import_files(self, corpus_resource, paths, chunk_size, chunk_overlap):
+        if self.fail_imports:
+            raise RuntimeError("import failed")
+        self.imports.append((corpus_resource, list(paths)))
+
+    def _record_file_hashes(self, uploads):
+        for file_hash, blob in uploads:
+            self.hashes[file_hash] = blob.name
+
+    def _forget_file_hashes(self, file_hashes):
+        for file_hash in file_hashes:
+            self.hashes.pop(file_hash, None)
+
+    def _rag_file_names(self):
+        return {}
+
+    def _keyword_doc_id(self, gcs_path):
+        return gcs_path
+
+    def _index_keywords(self, doc_id, text):
+        pass
+
+    def _unindex_keywords(self, doc_id):
+        pass
+
+
+@pytest.fixture
+def faq_system(monkeypatch):
+    monkeypatch.setattr(bulk_ingest.rag, "delete_file", lambda name: None)
+    return FakeFAQSystem()
+
+
+def write_docs(root, count, prefix=""):
+    paths = []
+    for i in range(count):
+        path = root / f"{prefix}doc{i:02d}.md"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"{prefix} document {i}", encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def test_imports_in_batches_of_at_most_max_import_paths(tmp_path, faq_system):
+    docs = write_docs(tmp_path, MAX_IMPORT_PATHS + 5)
+
+    stats = BulkIngestor(faq_system, batch_size=100).run(str(tmp_path), docs)
+
+    assert sorted(len(paths) for _, paths in faq_system.imports) == [5, MAX_IMPORT_PATHS]
+    assert stats["uploaded"] == stats["imported"] == MAX_IMPORT_PATHS + 5
+    assert stats["failed"] == 0
+
+
+def test_imports_one_call_per_shard(tmp_path, faq_system):
+    docs = write_docs(tmp_path, 2, prefix="eng/") + write_docs(tmp_path, 1)
+
+    BulkIngestor(faq_system).run(str(tmp_path), docs)
+
+    assert sorted((corpus, len(paths)) for corpus, paths in faq_system.imports) == [
+        ("corpora/default", 1), ("corpora/eng", 2)
+    ]
+
+
+def test_skips_content_already_in_corpus(tmp_path, faq_system):
+    docs = write_docs(tmp_path, 2)
+    faq_system.hashes[faq_system._calculate_file_hash(str(docs[0]))] = "corpus/old.md"
+
+    stats = BulkIngestor(faq_system).run(str(tmp_path), docs)
+
+    assert stats["skipped"] == 1
+    assert stats["imported"] == 1
+
+
+def test_failed_import_is_counted_and_not_recorded(tmp_path, faq_system):
+    docs = write_docs(tmp_path, 3)
+    faq_system.fail_imports = True
+
+    stats = BulkIngestor(faq_system).run(str(tmp_path), docs)
+
+    assert stats["failed"] == 3
+    assert stats["imported"] == 0
+    assert faq_system.hashes == {}
+
+
+def test_incremental_run_skips_unchanged_and_propagates_deletions(tmp_path, faq_system):
+    docs_dir = tmp_path / "docs"
+    docs = write_docs(docs_dir, 3)
+    manifest_path = str(tmp_path / "sync.json")
+
+    BulkIngestor(faq_system, manifest=SyncManifest(manifest_path)).run(str(docs_dir), docs)
+    docs[2].unlink()
+    stats = BulkIngestor(faq_system, manifest=SyncManifest(manifest_path)).run(str(docs_dir), docs[:2])
+
+    assert stats["unchanged"] == 2
+    assert stats["deleted"] == 1
+    assert stats["uploaded"] == 0
+    assert "corpus/doc02.md" not in faq_system.storage_client.fake_bucket.objects
+    assert sorted(SyncManifest(manifest_path).paths()) == ["doc00.md", "doc01.md"]
+    assert len(faq_system.hashes) == 2
@@ -0,0 +1,79 @@
+import pytest
+
+from agents.qna_agent.context_optimizer import ContextOptimizer, estimate_tokens
+
+FIRST = "Deploys go through the release pipeline and need an approved change ticket before they start."
+SECOND = "need an approved change ticket before they start. Rollbacks use the same pipeline in reverse."
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcde") == 2
+
+
+def test_merges_overlapping_chunks_of_the_same_source():
+    optimizer = ContextOptimizer(min_overlap_chars=20)
+
+    selected, report = optimizer.optimize("deploy", [("doc", FIRST), ("doc", SECOND)], max_contexts=5)
+
+    assert selected == [("doc", FIRST + SECOND[len("need an approved change ticket before they start."):])]
+    assert report["merged"] == 1
+
+
+def test_does_not_merge_across_sources():
+    optimizer = ContextOptimizer(min_overlap_chars=20, duplicate_threshold=1.0)
+
+    selected, _ = optimizer.optimize("deploy", [("a", FIRST), ("b", SECOND)], max_contexts=5)
+
+    assert len(selected) == 2
+
+
+def test_contained_chunk_is_merged_away():
+    optimizer = ContextOptimizer()
+
+    selected, _ = optimizer.optimize("deploy", [("doc", FIRST), ("doc", FIRST[10:60])], max_contexts=5)
+
+    assert selected == [("doc", FIRST)]
+
+
+def test_drops_near_duplicates_from_other_sources():
+    optimizer = ContextOptimizer(mmr_lambda=1.0)
+    contexts = [("a", FIRST), ("b", FIRST.replace("Deploys", "Deployments")), ("c", SECOND)]
+
+    selected, report = optimizer.optimize("deploy", contexts, max_contexts=5)
+
+    assert [source for source, _ in selected] == ["a", "c"]
+    assert report["duplicates"] == 1
+
+
+def test_mmr_prefers_diverse_contexts():
+    optimizer = ContextOptimizer(duplicate_threshold=1.0, mmr_lambda=0.3)
+    contexts = [
+        ("a", "oncall rotation pagerduty schedule escalation"),
+        ("b", "oncall rotation pagerduty schedule escalation policy"),
+        ("c", "oncall handbook covers incident review"),
+    ]
+
+    selected, _ = optimizer.optimize("oncall rotation", contexts, max_contexts=2)
+
+    assert [source for source, _ in selected] == ["a", "c"]
+
+
+def test_disabled_optimizer_passes_through():
+    optimizer = ContextOptimizer(enabled=False)
+    contexts = [("doc", FIRST), ("doc", FIRST)]
+
+    selected, report = optimizer.optimize("deploy", contexts, max_contexts=1)
+
+    assert selected == contexts[:1]
+    assert report["tokens_saved"] == 0
+    assert optimizer.fetch_count(5) == 5
+
+
+def test_with_options_overrides_and_validates():
+    optimizer = ContextOptimizer(candidate_multiplier=3).with_options(mmr_lambda=0.5)
+
+    assert optimizer.mmr_lambda == 0.5
+    assert optimizer.fetch_count(4) == 12
+    with pytest.raises(ValueError):
+        optimizer.with_options(unknown=True)
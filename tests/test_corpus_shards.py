@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from agents.qna_agent import corpus_shards as shards_module
+from agents.qna_agent.corpus_shards import DEFAULT_SHARD, CorpusShards, shard_slug
+
+
+class FakeCorpus:
+    def __init__(self, display_name, name):
+        self.display_name = display_name
+        self.name = name
+
+
+@pytest.fixture
+def created():
+    return []
+
+
+@pytest.fixture
+def make_shards(tmp_path, monkeypatch, created):
+    monkeypatch.setattr(shards_module.rag, "list_corpora", lambda: [
+        FakeCorpus("kb--eng", "corpora/eng"),
+        FakeCorpus("other--x", "corpora/x"),
+    ])
+
+    def create_corpus(display_name):
+        created.append(display_name)
+        return FakeCorpus(display_name, f"corpora/{len(created)}")
+
+    def make(**kwargs):
+        kwargs.setdefault("enabled", True)
+        return CorpusShards("kb", str(tmp_path / "shards.json"), create_corpus, **kwargs)
+
+    return make
+
+
+def test_shard_slug():
+    assert shard_slug("Team Updates") == "team-updates"
+    assert shard_slug("eng_docs") == "eng_docs"
+    assert shard_slug("  !! ") == DEFAULT_SHARD
+
+
+def test_route_path(make_shards):
+    shards = make_shards()
+
+    assert shards.route_path("eng/guide.md") == "eng"
+    assert shards.route_path("documents/Team Updates/note.txt") == "team-updates"
+    assert shards.route_path("guide.md") == DEFAULT_SHARD
+    assert shards.route_path("documents/note.txt") == DEFAULT_SHARD
+
+
+def test_route_category(make_shards):
+    shards = make_shards()
+
+    assert shards.route_category("Onboarding") == "onboarding"
+    assert shards.route_category("markdown") == DEFAULT_SHARD
+    assert shards.route_category(None) == DEFAULT_SHARD
+
+
+def test_disabled_routes_everything_to_default(make_shards):
+    shards = make_shards(enabled=False)
+
+    assert shards.route_path("eng/guide.md") == DEFAULT_SHARD
+    assert shards.known() == [DEFAULT_SHARD]
+
+
+def test_discovers_existing_shards_and_caches_them(tmp_path, make_shards):
+    shards = make_shards()
+
+    assert shards.known() == [DEFAULT_SHARD, "eng"]
+    assert json.loads((tmp_path / "shards.json").read_text())["shards"] == {"eng": "corpora/eng"}
+
+
+def test_corpus_created_once_on_demand(make_shards, created):
+    shards = make_shards()
+
+    assert shards.corpus_name_for("ops", "corpora/default") is None
+    name = shards.corpus_name_for("ops", "corpora/default", create=True)
+
+    assert shards.corpus_name_for("ops", "corpora/default", create=True) == name
+    assert shards.corpus_name_for(DEFAULT_SHARD, "corpora/default") == "corpora/default"
+    assert created == ["kb--ops"]
+    assert make_shards().known() == [DEFAULT_SHARD, "eng", "ops"]
+
+
+def test_shard_cap_routes_new_names_to_default(make_shards):
+    shards = make_shards(max_shards=1)
+
+    assert shards.route_path("eng/guide.md") == "eng"
+    assert shards.route_path("ops/runbook.md") == DEFAULT_SHARD
+
+
+def test_forget(make_shards):
+    shards = make_shards()
+    shards.forget("eng")
+
+    assert shards.known() == [DEFAULT_SHARD]
@@ -0,0 +1,98 @@
+import threading
+
+import numpy as np
+import pytest
+
+from agents.qna_agent import embedding_batcher as batcher_module
+from agents.qna_agent.embedding_batcher import EmbeddingBatcher
+
+
+class FakeEmbedding:
+    def __init__(self, values):
+        self.values = values
+
+
+class FakeEmbeddingModel:
+    """Embeds a text as [len(text), 1] and records every request."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.requests = []
+
+    def get_embeddings(self, inputs):
+        self.requests.append([item.text for item in inputs])
+        if self.fail:
+            raise ValueError("bad request")
+        return [FakeEmbedding([float(len(item.text)), 1.0]) for item in inputs]
+
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = FakeEmbeddingModel()
+    monkeypatch.setattr(batcher_module.model_registry, "embedding_model", lambda name: fake)
+    return fake
+
+
+def make_batcher(**kwargs):
+    kwargs.setdefault("linger_ms", 50)
+    return EmbeddingBatcher("text-embedding", **kwargs)
+
+
+def test_split_prefers_whitespace_and_respects_limit():
+    batcher = make_batcher(max_input_tokens=4, chars_per_token=1)
+    pieces = batcher.split("aaa bbb ccc dd")
+
+    assert "".join(pieces) == "aaa bbb ccc dd"
+    assert all(len(piece) <= 4 for piece in pieces)
+    assert batcher.split("tiny") == ["tiny"]
+
+
+def test_pack_bounds_count_tokens_and_task_type():
+    batcher = make_batcher(max_batch_size=2, max_batch_tokens=5)
+    items = [batcher_module._Item(str(i), "DOC", 2) for i in range(5)] + [batcher_module._Item("q", "QUERY", 1)]
+
+    batches = batcher._pack(items)
+
+    assert [[item.text for item in batch] for batch in batches] == [["0", "1"], ["2", "3"], ["4"], ["q"]]
+
+
+def test_concurrent_callers_share_a_request(model):
+    batcher = make_batcher(linger_ms=200)
+    results = {}
+    start = threading.Barrier(4)
+
+    def call(text):
+        start.wait()
+        results[text] = batcher.embed_one(text)
+
+    threads = [threading.Thread(target=call, args=("x" * n,)) for n in range(1, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert len(model.requests) == 1
+    assert sorted(model.requests[0]) == ["x", "xx", "xxx", "xxxx"]
+    assert results["xxx"].tolist() == [3.0, 1.0]
+
+
+def test_split_text_gets_normalized_weighted_mean(model):
+    batcher = make_batcher(max_input_tokens=4, chars_per_token=1)
+    vector = batcher.embed_one("aaaa bbbb")
+    batcher.close()
+
+    assert batcher.stats()["split_texts"] == 1
+    assert np.linalg.norm(vector) == pytest.approx(1.0)
+
+
+def test_failed_request_raises_for_every_caller(monkeypatch):
+    fake = FakeEmbeddingModel(fail=True)
+    monkeypatch.setattr(batcher_module.model_registry, "embedding_model", lambda name: fake)
+    batcher = make_batcher()
+
+    with pytest.raises(ValueError):
+        batcher.embed(["a", "b"])
+    batcher.close()
+
+    assert batcher.stats()["failed_requests"] == 1
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from agents.qna_agent.embedding_index import EmbeddingIndex, decode_embedding, encode_embedding
+
+
+def test_encode_decode_round_trip():
+    vector = [0.5, -1.25, 3.0]
+    for dtype in ("float16", "float32"):
+        decoded = decode_embedding(encode_embedding(vector, dtype=dtype))
+        assert decoded.dtype == np.dtype(dtype)
+        assert np.allclose(decoded, vector)
+
+
+def test_encode_uses_twelve_byte_header():
+    assert len(encode_embedding(np.zeros(4), dtype="float16")) == 12 + 4 * 2
+
+
+def test_decode_rejects_foreign_bytes():
+    with pytest.raises(ValueError):
+        decode_embedding(b"JSON" + bytes(8))
+
+
+def test_encode_rejects_unsupported_dtype():
+    with pytest.raises(ValueError):
+        encode_embedding([1.0], dtype="float64")
+
+
+def test_search_returns_most_similar_first(tmp_path):
+    index = EmbeddingIndex(str(tmp_path))
+    index.add("x", [1.0, 0.0], {"title": "x"})
+    index.add("y", [0.0, 1.0], {"title": "y"})
+    index.add("xy", [1.0, 1.0], {"title": "xy"})
+
+    matches = index.search([1.0, 0.1], k=2)
+
+    assert [row_id for row_id, _, _ in matches] == ["x", "xy"]
+    assert matches[0][1] == pytest.approx(1 / np.sqrt(1.01))
+    assert matches[0][2] == {"title": "x"}
+
+
+def test_search_on_empty_index(tmp_path):
+    assert EmbeddingIndex(str(tmp_path)).search([1.0, 0.0]) == []
+
+
+def test_add_rejects_dimension_mismatch(tmp_path):
+    index = EmbeddingIndex(str(tmp_path))
+    index.add("a", [1.0, 0.0])
+    with pytest.raises(ValueError):
+        index.add("b", [1.0, 0.0, 0.0])
+
+
+def test_reload_reads_rows_back(tmp_path):
+    index = EmbeddingIndex(str(tmp_path))
+    index.add("a", [3.0, 4.0], {"file_hash": "h"})
+
+    reloaded = EmbeddingIndex(str(tmp_path))
+
+    assert len(reloaded) == 1
+    assert np.allclose(reloaded.vectors(["a"])["a"], [0.6, 0.8])
+
+
+def test_load_truncates_half_written_matrix_row(tmp_path):
+    index = EmbeddingIndex(str(tmp_path))
+    index.add("a", [1.0, 0.0])
+    index.add("b", [0.0, 1.0])
+    # Crash after the sidecar line of "c" but halfway through its matrix row
+    with open(index.matrix_path, "ab") as f:
+        f.write(np.float32(1.0).tobytes())
+    with open(index.sidecar_path, "a", encoding="utf-8") as f:
+        f.write('{"id": "c"}\n')
+
+    reloaded = EmbeddingIndex(str(tmp_path))
+
+    assert len(reloaded) == 2
+    assert index.matrix_path.stat().st_size == 2 * 2 * 4
+    assert [row_id for row_id, _, _ in reloaded.search([0.0, 1.0], k=5)] == ["b", "a"]
+
+
+def test_load_ignores_partial_sidecar_line(tmp_path):
+    index = EmbeddingIndex(str(tmp_path))
+    index.add("a", [1.0, 0.0])
+    with open(index.matrix_path, "ab") as f:
+        f.write(np.array([0.0, 1.0], dtype=np.float32).tobytes())
+    with open(index.sidecar_path, "a", encoding="utf-8") as f:
+        f.write('{"id": "b", "tit')
+
+    reloaded = EmbeddingIndex(str(tmp_path))
+
+    assert len(reloaded) == 1
+    assert index.matrix_path.stat().st_size == 2 * 4
+
+
+def test_rebuild_replaces_rows(tmp_path):
+    index = EmbeddingIndex(str(tmp_path))
+    index.add("old", [1.0, 0.0])
+
+    count = index.rebuild([("new", [0.0, 2.0], {"k": 1}), ("bad", [1.0, 0.0, 0.0], {})])
+
+    assert count == 1
+    assert [row_id for row_id, _, _ in EmbeddingIndex(str(tmp_path)).search([0.0, 1.0])] == ["new"]
@@ -0,0 +1,74 @@
+import hashlib
+
+from agents.qna_agent.file_hasher import FileHasher
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_buffered_and_mmapped_digests_match_hashlib(tmp_path):
+    small = tmp_path / "small.bin"
+    small.write_bytes(b"x" * 1000)
+    large = tmp_path / "large.bin"
+    large.write_bytes(bytes(range(256)) * 64)
+    hasher = FileHasher(buffer_size=64, mmap_threshold=4096)
+
+    assert hasher.hash_file(str(small)) == sha256(b"x" * 1000)
+    assert hasher.hash_file(str(large)) == sha256(bytes(range(256)) * 64)
+
+
+def test_unchanged_files_are_served_from_cache(tmp_path):
+    doc = tmp_path / "doc.md"
+    doc.write_text("v1", encoding="utf-8")
+    hasher = FileHasher()
+
+    hasher.hash_file(str(doc))
+    hasher.hash_file(str(doc))
+    doc.write_text("version 2", encoding="utf-8")
+
+    assert hasher.hash_file(str(doc)) == sha256(b"version 2")
+    assert (hasher.stats()["hashed"], hasher.stats()["cached"]) == (2, 1)
+
+
+def test_cache_persists_between_runs(tmp_path):
+    doc = tmp_path / "doc.md"
+    doc.write_text("content", encoding="utf-8")
+    cache_path = str(tmp_path / "cache" / "hashes.json")
+
+    first = FileHasher(cache_path=cache_path)
+    first.hash_file(str(doc))
+    first.save()
+    second = FileHasher(cache_path=cache_path)
+
+    assert second.hash_file(str(doc)) == sha256(b"content")
+    assert second.stats()["cached"] == 1
+
+
+def test_save_keeps_most_recent_entries(tmp_path):
+    cache_path = tmp_path / "hashes.json"
+    hasher = FileHasher(cache_path=str(cache_path), max_cache_entries=2)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.md"
+        path.write_text(str(i), encoding="utf-8")
+        paths.append(path)
+        hasher.hash_file(str(path))
+    hasher.save()
+
+    assert FileHasher(cache_path=str(cache_path)).stats()["cache_entries"] == 2
+
+
+def test_hash_many_keeps_order_and_reports_errors(tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"{i}.md"
+        path.write_text(str(i), encoding="utf-8")
+        paths.append(str(path))
+    paths.insert(2, str(tmp_path / "missing.md"))
+
+    results = list(FileHasher(max_workers=3).hash_many(paths))
+
+    assert [path for path, _ in results] == paths
+    assert results[2][1] is None
+    assert results[0][1] == sha256(b"0")
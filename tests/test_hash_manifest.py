@@ -0,0 +1,170 @@
+import json
+import threading
+
+import pytest
+from google.api_core.exceptions import PreconditionFailed
+
+from agents.qna_agent.hash_manifest import HashManifest
+
+
+class FakeBlob:
+    def __init__(self, bucket, name, metadata=None, size=1):
+        self.bucket = bucket
+        self.name = name
+        self.generation = bucket.generations.get(name, 0)
+        self.metadata = metadata or {}
+        self.size = size
+        self.time_created = None
+
+    def download_as_bytes(self, if_generation_match=None):
+        if if_generation_match != self.bucket.generations.get(self.name):
+            raise PreconditionFailed("generation mismatch")
+        return self.bucket.objects[self.name]
+
+    def upload_from_string(self, payload, content_type=None, if_generation_match=None):
+        with self.bucket.lock:
+            if if_generation_match != self.bucket.generations.get(self.name, 0):
+                raise PreconditionFailed("generation mismatch")
+            self.bucket.uploads += 1
+            self.bucket.objects[self.name] = payload.encode() if isinstance(payload, str) else payload
+            self.bucket.generations[self.name] = self.generation = self.bucket.next_generation()
+
+
+class FakeBucket:
+    """In-memory stand-in for a GCS bucket with generation preconditions."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.objects = {}
+        self.generations = {}
+        self.listing = []
+        self.uploads = 0
+        self.on_list = None
+        self._generation = 0
+
+    def next_generation(self):
+        self._generation += 1
+        return self._generation
+
+    def get_blob(self, name):
+        return FakeBlob(self, name) if name in self.objects else None
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def list_blobs(self, prefix=None):
+        if self.on_list:
+            self.on_list()
+        return [FakeBlob(self, f"{prefix}{name}", metadata={"file_hash": file_hash}) for name, file_hash in self.listing]
+
+    def stored_entries(self, manifest):
+        return json.loads(self.objects[manifest.blob_name])["entries"]
+
+
+@pytest.fixture
+def bucket():
+    return FakeBucket()
+
+
+def make_manifest(bucket):
+    # Background reconciles are exercised explicitly through reconcile()
+    return HashManifest(bucket, "corpus", reconcile_interval=float("inf"))
+
+
+def test_record_and_lookup(bucket):
+    manifest = make_manifest(bucket)
+    manifest.record("h1", "a.txt", size=3)
+
+    assert manifest.lookup("h1")["path"] == "a.txt"
+    assert manifest.lookup("missing") is None
+    assert bucket.stored_entries(manifest)["h1"]["size"] == 3
+
+
+def test_record_many_writes_once(bucket):
+    manifest = make_manifest(bucket)
+    manifest.record_many([("h1", {"path": "a.txt"}), ("h2", {"path": "b.txt"})])
+
+    assert bucket.uploads == 1
+    assert manifest.hashes() == {"h1": "a.txt", "h2": "b.txt"}
+
+
+def test_remove_many(bucket):
+    manifest = make_manifest(bucket)
+    manifest.record_many([("h1", {"path": "a.txt"}), ("h2", {"path": "b.txt"})])
+    manifest.remove_many(["h1"])
+
+    assert set(bucket.stored_entries(manifest)) == {"h2"}
+
+
+def test_conflicting_writer_is_merged(bucket):
+    first = make_manifest(bucket)
+    second = make_manifest(bucket)
+    first.record("h1", "a.txt")
+    second.lookup("h1")  # loads generation 1
+    first.record("h2", "b.txt")
+
+    second.record("h3", "c.txt")
+
+    assert set(bucket.stored_entries(second)) == {"h1", "h2", "h3"}
+    assert set(second.entries()) == {"h1", "h2", "h3"}
+
+
+def test_concurrent_writers_lose_nothing(bucket):
+    manifest = make_manifest(bucket)
+    manifest.max_write_attempts = 50
+    threads = [threading.Thread(target=manifest.record, args=(f"h{i}", f"{i}.txt")) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(bucket.stored_entries(manifest)) == {f"h{i}" for i in range(8)}
+    assert manifest._generation == bucket.generations[manifest.blob_name]
+
+
+def test_reconcile_replaces_entries_with_listing(bucket):
+    manifest = make_manifest(bucket)
+    manifest.record("stale", "gone.txt")
+    bucket.listing = [("a.txt", "h1")]
+
+    assert manifest.reconcile() == 1
+    assert manifest.hashes() == {"h1": "a.txt"}
+
+
+def test_reconcile_keeps_changes_made_during_listing(bucket):
+    manifest = make_manifest(bucket)
+    manifest.record_many([("h1", {"path": "a.txt"}), ("h2", {"path": "b.txt"})])
+    bucket.listing = [("a.txt", "h1"), ("b.txt", "h2")]
+
+    def change_during_listing():
+        manifest.remove("h2")
+        manifest.record("h3", "c.txt")
+
+    bucket.on_list = change_during_listing
+    manifest.reconcile()
+
+    assert manifest.hashes() == {"h1": "a.txt", "h3": "c.txt"}
+    assert set(bucket.stored_entries(manifest)) == {"h1", "h3"}
+
+
+def test_lookup_does_not_wait_for_upload(bucket, monkeypatch):
+    manifest = make_manifest(bucket)
+    manifest.record("h1", "a.txt")
+    uploading = threading.Event()
+    release = threading.Event()
+    upload = FakeBlob.upload_from_string
+
+    def slow_upload(blob, *args, **kwargs):
+        uploading.set()
+        release.wait(5)
+        return upload(blob, *args, **kwargs)
+
+    monkeypatch.setattr(FakeBlob, "upload_from_string", slow_upload)
+    writer = threading.Thread(target=manifest.record, args=("h2", "b.txt"))
+    writer.start()
+    assert uploading.wait(5)
+    assert manifest.lookup("h1")["path"] == "a.txt"
+    release.set()
+    writer.join()
+
+    assert manifest.lookup("h2")["path"] == "b.txt"
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agents.qna_agent.http_pool import Hedger, HttpSettings
+
+
+def test_requests_timeout_only_tightens_the_default():
+    settings = HttpSettings(connect_timeout=3.0, read_timeout=20.0)
+
+    assert settings.requests_timeout() == (3.0, 20.0)
+    assert settings.requests_timeout(5.0) == (3.0, 5.0)
+    assert settings.requests_timeout(60.0) == (3.0, 20.0)
+
+
+def test_delay_uses_max_until_enough_samples():
+    hedger = Hedger(min_delay=0.01, max_delay=1.0, min_samples=3)
+    assert hedger.delay() == 1.0
+
+    for seconds in (0.1, 0.2, 0.3):
+        hedger._observe(seconds)
+    assert 0.2 < hedger.delay() < 0.3
+
+    hedger._observe(0.0001)
+    assert hedger.delay() >= 0.01
+
+
+def test_disabled_hedger_calls_once():
+    hedger = Hedger(enabled=False)
+    calls = []
+
+    assert hedger.call(lambda: calls.append(1) or "ok") == "ok"
+    assert calls == [1]
+    assert hedger.stats()["latency_samples"] == 1
+
+
+def test_slow_call_is_hedged_and_hedge_wins():
+    hedger = Hedger(enabled=True, max_delay=0.05)
+    first = threading.Event()
+
+    def request():
+        if not first.is_set():
+            first.set()
+            time.sleep(1.0)
+            return "slow"
+        return "fast"
+
+    try:
+        assert hedger.call(request) == "fast"
+    finally:
+        hedger.close()
+    stats = hedger.stats()
+    assert (stats["hedges_fired"], stats["hedges_won"]) == (1, 1)
+
+
+def test_fast_call_is_not_hedged():
+    hedger = Hedger(enabled=True, max_delay=1.0)
+    try:
+        assert hedger.call(lambda: "ok") == "ok"
+    finally:
+        hedger.close()
+    assert hedger.stats()["hedges_fired"] == 0
+
+
+def test_hedge_failure_falls_back_to_primary():
+    hedger = Hedger(enabled=True, max_delay=0.05)
+    attempts = []
+
+    def request():
+        attempts.append(1)
+        if len(attempts) == 1:
+            time.sleep(0.2)
+            return "primary"
+        raise RuntimeError("hedge failed")
+
+    try:
+        assert hedger.call(request) == "primary"
+    finally:
+        hedger.close()
+
+
+def test_async_hedge_cancels_the_loser():
+    hedger = Hedger(enabled=True, max_delay=0.05)
+    cancelled = []
+
+    async def scenario():
+        attempts = []
+
+        async def request():
+            attempts.append(1)
+            if len(attempts) == 1:
+                try:
+                    await asyncio.sleep(1.0)
+                except asyncio.CancelledError:
+                    cancelled.append(1)
+                    raise
+                return "slow"
+            return "fast"
+
+        result = await hedger.acall(request)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(scenario()) == "fast"
+    assert cancelled == [1]
+
+
+def test_async_errors_propagate_when_every_attempt_fails():
+    hedger = Hedger(enabled=True, max_delay=0.01)
+
+    async def request():
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        asyncio.run(hedger.acall(request))
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from utils.job_scheduler import PRIORITY_INGEST, PRIORITY_STATS, JobScheduler, SchedulerSaturated
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_lower_priority_value_runs_first():
+    async def scenario():
+        scheduler = JobScheduler({"background": {"workers": 1, "max_queue": 10}})
+        order = []
+        release = asyncio.Event()
+
+        async def blocker():
+            await release.wait()
+
+        def job(name):
+            async def record():
+                order.append(name)
+            return record
+
+        scheduler.submit("background", blocker)
+        await asyncio.sleep(0)
+        scheduler.submit("background", job("stats"), priority=PRIORITY_STATS)
+        scheduler.submit("background", job("ingest"), priority=PRIORITY_INGEST)
+        release.set()
+        await asyncio.sleep(0.05)
+        await scheduler.shutdown()
+        return order
+
+    assert run(scenario()) == ["ingest", "stats"]
+
+
+def test_positions_and_saturation():
+    async def scenario():
+        scheduler = JobScheduler({"interactive": {"workers": 1, "max_queue": 2}})
+        release = asyncio.Event()
+
+        async def blocker():
+            await release.wait()
+
+        positions = [scheduler.submit("interactive", blocker)]
+        await asyncio.sleep(0)
+        positions.append(scheduler.submit("interactive", blocker))
+        positions.append(scheduler.submit("interactive", blocker))
+        with pytest.raises(SchedulerSaturated):
+            scheduler.submit("interactive", blocker)
+        stats = scheduler.stats()
+        release.set()
+        await scheduler.shutdown()
+        return positions, stats
+
+    positions, stats = run(scenario())
+
+    assert positions == [0, 1, 2]
+    assert stats["pools"]["interactive"]["queued"] == 2
+    assert stats["jobs"]["interactive"]["rejected"] == 1
+
+
+def test_pools_do_not_block_each_other():
+    async def scenario():
+        scheduler = JobScheduler({
+            "interactive": {"workers": 1, "max_queue": 10},
+            "background": {"workers": 1, "max_queue": 10},
+        })
+        release = asyncio.Event()
+        answered = asyncio.Event()
+
+        async def slow_ingest():
+            await release.wait()
+
+        async def question():
+            answered.set()
+
+        scheduler.submit("background", slow_ingest)
+        scheduler.submit("interactive", question)
+        await asyncio.wait_for(answered.wait(), timeout=1)
+        release.set()
+        await scheduler.shutdown()
+
+    run(scenario())
+
+
+def test_failed_jobs_are_counted_and_worker_survives():
+    async def scenario():
+        scheduler = JobScheduler({"background": {"workers": 1, "max_queue": 10}})
+        done = asyncio.Event()
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        async def succeed():
+            done.set()
+
+        scheduler.submit("background", fail, kind="ingest")
+        scheduler.submit("background", succeed, kind="ingest")
+        await asyncio.wait_for(done.wait(), timeout=1)
+        await asyncio.sleep(0)
+        stats = scheduler.stats()
+        samples = list(scheduler.metric_samples())
+        await scheduler.shutdown()
+        return stats, samples
+
+    stats, samples = run(scenario())
+
+    assert stats["jobs"]["ingest"]["submitted"] == 2
+    assert stats["jobs"]["ingest"]["failed"] == 1
+    assert ("jobs_failed_total", "counter", "Jobs failed per kind", {"kind": "ingest"}, 1) in samples
@@ -0,0 +1,75 @@
+import pytest
+
+from utils.metrics import MetricsRegistry
+
+
+def lines(registry):
+    return registry.render().splitlines()
+
+
+def test_counters_and_gauges():
+    registry = MetricsRegistry(namespace="t")
+    registry.inc("answers_total", description="Answers", variant="strict")
+    registry.inc("answers_total", 2, variant="strict")
+    registry.gauge_add("in_flight", 3)
+    registry.gauge_add("in_flight", -1)
+
+    rendered = lines(registry)
+
+    assert "# HELP t_answers_total Answers" in rendered
+    assert "# TYPE t_answers_total counter" in rendered
+    assert 't_answers_total{variant="strict"} 3' in rendered
+    assert "t_in_flight 2" in rendered
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry(namespace="t", buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 5.0):
+        registry.observe("latency_seconds", seconds)
+
+    rendered = lines(registry)
+
+    assert 't_latency_seconds_bucket{le="0.1"} 1' in rendered
+    assert 't_latency_seconds_bucket{le="1.0"} 2' in rendered
+    assert 't_latency_seconds_bucket{le="+Inf"} 3' in rendered
+    assert "t_latency_seconds_count 3" in rendered
+    assert "t_latency_seconds_sum 5.55" in rendered
+
+
+def test_stage_records_latency_errors_and_in_flight():
+    registry = MetricsRegistry(namespace="t")
+    with registry.stage("retrieval"):
+        assert 't_stage_in_flight{stage="retrieval"} 1' in lines(registry)
+    with pytest.raises(ValueError):
+        with registry.stage("retrieval"):
+            raise ValueError("boom")
+
+    rendered = lines(registry)
+
+    assert 't_stage_duration_seconds_count{stage="retrieval"} 2' in rendered
+    assert 't_stage_errors_total{stage="retrieval"} 1' in rendered
+    assert 't_stage_in_flight{stage="retrieval"} 0' in rendered
+
+
+def test_collectors_run_at_scrape_time_and_failures_are_skipped():
+    registry = MetricsRegistry(namespace="t")
+    entries = {"count": 1}
+    registry.register_collector(lambda: [("cache_entries", "gauge", "Entries", {"cache": "answers"}, entries["count"])])
+
+    def broken():
+        raise RuntimeError("collector failed")
+
+    registry.register_collector(broken)
+    entries["count"] = 7
+
+    rendered = lines(registry)
+
+    assert "# TYPE t_cache_entries gauge" in rendered
+    assert 't_cache_entries{cache="answers"} 7' in rendered
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry(namespace="t")
+    registry.inc("errors_total", reason='bad "quote"\n')
+
+    assert 't_errors_total{reason="bad \\"quote\\"\\n"} 1' in lines(registry)
@@ -0,0 +1,67 @@
+import numpy as np
+
+from agents.qna_agent.minhash_index import NUM_PERM, MinHashIndex, minhash_signature, minhash_signatures
+
+BASE = " ".join(f"word{i}" for i in range(200))
+NEAR = BASE.replace("word100", "changed")
+OTHER = " ".join(f"other{i}" for i in range(200))
+
+
+def test_signature_is_deterministic():
+    signature = minhash_signature(BASE)
+
+    assert signature.shape == (NUM_PERM,)
+    assert signature.dtype == np.uint32
+    assert np.array_equal(signature, minhash_signature(BASE))
+
+
+def test_in_process_batch_matches_single_signatures():
+    signatures = minhash_signatures([BASE, OTHER], processes=0)
+
+    assert np.array_equal(signatures[0], minhash_signature(BASE))
+    assert np.array_equal(signatures[1], minhash_signature(OTHER))
+
+
+def test_query_finds_near_duplicates_only(tmp_path):
+    index = MinHashIndex(str(tmp_path))
+    index.add("base.txt", minhash_signature(BASE), {"original_title": "Base"})
+    index.add("other.txt", minhash_signature(OTHER))
+
+    matches = index.query(minhash_signature(NEAR))
+
+    assert [row_id for row_id, _, _ in matches] == ["base.txt"]
+    assert matches[0][1] > 0.9
+    assert matches[0][2] == {"original_title": "Base"}
+    assert index.query(minhash_signature(NEAR), min_jaccard=0.999) == []
+
+
+def test_reload_drops_half_written_rows(tmp_path):
+    index = MinHashIndex(str(tmp_path))
+    index.add("base.txt", minhash_signature(BASE))
+    with open(index.matrix_path, "ab") as f:
+        f.write(minhash_signature(OTHER)[:10].tobytes())
+    with open(index.sidecar_path, "a", encoding="utf-8") as f:
+        f.write('{"id": "other.txt"}\n')
+
+    reloaded = MinHashIndex(str(tmp_path))
+
+    assert len(reloaded) == 1
+    assert reloaded.query(minhash_signature(BASE))[0][0] == "base.txt"
+
+
+def test_index_with_other_parameters_is_discarded(tmp_path):
+    MinHashIndex(str(tmp_path)).add("base.txt", minhash_signature(BASE))
+
+    reloaded = MinHashIndex(str(tmp_path), bands=16)
+
+    assert len(reloaded) == 0
+    assert not reloaded.exists()
+
+
+def test_rebuild_replaces_rows(tmp_path):
+    index = MinHashIndex(str(tmp_path))
+    index.add("base.txt", minhash_signature(BASE))
+
+    assert index.rebuild([("other.txt", minhash_signature(OTHER), {})]) == 1
+    assert index.query(minhash_signature(BASE)) == []
+    assert MinHashIndex(str(tmp_path)).query(minhash_signature(OTHER))[0][0] == "other.txt"
@@ -0,0 +1,60 @@
+import pytest
+
+from agents.qna_agent import model_registry as registry_module
+from agents.qna_agent.model_registry import ModelRegistry
+
+
+class FakeGenerativeModel:
+    created = 0
+
+    def __init__(self, model_name, generation_config=None):
+        FakeGenerativeModel.created += 1
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+
+class FakeTextEmbeddingModel:
+    loaded = 0
+
+    @classmethod
+    def from_pretrained(cls, model_name):
+        cls.loaded += 1
+        return cls()
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    FakeGenerativeModel.created = 0
+    FakeTextEmbeddingModel.loaded = 0
+    monkeypatch.setattr(registry_module, "GenerativeModel", FakeGenerativeModel)
+    monkeypatch.setattr(registry_module, "TextEmbeddingModel", FakeTextEmbeddingModel)
+    return ModelRegistry()
+
+
+def test_generative_handles_are_shared_per_config(registry):
+    first = registry.generative_model("gemini", {"temperature": 0.3, "top_p": 0.9})
+    same = registry.generative_model("gemini", {"top_p": 0.9, "temperature": 0.3})
+    other = registry.generative_model("gemini", {"temperature": 0.7})
+
+    assert first is same
+    assert other is not first
+    assert FakeGenerativeModel.created == 2
+
+
+def test_embedding_model_loaded_once(registry):
+    registry.warm(embedding=["text-embedding", "text-embedding"])
+
+    assert registry.embedding_model("text-embedding") is registry.embedding_model("text-embedding")
+    assert FakeTextEmbeddingModel.loaded == 1
+
+
+def test_track_records_calls_and_errors(registry):
+    with registry.track("gemini"):
+        pass
+    with pytest.raises(RuntimeError):
+        with registry.track("gemini"):
+            raise RuntimeError("boom")
+
+    stats = registry.stats()["gemini"]
+    assert (stats["calls"], stats["errors"]) == (2, 1)
+    assert stats["max_seconds"] >= stats["p50_seconds"] >= 0.0
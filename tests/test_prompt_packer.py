@@ -0,0 +1,47 @@
+from agents.qna_agent.context_optimizer import estimate_tokens
+from agents.qna_agent.prompt_packer import ELLIPSIS, PromptPacker, split_sentences
+
+FILLER = " ".join(f"Unrelated sentence number {i} about lunch menus." for i in range(20))
+CONTEXTS = [
+    f"{FILLER} Deploys need an approved change ticket. {FILLER}",
+    f"{FILLER} Rollbacks reuse the deploy pipeline. {FILLER}",
+]
+
+
+def test_split_sentences_on_punctuation_and_newlines():
+    assert split_sentences("One. Two!\n- three\n\nFour?") == ["One.", "Two!", "- three", "Four?"]
+
+
+def test_prompt_within_budget_is_unchanged():
+    prompt, report = PromptPacker(token_budget=10000).pack("How do deploys work?", ["A.", "B."], "System")
+
+    assert prompt == "System\n\nSource 1: A.\n\nSource 2: B.\n\nQuestion: How do deploys work?\n\nAnswer:"
+    assert (report["compressed"], report["dropped"], report["trimmed_tokens"]) == (0, 0, 0)
+
+
+def test_over_budget_keeps_relevant_sentences_and_sources():
+    budget = 120
+    prompt, report = PromptPacker(token_budget=budget).pack("deploy change ticket rollbacks", CONTEXTS, "System")
+
+    assert report["prompt_tokens"] <= budget
+    assert estimate_tokens(prompt) == report["prompt_tokens"]
+    assert "Deploys need an approved change ticket." in prompt
+    assert "Rollbacks reuse the deploy pipeline." in prompt
+    assert "Source 1:" in prompt and "Source 2:" in prompt
+    assert ELLIPSIS in prompt
+    assert report["compressed"] == 2
+    assert report["trimmed_tokens"] > 0
+
+
+def test_contexts_that_do_not_fit_are_dropped_from_the_end():
+    _, report = PromptPacker(token_budget=27).pack("deploy change ticket", CONTEXTS, "System")
+
+    assert report["contexts"] == 1
+    assert report["dropped"] == 1
+
+
+def test_zero_budget_disables_packing():
+    _, report = PromptPacker(token_budget=0).pack("deploy", CONTEXTS, "System")
+
+    assert report["contexts"] == 2
+    assert report["compressed"] == 0
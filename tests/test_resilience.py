@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+from google.api_core.exceptions import DeadlineExceeded, NotFound, ServiceUnavailable
+
+from agents.qna_agent.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Dependency,
+    is_retryable,
+    is_unavailable,
+    is_unsent,
+)
+
+
+def failing(*errors, result="ok"):
+    """Callable raising ``errors`` in order, then returning ``result``."""
+    remaining = list(errors)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if remaining:
+            raise remaining.pop(0)
+        return result
+
+    fn.calls = calls
+    return fn
+
+
+def make_dependency(**options):
+    options.setdefault("base_delay", 0.0)
+    return Dependency("test", **options)
+
+
+def test_error_classification():
+    assert is_retryable(ServiceUnavailable("down"))
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(NotFound("missing"))
+    assert not is_retryable(CircuitOpenError("test", 1.0))
+    assert is_unavailable(CircuitOpenError("test", 1.0))
+
+    assert is_unsent(ServiceUnavailable("down"))
+    assert is_unsent(ConnectionRefusedError())
+    assert not is_unsent(DeadlineExceeded("slow"))
+    assert not is_unsent(TimeoutError())
+
+
+def test_retries_transient_errors():
+    dependency = make_dependency(max_attempts=3)
+    fn = failing(ServiceUnavailable("down"), TimeoutError())
+
+    assert dependency.call(fn) == "ok"
+    assert len(fn.calls) == 3
+    assert dependency.stats()["retries"] == 2
+
+
+def test_gives_up_after_max_attempts():
+    dependency = make_dependency(max_attempts=2)
+    fn = failing(*[ServiceUnavailable("down")] * 3)
+
+    with pytest.raises(ServiceUnavailable):
+        dependency.call(fn)
+    assert len(fn.calls) == 2
+
+
+def test_non_retryable_errors_raise_immediately_and_keep_breaker_closed():
+    dependency = make_dependency(failure_threshold=1)
+    fn = failing(NotFound("missing"))
+
+    with pytest.raises(NotFound):
+        dependency.call(fn)
+    assert len(fn.calls) == 1
+    assert dependency.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_non_idempotent_calls_only_retry_unsent_errors():
+    dependency = make_dependency(max_attempts=3)
+
+    refused = failing(ConnectionRefusedError(), ServiceUnavailable("busy"))
+    assert dependency.call(refused, idempotent=False) == "ok"
+    assert len(refused.calls) == 3
+
+    timed_out = failing(DeadlineExceeded("slow"))
+    with pytest.raises(DeadlineExceeded):
+        dependency.call(timed_out, idempotent=False)
+    assert len(timed_out.calls) == 1
+
+
+def test_breaker_opens_and_fails_fast():
+    dependency = make_dependency(max_attempts=1, failure_threshold=2, reset_timeout=60.0)
+    for _ in range(2):
+        with pytest.raises(ServiceUnavailable):
+            dependency.call(failing(ServiceUnavailable("down")))
+
+    fn = failing()
+    with pytest.raises(CircuitOpenError):
+        dependency.call(fn)
+    assert fn.calls == []
+    assert dependency.stats()["breaker"]["rejected"] == 1
+
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    breaker.before_call()  # the probe is admitted
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # a second concurrent call is not
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_async_call_retries_with_fresh_awaitables():
+    dependency = make_dependency(max_attempts=3)
+    attempts = []
+
+    async def request():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise asyncio.TimeoutError()
+        return "ok"
+
+    assert asyncio.run(dependency.acall(request)) == "ok"
+    assert len(attempts) == 2
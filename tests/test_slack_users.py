@@ -0,0 +1,96 @@
+import asyncio
+
+from slack_sdk.errors import SlackApiError
+
+from utils.slack_users import SlackUserDirectory
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeClient:
+    def __init__(self, users, pages=None, rate_limited=0):
+        self.users = users
+        self.pages = pages or [list(users)]
+        self.rate_limited = rate_limited
+        self.info_calls = []
+        self.list_calls = 0
+
+    async def users_list(self, limit=None, cursor=None):
+        self.list_calls += 1
+        page = int(cursor or 0)
+        next_cursor = str(page + 1) if page + 1 < len(self.pages) else ""
+        members = [{"id": user_id, **self.users[user_id]} for user_id in self.pages[page]]
+        return {"members": members, "response_metadata": {"next_cursor": next_cursor}}
+
+    async def users_info(self, user=None):
+        self.info_calls.append(user)
+        if self.rate_limited:
+            self.rate_limited -= 1
+            raise SlackApiError("ratelimited", FakeResponse(429, {"Retry-After": "0"}))
+        await asyncio.sleep(0.01)
+        if user not in self.users:
+            raise SlackApiError("user_not_found", FakeResponse(200))
+        return {"user": {"id": user, **self.users[user]}}
+
+
+USERS = {"U1": {"real_name": "Ada", "name": "ada"}, "U2": {"real_name": "", "name": "grace"}}
+
+
+def test_concurrent_resolves_share_one_call_per_id():
+    client = FakeClient(USERS)
+    directory = SlackUserDirectory()
+
+    async def run():
+        return await asyncio.gather(
+            directory.resolve(client, ["U1", "U2", "U1"]),
+            directory.resolve(client, ["U1"]),
+        )
+
+    first, second = asyncio.run(run())
+
+    assert sorted(client.info_calls) == ["U1", "U2"]
+    assert first["U1"] == second["U1"] == {"real_name": "Ada", "name": "ada"}
+
+
+def test_display_names_fall_back_and_cache_unknown_users():
+    client = FakeClient(USERS)
+    directory = SlackUserDirectory()
+
+    async def run():
+        names = await directory.display_names(client, ["U1", "U2", "U9"])
+        await directory.display_names(client, ["U9"])
+        return names
+
+    assert asyncio.run(run()) == {"U1": "Ada", "U2": "grace", "U9": "User-U9"}
+    assert client.info_calls.count("U9") == 1
+
+
+def test_warm_pages_through_members_once():
+    client = FakeClient(USERS, pages=[["U1"], ["U2"]])
+    directory = SlackUserDirectory()
+
+    async def run():
+        count = await directory.warm(client, page_size=1)
+        await directory.warm(client)
+        return count, await directory.resolve(client, ["U1", "U2"])
+
+    count, users = asyncio.run(run())
+
+    assert count == 2
+    assert client.list_calls == 2
+    assert client.info_calls == []
+    assert users["U2"]["name"] == "grace"
+
+
+def test_rate_limit_is_retried():
+    client = FakeClient(USERS, rate_limited=1)
+    directory = SlackUserDirectory()
+
+    users = asyncio.run(directory.resolve(client, ["U1"]))
+
+    assert users["U1"]["real_name"] == "Ada"
+    assert client.info_calls == ["U1", "U1"]
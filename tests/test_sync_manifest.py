@@ -0,0 +1,66 @@
+import json
+import os
+
+from agents.qna_agent.sync_manifest import SyncManifest
+
+
+def test_unchanged_compares_size_and_mtime(tmp_path):
+    doc = tmp_path / "doc.md"
+    doc.write_text("hello", encoding="utf-8")
+    manifest = SyncManifest(str(tmp_path / "sync.json"))
+    stat = doc.stat()
+
+    assert not manifest.unchanged("doc.md", stat)
+    manifest.set("doc.md", {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": "h"})
+    assert manifest.unchanged("doc.md", stat)
+
+    os.utime(doc, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert not manifest.unchanged("doc.md", doc.stat())
+
+
+def test_save_and_reload(tmp_path):
+    path = tmp_path / "sync" / "kb.json"
+    manifest = SyncManifest(str(path))
+    manifest.set("a.md", {"size": 1, "hash": "h"})
+    manifest.update("a.md", rag_file_name="files/1")
+    manifest.update("missing.md", rag_file_name="files/2")
+    manifest.save()
+
+    reloaded = SyncManifest(str(path))
+
+    assert reloaded.paths() == ["a.md"]
+    assert reloaded.get("a.md") == {"size": 1, "hash": "h", "rag_file_name": "files/1"}
+    assert not path.with_suffix(".tmp").exists()
+
+
+def test_save_skips_clean_manifest(tmp_path):
+    path = tmp_path / "sync.json"
+    SyncManifest(str(path)).save()
+    assert not path.exists()
+
+
+def test_remove(tmp_path):
+    manifest = SyncManifest(str(tmp_path / "sync.json"))
+    manifest.set("a.md", {"hash": "h"})
+
+    assert manifest.remove("a.md") == {"hash": "h"}
+    assert manifest.remove("a.md") is None
+    assert len(manifest) == 0
+
+
+def test_get_returns_a_copy(tmp_path):
+    manifest = SyncManifest(str(tmp_path / "sync.json"))
+    manifest.set("a.md", {"hash": "h"})
+    manifest.get("a.md")["hash"] = "changed"
+
+    assert manifest.get("a.md") == {"hash": "h"}
+
+
+def test_unreadable_or_foreign_manifest_starts_empty(tmp_path):
+    corrupt = tmp_path / "corrupt.json"
+    corrupt.write_text("{not json", encoding="utf-8")
+    foreign = tmp_path / "foreign.json"
+    foreign.write_text(json.dumps({"version": 99, "files": {"a.md": {}}}), encoding="utf-8")
+
+    assert len(SyncManifest(str(corrupt))) == 0
+    assert len(SyncManifest(str(foreign))) == 0
@@ -0,0 +1,81 @@
+import threading
+
+from utils.ttl_cache import TTLCache
+
+
+def test_get_and_set():
+    cache = TTLCache()
+    cache.set("k", "v")
+
+    assert cache.get("k") == "v"
+    assert cache.get("missing", "default") == "default"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire():
+    cache = TTLCache(ttl_seconds=60)
+    cache.set("short", "v", ttl_seconds=0)
+    cache.set("long", "v")
+
+    assert cache.get("short") is None
+    assert cache.get("long") == "v"
+    assert cache.stats()["expired"] == 1
+    assert len(cache) == 1
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_size_budget():
+    cache = TTLCache(max_size=10, sizeof=len)
+    cache.set("a", "x" * 6)
+    cache.set("b", "x" * 6)
+
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 6
+
+
+def test_overwrite_replaces_size():
+    cache = TTLCache(max_size=10, sizeof=len)
+    cache.set("a", "x" * 8)
+    cache.set("a", "x" * 2)
+
+    assert cache.stats()["size"] == 2
+
+
+def test_pop_and_clear():
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.pop("a") == 1
+    assert cache.pop("a", "gone") == "gone"
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()["size"] == 0
+
+
+def test_concurrent_writers_respect_max_entries():
+    cache = TTLCache(max_entries=50)
+
+    def fill(offset):
+        for i in range(200):
+            cache.set((offset, i), i)
+
+    threads = [threading.Thread(target=fill, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(cache) == 50
@@ -30,5 +30,14 @@ class Config:
         
         # LLM configuration
         self.llm_model = os.getenv("LLM_MODEL", "llama3.2")
-        
+
+        # Local cache configuration (indexes and manifests kept next to the app)
+        self.local_cache_dir = os.getenv("ELLA_CACHE_DIR", ".ella_cache")
+
+        # One RAG corpus per team directory / document category instead of a single corpus
+        self.shard_corpora = os.getenv("ELLA_SHARD_CORPORA", "false").lower() == "true"
+
+        # Send a second retrieveContexts request when the first is slower than the recent p95
+        self.hedge_retrieval = os.getenv("ELLA_HEDGE_RETRIEVAL", "false").lower() == "true"
+
 env_config = Config()
\ No newline at end of file
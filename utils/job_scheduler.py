@@ -0,0 +1,195 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from utils.metrics import metrics, Sample
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first within a pool
+PRIORITY_INTERACTIVE = 0
+PRIORITY_INGEST = 1
+PRIORITY_STATS = 2
+
+
+class SchedulerSaturated(Exception):
+    """Raised by JobScheduler.submit when a pool's queue is full."""
+
+
+class _Timings:
+    """Count plus a bounded window of recent durations."""
+
+    def __init__(self, window: int = 512):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        ordered = sorted(self.recent)
+        return {
+            "mean_seconds": self.total / self.count if self.count else 0.0,
+            "p95_seconds": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] if ordered else 0.0,
+            "max_seconds": ordered[-1] if ordered else 0.0,
+        }
+
+
+class _Pool:
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue: Optional[asyncio.PriorityQueue] = None
+        self.tasks: List[asyncio.Task] = []
+        self.busy = 0
+        self.queued_priorities: Dict[int, int] = {}
+
+
+class JobScheduler:
+    """
+    In-process scheduler for background Slack work.
+
+    Each pool has its own fixed set of workers and a bounded priority queue, so
+    a burst of ingest jobs can't starve interactive questions. ``submit`` refuses
+    work once a pool's queue is full and returns the job's queue position
+    otherwise. Wait time (queued) and service time (running) are recorded per
+    job kind.
+    """
+
+    def __init__(self, pools: Dict[str, Dict[str, int]]):
+        """
+        Args:
+            pools: Pool name -> {"workers": concurrent jobs, "max_queue": jobs allowed to wait}
+        """
+        self._pools = {name: _Pool(name, **config) for name, config in pools.items()}
+        self._sequence = itertools.count()
+        self._wait: Dict[str, _Timings] = {}
+        self._service: Dict[str, _Timings] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, kind: str, counter: str):
+        counters = self._counters.setdefault(kind, {"submitted": 0, "rejected": 0, "failed": 0})
+        counters[counter] += 1
+
+    def _start(self, pool: _Pool):
+        pool.queue = asyncio.PriorityQueue()
+        pool.tasks = [
+            asyncio.create_task(self._worker(pool), name=f"{pool.name}-worker-{i}")
+            for i in range(pool.workers)
+        ]
+
+    def submit(self,
+               pool_name: str,
+               job: Callable[[], Awaitable[Any]],
+               priority: int = PRIORITY_INTERACTIVE,
+               kind: Optional[str] = None) -> int:
+        """
+        Queue ``job()`` on a pool.
+
+        Args:
+            pool_name: Pool to run the job on
+            job: Zero-argument coroutine function
+            priority: Lower values run first within the pool
+            kind: Label used for metrics (defaults to the pool name)
+
+        Returns:
+            Position in line: 0 if a worker is free, 1 if next to start, and so on
+
+        Raises:
+            SchedulerSaturated: The pool's queue is full
+        """
+        pool = self._pools[pool_name]
+        kind = kind or pool_name
+        if pool.queue is None:
+            self._start(pool)
+
+        if pool.queue.qsize() >= pool.max_queue:
+            self._count(kind, "rejected")
+            logger.warning(f"⚠️ {pool_name} queue full ({pool.max_queue}), rejected {kind} job")
+            raise SchedulerSaturated(pool_name)
+
+        idle = pool.workers - pool.busy - pool.queue.qsize()
+        ahead = sum(count for p, count in pool.queued_priorities.items() if p <= priority)
+        position = 0 if idle > 0 else ahead + 1
+
+        pool.queued_priorities[priority] = pool.queued_priorities.get(priority, 0) + 1
+        pool.queue.put_nowait((priority, next(self._sequence), time.monotonic(), kind, job))
+        self._count(kind, "submitted")
+        return position
+
+    async def _worker(self, pool: _Pool):
+        while True:
+            priority, _, queued_at, kind, job = await pool.queue.get()
+            pool.queued_priorities[priority] -= 1
+            pool.busy += 1
+            started = time.monotonic()
+            self._wait.setdefault(kind, _Timings()).record(started - queued_at)
+            metrics.observe("job_wait_seconds", started - queued_at, "Time jobs spent queued", kind=kind)
+            try:
+                await job()
+            except Exception as e:
+                self._count(kind, "failed")
+                logger.error(f"❌ {kind} job failed: {str(e)}")
+            finally:
+                self._service.setdefault(kind, _Timings()).record(time.monotonic() - started)
+                metrics.observe("job_service_seconds", time.monotonic() - started, "Time jobs spent running", kind=kind)
+                pool.busy -= 1
+                pool.queue.task_done()
+
+    async def shutdown(self):
+        """Cancel every worker; queued jobs are dropped."""
+        for pool in self._pools.values():
+            for task in pool.tasks:
+                task.cancel()
+            await asyncio.gather(*pool.tasks, return_exceptions=True)
+            pool.tasks = []
+            pool.queue = None
+            pool.busy = 0
+            pool.queued_priorities = {}
+
+    def metric_samples(self) -> Iterator[Sample]:
+        """Queue depth, busy workers and job counters as metrics samples."""
+        for name, pool in self._pools.items():
+            labels = {"pool": name}
+            yield ("job_queue_depth", "gauge", "Jobs waiting per pool", labels, pool.queue.qsize() if pool.queue else 0)
+            yield ("job_workers_busy", "gauge", "Workers running a job per pool", labels, pool.busy)
+        for kind, counters in self._counters.items():
+            for counter, value in counters.items():
+                yield (f"jobs_{counter}_total", "counter", f"Jobs {counter} per kind", {"kind": kind}, value)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth per pool, plus wait vs. service time and counters per job kind."""
+        return {
+            "pools": {
+                name: {
+                    "workers": pool.workers,
+                    "busy": pool.busy,
+                    "queued": pool.queue.qsize() if pool.queue else 0,
+                    "max_queue": pool.max_queue,
+                }
+                for name, pool in self._pools.items()
+            },
+            "jobs": {
+                kind: {
+                    **counters,
+                    "wait": self._wait[kind].snapshot() if kind in self._wait else _Timings().snapshot(),
+                    "service": self._service[kind].snapshot() if kind in self._service else _Timings().snapshot(),
+                }
+                for kind, counters in self._counters.items()
+            },
+        }
+
+
+job_scheduler = JobScheduler({
+    # /ask_ella questions
+    "interactive": {"workers": 8, "max_queue": 100},
+    # Document ingestion and stats, ingest first
+    "background": {"workers": 2, "max_queue": 50},
+})
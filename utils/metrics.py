@@ -0,0 +1,162 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+# Cumulative histogram bounds in seconds, from a cache hit to a slow generation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# (name, type, help, labels, value) samples produced at scrape time
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """
+    In-process counters, gauges and latency histograms in Prometheus text format.
+
+    Recording is a dict lookup and a few adds under one lock, cheap enough for
+    every hot-path stage. Collectors registered with ``register_collector``
+    turn existing stats (caches, breakers, queues) into samples at scrape time.
+    """
+
+    def __init__(self, namespace: str = "ella", buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.namespace = namespace
+        self.buckets = tuple(sorted(buckets))
+
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def _name(self, name: str, kind: str, description: str) -> str:
+        full_name = f"{self.namespace}_{name}"
+        self._help.setdefault(full_name, (kind, description))
+        return full_name
+
+    def inc(self, name: str, value: float = 1.0, description: str = "", **labels):
+        """Add ``value`` to a counter (``name`` should end in _total)."""
+        key = (self._name(name, "counter", description), _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def gauge_add(self, name: str, delta: float, description: str = "", **labels):
+        key = (self._name(name, "gauge", description), _labels(labels))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0.0) + delta
+
+    def observe(self, name: str, seconds: float, description: str = "", **labels):
+        """Record one duration in a histogram."""
+        key = (self._name(name, "histogram", description), _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram.counts[i] += 1
+                    break
+            histogram.total += seconds
+            histogram.count += 1
+
+    @contextmanager
+    def stage(self, stage: str, **labels) -> Iterator[None]:
+        """
+        Time one pipeline stage: latency histogram, in-flight gauge and an error counter.
+        Works around ``await`` too; the gauge counts stages entered but not left.
+        """
+        self.gauge_add("stage_in_flight", 1, "Stages currently running", stage=stage, **labels)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("stage_errors_total", 1, "Stages that raised", stage=stage, **labels)
+            raise
+        finally:
+            self.observe("stage_duration_seconds", time.perf_counter() - start, "Stage latency", stage=stage, **labels)
+            self.gauge_add("stage_in_flight", -1, "Stages currently running", stage=stage, **labels)
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """Add a callable returning (name, type, help, labels, value) samples at scrape time."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {
+                key: (list(h.counts), h.total, h.count) for key, h in self._histograms.items()
+            }
+            collectors = list(self._collectors)
+            help_text = dict(self._help)
+
+        families: Dict[str, List[str]] = {}
+
+        def family(name: str) -> List[str]:
+            if name not in families:
+                kind, description = help_text.get(name, ("untyped", ""))
+                families[name] = [f"# HELP {name} {description or name}", f"# TYPE {name} {kind}"]
+            return families[name]
+
+        for (name, labels), value in sorted(counters.items()):
+            family(name).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), value in sorted(gauges.items()):
+            family(name).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), (counts, total, count) in sorted(histograms.items()):
+            lines = family(name)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for collector in collectors:
+            try:
+                samples = list(collector())
+            except Exception:
+                # A failing collector must not break the scrape
+                continue
+            for name, kind, description, labels, value in samples:
+                full_name = f"{self.namespace}_{name}"
+                help_text.setdefault(full_name, (kind, description))
+                family(full_name).append(f"{full_name}{_format_labels(_labels(labels))} {_format_value(value)}")
+
+        return "\n".join(line for lines in families.values() for line in lines) + "\n"
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from slack_sdk.errors import SlackApiError
+
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class SlackUserDirectory:
+    """
+    Cached Slack user directory shared by the thread-capture helpers.
+
+    The cache is warmed in bulk with paginated ``users_list`` calls. Anything
+    still missing is resolved with ``users_info``: each id is requested once
+    even when several threads ask for it, misses are fetched concurrently up to
+    ``max_concurrency``, and ``Retry-After`` is honoured on rate limits.
+    """
+
+    def __init__(self,
+                 ttl_seconds: float = 3600.0,
+                 negative_ttl_seconds: float = 300.0,
+                 max_entries: int = 20000,
+                 max_concurrency: int = 4,
+                 max_retries: int = 3):
+        """
+        Args:
+            ttl_seconds: Seconds a resolved user stays cached
+            negative_ttl_seconds: Seconds an unresolvable user id stays cached
+            max_entries: Maximum cached users before LRU eviction
+            max_concurrency: users_info calls allowed in flight at once
+            max_retries: Attempts per call after a rate-limit response
+        """
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_retries = max_retries
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._warm_lock = asyncio.Lock()
+        self._warmed = False
+
+    @staticmethod
+    def _summarize(user: Dict[str, Any]) -> Dict[str, str]:
+        """Keep only the fields used for formatting, so cache entries stay small."""
+        return {"real_name": user.get("real_name") or "", "name": user.get("name") or ""}
+
+    async def _call(self, method: Callable, **kwargs) -> Any:
+        """Call a Slack Web API method, sleeping for Retry-After on rate limits."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await method(**kwargs)
+            except SlackApiError as e:
+                if e.response.status_code != 429 or attempt == self.max_retries:
+                    raise
+                retry_after = float(e.response.headers.get("Retry-After", 1))
+                logger.warning(f"⚠️ Slack rate limited, retrying in {retry_after:.0f}s")
+                await asyncio.sleep(retry_after)
+
+    async def warm(self, client, page_size: int = 200) -> int:
+        """
+        Load every workspace member with paginated users_list calls.
+
+        Returns:
+            Number of users cached
+        """
+        async with self._warm_lock:
+            if self._warmed:
+                return 0
+            count, cursor = 0, None
+            try:
+                while True:
+                    response = await self._call(client.users_list, limit=page_size, cursor=cursor)
+                    for user in response.get("members", []):
+                        self._cache.set(user["id"], self._summarize(user))
+                        count += 1
+                    cursor = response.get("response_metadata", {}).get("next_cursor")
+                    if not cursor:
+                        break
+                self._warmed = True
+                logger.info(f"✅ Cached {count} Slack users")
+            except Exception as e:
+                logger.warning(f"⚠️ Slack user directory warm-up stopped after {count} users: {str(e)}")
+            return count
+
+    async def _fetch(self, client, user_id: str) -> Optional[Dict[str, str]]:
+        async with self._semaphore:
+            try:
+                response = await self._call(client.users_info, user=user_id)
+                user = self._summarize(response.get("user", {}))
+                self._cache.set(user_id, user)
+                return user
+            except Exception as e:
+                logger.debug(f"Could not resolve Slack user {user_id}: {str(e)}")
+                # Remember unknown users briefly, but not ids we were only throttled on
+                if not (isinstance(e, SlackApiError) and e.response.status_code == 429):
+                    self._cache.set(user_id, None, ttl_seconds=self.negative_ttl_seconds)
+                return None
+
+    async def resolve(self, client, user_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, str]]]:
+        """
+        Look up many users at once; each unique id costs at most one API call.
+
+        Returns:
+            Dict of user id -> {"real_name", "name"}, or None if the user could not be resolved
+        """
+        resolved: Dict[str, Optional[Dict[str, str]]] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        for user_id in dict.fromkeys(user_ids):
+            cached = self._cache.get(user_id, _MISSING)
+            if cached is not _MISSING:
+                resolved[user_id] = cached
+                continue
+            future = self._inflight.get(user_id)
+            if future is None:
+                future = asyncio.ensure_future(self._fetch(client, user_id))
+                self._inflight[user_id] = future
+                future.add_done_callback(lambda _, uid=user_id: self._inflight.pop(uid, None))
+            waiting[user_id] = future
+
+        if waiting:
+            # Shield shared lookups so one cancelled caller doesn't cancel them for others
+            results = await asyncio.gather(*(asyncio.shield(future) for future in waiting.values()))
+            resolved.update(zip(waiting.keys(), results))
+        return resolved
+
+    async def display_names(self,
+                            client,
+                            user_ids: Iterable[str],
+                            fallback: Callable[[str], str] = lambda user_id: f"User-{user_id}") -> Dict[str, str]:
+        """
+        Map user ids to real name, then handle, then ``fallback(user_id)``.
+        """
+        users = await self.resolve(client, user_ids)
+        return {
+            user_id: (user or {}).get("real_name") or (user or {}).get("name") or fallback(user_id)
+            for user_id, user in users.items()
+        }
+
+
+user_directory = SlackUserDirectory()
@@ -0,0 +1,94 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with per-entry TTL and optional size budget.
+
+    Entries expire after ``ttl_seconds`` (or the TTL passed to ``set``). The cache
+    evicts least-recently-used entries once it holds more than ``max_entries``
+    items or more than ``max_size`` units as measured by ``sizeof``.
+    """
+
+    _MISSING = object()
+
+    def __init__(self,
+                 max_entries: int = 1024,
+                 ttl_seconds: float = 300.0,
+                 max_size: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.sizeof = sizeof or (lambda value: 1)
+
+        self._lock = threading.Lock()
+        # key -> (expires_at, size, value), in LRU order
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._size = 0
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, self._MISSING)
+            if item is self._MISSING:
+                self._counters["misses"] += 1
+                return default
+            expires_at, size, value = item
+            if time.monotonic() >= expires_at:
+                self._remove(key)
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self._counters["hits"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        size = self.sizeof(value)
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + ttl, size, value)
+            self._size += size
+            while self._data and (
+                len(self._data) > self.max_entries
+                or (self.max_size is not None and self._size > self.max_size)
+            ):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self._counters["evictions"] += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, self._MISSING)
+            if item is self._MISSING:
+                return default
+            self._remove(key)
+            return item[2]
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._data.pop(key)
+        self._size -= size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": len(self._data),
+                "size": self._size,
+                "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+            }